@@ -1,544 +1,1427 @@
-import os
-from flask import Flask, request, jsonify, send_from_directory
-from flask_cors import CORS
-import sqlite3
-import uuid
-from werkzeug.security import generate_password_hash, check_password_hash
-
-app = Flask(__name__, static_folder='html_templates')
-CORS(app) # Enable CORS for all routes
-
-DATABASE = 'skill_swap.db'
-UPLOAD_FOLDER = 'uploads' # Folder to store uploaded profile pictures
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-
-# Ensure the upload folder exists
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    conn = get_db_connection()
-    # Create users table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id TEXT PRIMARY KEY,
-            name TEXT NOT NULL UNIQUE,
-            password_hash TEXT NOT NULL,
-            location TEXT,
-            skills_offered TEXT,
-            skills_wanted TEXT,
-            availability TEXT,
-            is_public INTEGER DEFAULT 1,
-            is_admin INTEGER DEFAULT 0,
-            is_banned INTEGER DEFAULT 0,
-            profile_photo TEXT, -- New column for profile photo URL/path
-            theme TEXT DEFAULT 'indigo',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-    ''')
-    # Create swap_requests table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS swap_requests (
-            id TEXT PRIMARY KEY,
-            sender_id TEXT NOT NULL,
-            sender_name TEXT NOT NULL,
-            receiver_id TEXT NOT NULL,
-            receiver_name TEXT NOT NULL,
-            skill_offered TEXT NOT NULL,
-            skill_wanted TEXT NOT NULL,
-            status TEXT DEFAULT 'pending', -- pending, accepted, rejected
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (sender_id) REFERENCES users (id),
-            FOREIGN KEY (receiver_id) REFERENCES users (id)
-        );
-    ''')
-    # Create feedback table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS feedback (
-            id TEXT PRIMARY KEY,
-            swap_request_id TEXT NOT NULL,
-            giver_id TEXT NOT NULL,
-            receiver_id TEXT NOT NULL,
-            rating INTEGER NOT NULL,
-            comment TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (swap_request_id) REFERENCES swap_requests (id),
-            FOREIGN KEY (giver_id) REFERENCES users (id),
-            FOREIGN KEY (receiver_id) REFERENCES users (id)
-        );
-    ''')
-    # Create platform_messages table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS platform_messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            message TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-    ''')
-
-    # Add default admin user if not exists
-    cursor = conn.execute("SELECT * FROM users WHERE name = 'admin'")
-    admin_exists = cursor.fetchone()
-    if not admin_exists:
-        admin_id = str(uuid.uuid4())
-        admin_password_hash = generate_password_hash("adminpass")
-        conn.execute(
-            "INSERT INTO users (id, name, password_hash, is_admin, is_public) VALUES (?, ?, ?, ?, ?)",
-            (admin_id, 'admin', admin_password_hash, 1, 0) # Admin profile is not public by default
-        )
-        conn.commit()
-        print("Default admin user created with ID:", admin_id)
-    conn.close()
-
-# Initialize database on app startup
-with app.app_context():
-    init_db()
-
-def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-# Serve static files from the 'html_templates' directory
-@app.route('/')
-def serve_index():
-    return send_from_directory(app.static_folder, 'index.html')
-
-# Serve uploaded profile pictures
-@app.route('/uploads/<filename>')
-def uploaded_file(filename):
-    return send_from_directory(UPLOAD_FOLDER, filename)
-
-# User authentication and profile management
-@app.route('/api/auth/signup', methods=['POST'])
-def signup():
-    data = request.get_json()
-    name = data.get('name')
-    password = data.get('password')
-    location = data.get('location', '')
-    skills_offered = ','.join(data.get('skillsOffered', []))
-    skills_wanted = ','.join(data.get('skillsWanted', []))
-    availability = data.get('availability', '')
-    is_public = data.get('isPublic', True) # Default to public
-
-    if not name or not password:
-        return jsonify({"error": "Username and password are required"}), 400
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE name = ?", (name,))
-    if cursor.fetchone():
-        conn.close()
-        return jsonify({"error": "Username already exists"}), 409
-
-    user_id = str(uuid.uuid4())
-    password_hash = generate_password_hash(password)
-
-    try:
-        cursor.execute(
-            "INSERT INTO users (id, name, password_hash, location, skills_offered, skills_wanted, availability, is_public) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-            (user_id, name, password_hash, location, skills_offered, skills_wanted, availability, 1 if is_public else 0)
-        )
-        conn.commit()
-        # Fetch the newly created profile to return
-        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-        user_profile_data = cursor.fetchone()
-        user_profile = dict(user_profile_data) if user_profile_data else None
-        if user_profile:
-            user_profile['skills_offered'] = user_profile['skills_offered'].split(',') if user_profile['skills_offered'] else []
-            user_profile['skills_wanted'] = user_profile['skills_wanted'].split(',') if user_profile['skills_wanted'] else []
-
-        print(f"User signed up: {name}, ID: {user_id}") # Debug print
-        return jsonify({"message": "User registered successfully", "userId": user_id, "userProfile": user_profile}), 201
-    except sqlite3.Error as e:
-        conn.rollback()
-        print(f"Database error during signup: {str(e)}") # Debug print
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
-
-@app.route('/api/auth/login', methods=['POST'])
-def login():
-    data = request.get_json()
-    name = data.get('name')
-    password = data.get('password')
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE name = ?", (name,))
-    user = cursor.fetchone()
-    conn.close()
-
-    if user and check_password_hash(user['password_hash'], password):
-        user_profile = dict(user)
-        user_profile['skills_offered'] = user_profile['skills_offered'].split(',') if user_profile['skills_offered'] else []
-        user_profile['skills_wanted'] = user_profile['skills_wanted'].split(',') if user_profile['skills_wanted'] else []
-        print(f"User logged in: {name}, ID: {user['id']}") # Debug print
-        return jsonify({"message": "Login successful", "userId": user['id'], "userProfile": user_profile}), 200
-    else:
-        print(f"Failed login attempt for user: {name}") # Debug print
-        return jsonify({"error": "Invalid username or password"}), 401
-
-@app.route('/api/profile/<user_id>', methods=['GET'])
-def get_user_profile(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-    user = cursor.fetchone()
-    conn.close()
-
-    if user:
-        user_profile = dict(user)
-        user_profile['skills_offered'] = user_profile['skills_offered'].split(',') if user_profile['skills_offered'] else []
-        user_profile['skills_wanted'] = user_profile['skills_wanted'].split(',') if user_profile['skills_wanted'] else []
-        print(f"Fetched profile for user ID: {user_id}") # Debug print
-        return jsonify(user_profile), 200
-    else:
-        print(f"Profile not found for user ID: {user_id}") # Debug print
-        return jsonify({"error": "User not found"}), 404
-
-@app.route('/api/profile/<user_id>', methods=['PUT'])
-def update_user_profile(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Check if user exists
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-    user = cursor.fetchone()
-    if not user:
-        conn.close()
-        print(f"Attempted to update non-existent user ID: {user_id}") # Debug print
-        return jsonify({"error": "User not found"}), 404
-
-    profile_photo_path = user['profile_photo'] # Default to existing photo
-
-    if 'profilePhoto' in request.files and request.files['profilePhoto'].filename != '':
-        file = request.files['profilePhoto']
-        if file and allowed_file(file.filename):
-            filename = str(uuid.uuid4()) + '.' + file.filename.rsplit('.', 1)[1].lower()
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(filepath)
-            profile_photo_path = f"/uploads/{filename}" # Store relative URL
-            print(f"File uploaded for user {user_id}: {filename}") # Debug print
-        else:
-            print(f"Invalid file type for profile photo upload for user {user_id}") # Debug print
-            return jsonify({"error": "Invalid file type for profile photo"}), 400
-    else:
-        # If no new file uploaded, check if profilePhotoUrl was provided in form (if FormData) or JSON
-        if request.is_json:
-            data = request.get_json()
-            profile_photo_path = data.get('profilePhotoUrl', user['profile_photo'])
-            print(f"Using JSON profilePhotoUrl for user {user_id}: {profile_photo_path}") # Debug print
-        else: # It's a FormData request without a file
-            profile_photo_path = request.form.get('profilePhotoUrl', user['profile_photo'])
-            print(f"Using FormData profilePhotoUrl for user {user_id}: {profile_photo_path}") # Debug print
-
-
-    # Get other fields from request.form if it's a file upload, otherwise from request.get_json()
-    if request.is_json:
-        data = request.get_json()
-        name = data.get('name', user['name'])
-        location = data.get('location', user['location'])
-        skills_offered = ','.join(data.get('skillsOffered', user['skills_offered'].split(',') if user['skills_offered'] else []))
-        skills_wanted = ','.join(data.get('skillsWanted', user['skills_wanted'].split(',') if user['skills_wanted'] else []))
-        availability = data.get('availability', user['availability'])
-        is_public = data.get('isPublic', user['is_public']) # Already boolean from frontend
-        theme = data.get('theme', user['theme'])
-    else: # It's a FormData request
-        name = request.form.get('name', user['name'])
-        location = request.form.get('location', user['location'])
-        # For skills, request.form.getlist is safer for comma-separated if sent as multiple fields,
-        # but if it's a single string, .get() is fine. Assuming single string for simplicity.
-        skills_offered_str = request.form.get('skillsOffered', user['skills_offered'])
-        skills_offered = ','.join([s.strip() for s in skills_offered_str.split(',') if s.strip()])
-
-        skills_wanted_str = request.form.get('skillsWanted', user['skills_wanted'])
-        skills_wanted = ','.join([s.strip() for s in skills_wanted_str.split(',') if s.strip()])
-
-        availability = request.form.get('availability', user['availability'])
-        is_public = int(request.form.get('isPublic', user['is_public']))
-        theme = request.form.get('theme', user['theme'])
-
-
-    try:
-        cursor.execute(
-            "UPDATE users SET name = ?, location = ?, skills_offered = ?, skills_wanted = ?, availability = ?, is_public = ?, profile_photo = ?, theme = ? WHERE id = ?",
-            (name, location, skills_offered, skills_wanted, availability, 1 if is_public else 0, profile_photo_path, theme, user_id)
-        )
-        conn.commit()
-        # Fetch updated profile to return
-        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-        updated_user_data = cursor.fetchone()
-        updated_user_profile = dict(updated_user_data) if updated_user_data else None
-        if updated_user_profile:
-            updated_user_profile['skills_offered'] = updated_user_profile['skills_offered'].split(',') if updated_user_profile['skills_offered'] else []
-            updated_user_profile['skills_wanted'] = updated_user_profile['skills_wanted'].split(',') if updated_user_profile['skills_wanted'] else []
-
-        print(f"Profile updated successfully for user ID: {user_id}") # Debug print
-        return jsonify(updated_user_profile), 200
-    except sqlite3.Error as e:
-        conn.rollback()
-        print(f"Database error during profile update for user {user_id}: {str(e)}") # Debug print
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
-
-@app.route('/api/users', methods=['GET'])
-def get_users():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    search_term = request.args.get('searchTerm', '')
-
-    query = "SELECT id, name, location, skills_offered, skills_wanted, availability, is_public, profile_photo, theme FROM users WHERE is_public = 1 AND is_banned = 0"
-    params = []
-
-    if search_term:
-        search_like = f"%{search_term}%"
-        query += " AND (name LIKE ? OR skills_offered LIKE ? OR skills_wanted LIKE ?)"
-        params.extend([search_like, search_like, search_like])
-
-    cursor.execute(query, params)
-    users = cursor.fetchall()
-    conn.close()
-
-    users_list = []
-    for user in users:
-        user_dict = dict(user)
-        user_dict['skills_offered'] = user_dict['skills_offered'].split(',') if user_dict['skills_offered'] else []
-        user_dict['skills_wanted'] = user_dict['skills_wanted'].split(',') if user_dict['skills_wanted'] else []
-        users_list.append(user_dict)
-    print(f"Fetched {len(users_list)} public users.") # Debug print
-    return jsonify(users_list), 200
-
-# Swap Request Endpoints
-@app.route('/api/swap_requests', methods=['POST'])
-def create_swap_request():
-    data = request.get_json()
-    sender_id = data.get('senderId')
-    sender_name = data.get('senderName')
-    receiver_id = data.get('receiverId')
-    receiver_name = data.get('receiverName')
-    skill_offered = data.get('skillOffered')
-    skill_wanted = data.get('skillWanted')
-
-    if not all([sender_id, sender_name, receiver_id, receiver_name, skill_offered, skill_wanted]):
-        print("Error: Missing required fields for swap request.") # Debug print
-        return jsonify({"error": "Missing required fields"}), 400
-
-    request_id = str(uuid.uuid4())
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
-            "INSERT INTO swap_requests (id, sender_id, sender_name, receiver_id, receiver_name, skill_offered, skill_wanted) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (request_id, sender_id, sender_name, receiver_id, receiver_name, skill_offered, skill_wanted)
-        )
-        conn.commit()
-        print(f"Swap request created: ID={request_id}, Sender={sender_name}, Receiver={receiver_name}") # Debug print
-        return jsonify({"message": "Swap request sent successfully", "requestId": request_id}), 201
-    except sqlite3.Error as e:
-        conn.rollback()
-        print(f"Database error creating swap request: {str(e)}") # Debug print
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
-
-@app.route('/api/swap_requests/<user_id>', methods=['GET'])
-def get_user_swap_requests(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    # Get requests where user is sender OR receiver
-    cursor.execute(
-        "SELECT * FROM swap_requests WHERE sender_id = ? OR receiver_id = ? ORDER BY created_at DESC",
-        (user_id, user_id)
-    )
-    requests = cursor.fetchall()
-    conn.close()
-    print(f"Fetched {len(requests)} swap requests for user ID: {user_id}") # Debug print
-    return jsonify([dict(req) for req in requests]), 200
-
-@app.route('/api/swap_requests/<request_id>', methods=['PUT'])
-def update_swap_request_status(request_id):
-    data = request.get_json()
-    new_status = data.get('status') # 'accepted' or 'rejected'
-
-    if new_status not in ['accepted', 'rejected']:
-        print(f"Invalid status update attempt for request {request_id}: {new_status}") # Debug print
-        return jsonify({"error": "Invalid status"}), 400
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("UPDATE swap_requests SET status = ? WHERE id = ?", (new_status, request_id))
-        conn.commit()
-        if cursor.rowcount == 0:
-            print(f"Swap request {request_id} not found for status update.") # Debug print
-            return jsonify({"error": "Swap request not found"}), 404
-        status_message = "accepted" if new_status == 'accepted' else "rejected"
-        print(f"Swap request {request_id} status updated to: {status_message}") # Debug print
-        return jsonify({"message": f"Swap request {new_status} successfully"}), 200
-    except sqlite3.Error as e:
-        conn.rollback()
-        print(f"Database error updating swap request {request_id} status: {str(e)}") # Debug print
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
-
-@app.route('/api/swap_requests/<request_id>', methods=['DELETE'])
-def delete_swap_request(request_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("DELETE FROM swap_requests WHERE id = ?", (request_id,))
-        conn.commit()
-        if cursor.rowcount == 0:
-            print(f"Swap request {request_id} not found for deletion.") # Debug print
-            return jsonify({"error": "Swap request not found"}), 404
-        print(f"Swap request {request_id} deleted successfully.") # Debug print
-        return jsonify({"message": "Swap request deleted successfully"}), 200
-    except sqlite3.Error as e:
-        conn.rollback()
-        print(f"Database error deleting swap request {request_id}: {str(e)}") # Debug print
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
-
-# Feedback Endpoints
-@app.route('/api/feedback', methods=['POST'])
-def submit_feedback():
-    data = request.get_json()
-    swap_request_id = data.get('swapRequestId')
-    giver_id = data.get('giverId')
-    receiver_id = data.get('receiverId')
-    rating = data.get('rating')
-    comment = data.get('comment')
-
-    if not all([swap_request_id, giver_id, receiver_id, rating is not None]):
-        print("Error: Missing required feedback fields.") # Debug print
-        return jsonify({"error": "Missing required feedback fields"}), 400
-
-    feedback_id = str(uuid.uuid4())
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
-            "INSERT INTO feedback (id, swap_request_id, giver_id, receiver_id, rating, comment) VALUES (?, ?, ?, ?, ?, ?)",
-            (feedback_id, swap_request_id, giver_id, receiver_id, rating, comment)
-        )
-        conn.commit()
-        print(f"Feedback submitted for swap {swap_request_id} by {giver_id}.") # Debug print
-        return jsonify({"message": "Feedback submitted successfully", "feedbackId": feedback_id}), 201
-    except sqlite3.Error as e:
-        conn.rollback()
-        print(f"Database error submitting feedback: {str(e)}") # Debug print
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
-
-@app.route('/api/feedback', methods=['GET'])
-def get_all_feedback():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM feedback ORDER BY created_at DESC")
-    feedback_logs = cursor.fetchall()
-    conn.close()
-    print(f"Fetched {len(feedback_logs)} feedback logs.") # Debug print
-    return jsonify([dict(log) for log in feedback_logs]), 200
-
-# Admin Endpoints
-@app.route('/api/admin/users', methods=['GET'])
-def admin_get_users():
-    # In a real app, you'd add authentication/authorization for admin access here
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name, location, skills_offered, skills_wanted, is_public, is_admin, is_banned, profile_photo, theme, created_at FROM users")
-    users = cursor.fetchall()
-    conn.close()
-    users_list = []
-    for user in users:
-        user_dict = dict(user)
-        user_dict['skills_offered'] = user_dict['skills_offered'].split(',') if user_dict['skills_offered'] else []
-        user_dict['skills_wanted'] = user_dict['skills_wanted'].split(',') if user_dict['skills_wanted'] else []
-        users_list.append(user_dict)
-    print(f"Admin fetched {len(users_list)} users.") # Debug print
-    return jsonify(users_list), 200
-
-@app.route('/api/admin/users/<user_id>/ban', methods=['PUT'])
-def admin_ban_user(user_id):
-    # In a real app, you'd add authentication/authorization for admin access here
-    data = request.get_json()
-    is_banned = data.get('isBanned') # 0 for unban, 1 for ban
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("UPDATE users SET is_banned = ? WHERE id = ?", (is_banned, user_id))
-        conn.commit()
-        if cursor.rowcount == 0:
-            print(f"Admin: User {user_id} not found for ban/unban.") # Debug print
-            return jsonify({"error": "User not found"}), 404
-        status_message = "banned" if is_banned else "unbanned"
-        print(f"Admin: User {user_id} {status_message} successfully.") # Debug print
-        return jsonify({"message": f"User {user_id} {status_message} successfully"}), 200
-    except sqlite3.Error as e:
-        conn.rollback()
-        print(f"Admin: Database error during ban/unban for user {user_id}: {str(e)}") # Debug print
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
-
-@app.route('/api/admin/platform_message', methods=['GET'])
-def get_platform_message():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT message FROM platform_messages ORDER BY created_at DESC LIMIT 1")
-    message = cursor.fetchone()
-    conn.close()
-    if message:
-        print(f"Admin: Fetched platform message: {message['message']}") # Debug print
-        return jsonify({"message": message['message']}), 200
-    print("Admin: No platform message found.") # Debug print
-    return jsonify({"message": ""}), 200 # No message set yet
-
-@app.route('/api/admin/platform_message', methods=['POST'])
-def set_platform_message():
-    # In a real app, you'd add authentication/authorization for admin access here
-    data = request.get_json()
-    message = data.get('message')
-
-    if message is None:
-        print("Admin: Error - message content is required for platform message.") # Debug print
-        return jsonify({"error": "Message content is required"}), 400
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        # Clear previous messages or just add new one, for simplicity, we'll just add
-        cursor.execute("INSERT INTO platform_messages (message) VALUES (?)", (message,))
-        conn.commit()
-        print(f"Admin: Platform message set to: {message}") # Debug print
-        return jsonify({"message": "Platform message updated successfully"}), 200
-    except sqlite3.Error as e:
-        conn.rollback()
-        print(f"Admin: Database error setting platform message: {str(e)}") # Debug print
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
-
-@app.route('/api/admin/swap_requests', methods=['GET'])
-def admin_get_all_swap_requests():
-    # In a real app, you'd add authentication/authorization for admin access here
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM swap_requests ORDER BY created_at DESC")
-    requests = cursor.fetchall()
-    conn.close()
-    print(f"Admin: Fetched {len(requests)} total swap requests.") # Debug print
-    return jsonify([dict(req) for req in requests]), 200
-
-if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+import atexit
+import functools
+import gzip
+import logging
+import os
+import sys
+import threading
+import time
+from flask import Flask, Response, g, request, jsonify, send_from_directory
+from werkzeug.exceptions import RequestEntityTooLarge
+from flask_cors import CORS
+import sqlite3
+import uuid
+import click
+import cluster
+from db import init_pool, get_db_connection, release_request_connection, PoolTimeout
+from search import sync_user_index, build_user_search, rebuild_search_index
+from migrations import migrate, find_full_scans
+from matching import match_index
+from skills import DEFAULT_SUGGESTIONS, MAX_SUGGESTIONS, skill_index
+from cache import response_cache, cached_response
+from events import StreamsExhausted, broker, user_topic, BROADCAST
+from passwords import HashingOverloaded, hash_password, verify_password, rehash_if_needed, stats as password_hash_stats
+from images import MAX_UPLOAD_BYTES, ImageProcessingBusy, ImageRejected, store_profile_photo, wait_for_photo
+from ratings import RATING_COLUMNS, RATING_JOIN, parse_rating, record_rating, rebuild_rating_stats
+import metrics
+from compression import StaticAsset, compress_response
+from writer import WRITE_BEHIND, WriterOverloaded, GroupCommitWriter
+from batch import BatchError, BatchResults, parse_batch, run_in_transaction, fetch_rows_by_id
+from platform_stats import (
+    SWAP_STATUSES, record_stats, swap_status_counter, swap_status_change, rebuild_platform_stats, read_counters, parse_range, read_daily_series,
+)
+from bulk import EXPORT_FORMATS, TABLE_COLUMNS, BulkError, ImportSummary, export_stream, import_ndjson
+from retention import RETENTION_INTERVAL, RetentionJob, parse_include_archived, run_retention, swap_request_tables
+from serialization import (
+    FastJSONProvider, user_fragments, user_view, fetch_user_records, fetch_user_record, encode_object, encode_array, json_response,
+)
+from pagination import PaginationError, parse_page_args, parse_fields, paginate_query, split_page, select_columns, paginated_response
+
+# Debug output goes through the 'skill_swap' logger; LOG_LEVEL=DEBUG brings back the per-request detail
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+log = logging.getLogger('skill_swap')
+
+app = Flask(__name__, static_folder='html_templates')
+app.json = FastJSONProvider(app) # orjson when installed (see serialization.py)
+CORS(app, expose_headers=['X-Next-Cursor']) # Enable CORS for all routes
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 64 * 1024 # photo plus the other form fields
+
+DATABASE = os.environ.get('SKILL_SWAP_DATABASE', 'skill_swap.db') # the benchmark suite points this at a generated database
+UPLOAD_FOLDER = 'uploads' # Folder to store uploaded profile pictures
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+# Columns each list endpoint may return; clients can narrow them with ?fields=
+USER_LIST_FIELDS = ('id', 'name', 'location', 'skills_offered', 'skills_wanted', 'availability', 'is_public', 'profile_photo', 'theme', 'rating')
+ADMIN_USER_FIELDS = ('id', 'name', 'location', 'skills_offered', 'skills_wanted', 'is_public', 'is_admin', 'is_banned', 'profile_photo', 'theme', 'created_at')
+SWAP_REQUEST_FIELDS = ('id', 'sender_id', 'sender_name', 'receiver_id', 'receiver_name', 'skill_offered', 'skill_wanted', 'status', 'created_at')
+# What signup/login/profile responses return for a user; never the password hash
+PROFILE_FIELDS = ('id', 'name', 'location', 'skills_offered', 'skills_wanted', 'availability', 'is_public', 'is_admin', 'is_banned', 'profile_photo', 'theme', 'created_at')
+FEEDBACK_FIELDS = ('id', 'swap_request_id', 'giver_id', 'receiver_id', 'rating', 'comment', 'created_at')
+
+# Pooled WAL-mode connections, one per request (see db.py); nothing is opened until first use
+db_pool = init_pool(app, DATABASE)
+
+# Optional group-commit writer for the high-volume inserts (see writer.py); started by init_worker()
+write_behind = None
+
+# Scheduled archival of old swap requests, platform message pruning and incremental vacuum (see retention.py)
+retention_job = None
+
+# index.html, read and compressed once per worker (see init_worker())
+index_asset = None
+
+# Importing this module has no side effects. Startup is split so the pre-fork server (server.py) can run the
+# schema setup once in the master and warm each worker after fork; create_app() does both for a single process.
+runtime = {'setup': False, 'ready': False, 'draining': False, 'started_at': None}
+_init_lock = threading.RLock()
+
+def run_write(work):
+    # Runs work(conn) in a write transaction and returns its result once committed: through the
+    # group-commit writer in write-behind mode, else on the request's own connection
+    if write_behind is not None:
+        return write_behind.submit(work)
+    conn = get_db_connection()
+    try:
+        result = work(conn)
+        conn.commit()
+        return result
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+# Per-route latency and status counts for /metrics; routes are labelled by their URL rule, not the raw path
+@app.before_request
+def start_request_timer():
+    g._metrics_route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g._metrics_start = time.perf_counter()
+    metrics.request_started(g._metrics_route)
+
+@app.after_request
+def record_response_status(response):
+    g._metrics_status = response.status_code
+    return response
+
+# Large JSON responses that were not cached precompressed are gzipped on the way out
+app.after_request(compress_response)
+
+@app.teardown_request
+def finish_request_timer(exception=None):
+    started = g.pop('_metrics_start', None)
+    if started is not None:
+        metrics.request_finished(request.method, g._metrics_route, g.get('_metrics_status', 500), time.perf_counter() - started)
+
+@app.errorhandler(HashingOverloaded)
+def handle_hashing_overloaded(e):
+    log.warning("Password hashing overloaded: %s", e)
+    response = jsonify({"error": "Server busy, please retry"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(WriterOverloaded)
+def handle_writer_overloaded(e):
+    log.warning("Write-behind queue overloaded: %s", e)
+    response = jsonify({"error": "Server busy, please retry"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(ImageProcessingBusy)
+def handle_image_processing_busy(e):
+    log.warning("Image processing overloaded: %s", e)
+    response = jsonify({"error": "Server busy, please retry"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(StreamsExhausted)
+def handle_streams_exhausted(e):
+    log.warning("Event streams exhausted: %s", e)
+    response = jsonify({"error": "Server busy, please retry"})
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
+@app.errorhandler(PoolTimeout)
+def handle_pool_timeout(e):
+    log.warning("Database pool exhausted: %s", e)
+    return jsonify({"error": "Server busy, please retry"}), 503
+
+def init_db():
+    conn = get_db_connection()
+    # Create or upgrade the schema (see migrations.py); a no-op once user_version is current
+    migrate(conn)
+
+    # Add default admin user if not exists
+    cursor = conn.execute("SELECT * FROM users WHERE name = 'admin'")
+    admin_exists = cursor.fetchone()
+    if not admin_exists:
+        admin_id = str(uuid.uuid4())
+        admin_password_hash = hash_password("adminpass")
+        conn.execute(
+            "INSERT INTO users (id, name, password_hash, is_admin, is_public) VALUES (?, ?, ?, ?, ?)",
+            (admin_id, 'admin', admin_password_hash, 1, 0) # Admin profile is not public by default
+        )
+        sync_user_index(conn, admin_id, 'admin', None, None, None)
+        conn.commit()
+        log.info("Default admin user created with ID: %s", admin_id)
+    conn.close()
+
+def setup():
+    # Once per deployment, before any worker starts: upload folder and schema
+    with _init_lock:
+        if runtime['setup']:
+            return
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        with app.app_context():
+            init_db()
+        # No connection may be shared with forked workers
+        db_pool.close_all()
+        runtime['setup'] = True
+
+def load_indexes(conn):
+    # Build the in-memory reciprocal match index; signup/profile/ban keep it current afterwards
+    match_index.load(conn)
+    # Skill vocabulary for autocomplete and write-time canonicalization, kept current the same way
+    skill_index.load(conn)
+
+def refresh_user_indexes(user_id):
+    # Applies another worker's signup/profile/ban to this worker's indexes (see cluster.py)
+    conn = get_db_connection()
+    try:
+        user = conn.execute("SELECT skills_offered, skills_wanted, is_public, is_banned FROM users WHERE id = ?", (user_id,)).fetchone()
+    finally:
+        conn.close()
+    if user is not None:
+        match_index.update_user(user_id, user['skills_offered'], user['skills_wanted'], is_public=user['is_public'], is_banned=user['is_banned'])
+        skill_index.update_user(user_id, user['skills_offered'], user['skills_wanted'])
+
+def reload_indexes():
+    conn = get_db_connection()
+    try:
+        load_indexes(conn)
+    finally:
+        conn.close()
+
+cluster.on('user', refresh_user_indexes)
+cluster.on('reload_indexes', reload_indexes)
+
+def init_worker(background_jobs=True, connections=1):
+    # Once per serving process, before it accepts traffic: indexes, static assets, pooled connections and
+    # the background threads. Under the pre-fork server only one worker runs the retention job.
+    global index_asset, write_behind, retention_job
+    with _init_lock:
+        if runtime['ready']:
+            return
+        reload_indexes()
+        # Serve static files from the 'html_templates' directory.
+        # index.html is read and gzip/brotli-compressed once and served from memory (see compression.py).
+        index_asset = StaticAsset.load(os.path.join(app.static_folder, 'index.html'), 'text/html')
+        db_pool.warm(connections)
+        if WRITE_BEHIND:
+            write_behind = GroupCommitWriter(db_pool.open_dedicated).start()
+        if background_jobs and RETENTION_INTERVAL:
+            retention_job = RetentionJob(db_pool.open_dedicated).start()
+        atexit.register(shutdown_app)
+        runtime['started_at'] = time.time()
+        runtime['ready'] = True
+
+def create_app(background_jobs=True):
+    # Fully initialized app for a single process: `python app.py`, the benchmark suite, gunicorn 'app:create_app()'
+    setup()
+    init_worker(background_jobs)
+    return app
+
+def begin_shutdown():
+    # Readiness goes false and SSE streams end (their clients reconnect elsewhere); requests still complete
+    runtime['draining'] = True
+    runtime['ready'] = False
+    broker.close()
+
+def shutdown_app():
+    # After the last request: flushes the writer and stops the background jobs
+    global write_behind, retention_job
+    with _init_lock:
+        begin_shutdown()
+        if retention_job is not None:
+            retention_job.stop()
+            retention_job = None
+        if write_behind is not None:
+            write_behind.stop()
+            write_behind = None
+        db_pool.close_all()
+
+@app.before_request
+def ensure_initialized():
+    # `flask run` and servers importing app:app get the same startup on their first request
+    if not runtime['ready'] and not runtime['draining']:
+        create_app()
+
+def cli_command(name):
+    # Like app.cli.command, but the schema is created or upgraded before the command runs
+    def decorator(f):
+        @functools.wraps(f)
+        def command(*args, **kwargs):
+            setup()
+            return f(*args, **kwargs)
+        return app.cli.command(name)(command)
+    return decorator
+
+@app.errorhandler(PaginationError)
+def handle_pagination_error(e):
+    return jsonify({"error": str(e)}), 400
+
+@app.errorhandler(BatchError)
+def handle_batch_error(e):
+    return jsonify({"error": str(e)}), 400
+
+@app.errorhandler(BulkError)
+def handle_bulk_error(e):
+    return jsonify({"error": str(e)}), 400
+
+@app.errorhandler(RequestEntityTooLarge)
+def handle_request_too_large(e):
+    return jsonify({"error": f"Upload too large (max {request.max_content_length // (1024 * 1024)} MB)"}), 413
+
+def allowed_file(filename):
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def user_select_columns(fields, *required):
+    # SELECT list (alias u, joined to user_rating_stats as rs) for the requested user fields;
+    # 'rating' is not a column but the embedded rating summary
+    columns = select_columns([field for field in fields if field != 'rating'], *required, prefix='u.')
+    if 'rating' in fields:
+        columns += ', ' + ', '.join(f"rs.{column}" for column in RATING_COLUMNS)
+    return columns
+
+def list_view(fields):
+    # List items carry a thumbnail URL next to the profile photo (see serialization.py)
+    return user_view(tuple(fields), thumbnail=True)
+
+def profile_json(cursor, user_id, fields=PROFILE_FIELDS):
+    # The user's profile as encoded JSON (null if there is no such user), from the per-user fragment cache
+    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    return user_fragments.encode_one(fetch_user_record(cursor), user_view(fields))
+
+@app.route('/')
+def serve_index():
+    if index_asset is None:
+        return send_from_directory(app.static_folder, 'index.html')
+    return index_asset.response()
+
+# Serve uploaded profile pictures
+@app.route('/uploads/<filename>')
+def uploaded_file(filename):
+    # Stored names are content hashes (or one-off UUIDs) and never rewritten, so they can be cached forever.
+    # send_file handles ETag/If-None-Match and Range requests.
+    wait_for_photo(filename)
+    response = send_from_directory(UPLOAD_FOLDER, filename, max_age=31536000, conditional=True, etag=True)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+# User authentication and profile management
+@app.route('/api/auth/signup', methods=['POST'])
+def signup():
+    data = request.get_json()
+    name = data.get('name')
+    password = data.get('password')
+    location = data.get('location', '')
+    # Near-duplicate spellings ("photoshop ", "Adobe Photoshop") are folded onto the established skill name
+    skills_offered = ','.join(skill_index.canonicalize(data.get('skillsOffered', [])))
+    skills_wanted = ','.join(skill_index.canonicalize(data.get('skillsWanted', [])))
+    availability = data.get('availability', '')
+    is_public = data.get('isPublic', True) # Default to public
+
+    if not name or not password:
+        return jsonify({"error": "Username and password are required"}), 400
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE name = ?", (name,))
+    if cursor.fetchone():
+        conn.close()
+        return jsonify({"error": "Username already exists"}), 409
+
+    user_id = str(uuid.uuid4())
+    # Hashing can take up to HASH_TIMEOUT: hand the pooled connection back meanwhile so a burst of signups
+    # cannot hold the whole pool
+    release_request_connection()
+    password_hash = hash_password(password) # bounded worker pool, 503 when saturated
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "INSERT INTO users (id, name, password_hash, location, skills_offered, skills_wanted, availability, is_public) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (user_id, name, password_hash, location, skills_offered, skills_wanted, availability, 1 if is_public else 0)
+        )
+        sync_user_index(conn, user_id, name, location, skills_offered, skills_wanted)
+        record_stats(conn, {'users': 1, 'public_users': 1 if is_public else 0}, {'signups': 1})
+        conn.commit()
+        match_index.update_user(user_id, skills_offered, skills_wanted, is_public=is_public, is_banned=False)
+        skill_index.update_user(user_id, skills_offered, skills_wanted)
+        cluster.announce('user', user_id)
+        response_cache.invalidate('users')
+        # Fetch the newly created profile to return
+        user_profile = profile_json(cursor, user_id)
+        log.debug("User signed up: %s, ID: %s", name, user_id)
+        return json_response(encode_object({"message": "User registered successfully", "userId": user_id, "userProfile": user_profile}), 201)
+    except sqlite3.IntegrityError:
+        # Taken by a concurrent signup while the password was being hashed
+        conn.rollback()
+        return jsonify({"error": "Username already exists"}), 409
+    except sqlite3.Error as e:
+        conn.rollback()
+        log.error("Database error during signup: %s", e)
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/auth/login', methods=['POST'])
+def login():
+    data = request.get_json()
+    name = data.get('name')
+    password = data.get('password')
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE name = ?", (name,))
+    user = fetch_user_record(cursor)
+    # Not needed while verifying (up to HASH_TIMEOUT); a burst of logins must not hold the whole pool
+    release_request_connection()
+
+    if user and password and verify_password(user['password_hash'], password):
+        # Transparently upgrade hashes made with an older method or cost
+        new_hash = rehash_if_needed(user['password_hash'], password)
+        if new_hash:
+            conn = get_db_connection()
+            conn.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_hash, user['id']))
+            conn.commit()
+            conn.close()
+            log.debug("Password hash upgraded for user ID: %s", user['id'])
+        user_profile = user_fragments.encode_one(user, user_view(PROFILE_FIELDS))
+        log.debug("User logged in: %s, ID: %s", name, user['id'])
+        return json_response(encode_object({"message": "Login successful", "userId": user['id'], "userProfile": user_profile}))
+    else:
+        log.debug("Failed login attempt for user: %s", name)
+        return jsonify({"error": "Invalid username or password"}), 401
+
+@app.route('/api/profile/<user_id>', methods=['GET'])
+@cached_response(tags=lambda user_id: [f'user:{user_id}'])
+def get_user_profile(user_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    # Rating summary comes from the pre-aggregated stats row, not from the feedback table
+    cursor.execute(
+        f"SELECT u.*, {', '.join(f'rs.{column}' for column in RATING_COLUMNS)} FROM users u {RATING_JOIN} WHERE u.id = ?",
+        (user_id,)
+    )
+    user = fetch_user_record(cursor)
+    conn.close()
+
+    if user:
+        log.debug("Fetched profile for user ID: %s", user_id)
+        return json_response(user_fragments.encode_one(user, user_view(PROFILE_FIELDS + ('rating',))))
+    else:
+        log.debug("Profile not found for user ID: %s", user_id)
+        return jsonify({"error": "User not found"}), 404
+
+@app.route('/api/profile/<user_id>', methods=['PUT'])
+def update_user_profile(user_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    # Check if user exists
+    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    user = cursor.fetchone()
+    if not user:
+        conn.close()
+        log.debug("Attempted to update non-existent user ID: %s", user_id)
+        return jsonify({"error": "User not found"}), 404
+
+    profile_photo_path = user['profile_photo'] # Default to existing photo
+
+    if 'profilePhoto' in request.files and request.files['profilePhoto'].filename != '':
+        file = request.files['profilePhoto']
+        if file and allowed_file(file.filename):
+            # Re-encoded, thumbnailed and deduplicated by content hash on the image worker pool (see images.py)
+            try:
+                filename = store_profile_photo(UPLOAD_FOLDER, file.read(MAX_UPLOAD_BYTES + 1), file.filename)
+            except ImageRejected as e:
+                conn.close()
+                log.debug("Rejected profile photo upload for user %s: %s", user_id, e)
+                return jsonify({"error": str(e)}), 400
+            profile_photo_path = f"/uploads/{filename}" # Store relative URL
+            log.debug("File uploaded for user %s: %s", user_id, filename)
+        else:
+            log.debug("Invalid file type for profile photo upload for user %s", user_id)
+            return jsonify({"error": "Invalid file type for profile photo"}), 400
+    else:
+        # If no new file uploaded, check if profilePhotoUrl was provided in form (if FormData) or JSON
+        if request.is_json:
+            data = request.get_json()
+            profile_photo_path = data.get('profilePhotoUrl', user['profile_photo'])
+            log.debug("Using JSON profilePhotoUrl for user %s: %s", user_id, profile_photo_path)
+        else: # It's a FormData request without a file
+            profile_photo_path = request.form.get('profilePhotoUrl', user['profile_photo'])
+            log.debug("Using FormData profilePhotoUrl for user %s: %s", user_id, profile_photo_path)
+
+
+    # Get other fields from request.form if it's a file upload, otherwise from request.get_json()
+    if request.is_json:
+        data = request.get_json()
+        name = data.get('name', user['name'])
+        location = data.get('location', user['location'])
+        skills_offered = ','.join(skill_index.canonicalize(data.get('skillsOffered', user['skills_offered'])))
+        skills_wanted = ','.join(skill_index.canonicalize(data.get('skillsWanted', user['skills_wanted'])))
+        availability = data.get('availability', user['availability'])
+        is_public = data.get('isPublic', user['is_public']) # Already boolean from frontend
+        theme = data.get('theme', user['theme'])
+    else: # It's a FormData request
+        name = request.form.get('name', user['name'])
+        location = request.form.get('location', user['location'])
+        # For skills, request.form.getlist is safer for comma-separated if sent as multiple fields,
+        # but if it's a single string, .get() is fine. Assuming single string for simplicity.
+        skills_offered_str = request.form.get('skillsOffered', user['skills_offered'])
+        skills_offered = ','.join(skill_index.canonicalize(skills_offered_str))
+
+        skills_wanted_str = request.form.get('skillsWanted', user['skills_wanted'])
+        skills_wanted = ','.join(skill_index.canonicalize(skills_wanted_str))
+
+        availability = request.form.get('availability', user['availability'])
+        is_public = int(request.form.get('isPublic', user['is_public']))
+        theme = request.form.get('theme', user['theme'])
+
+
+    try:
+        conn.execute("BEGIN IMMEDIATE") # the counter delta needs the visibility as of this write, not as first read
+        cursor.execute("SELECT is_public, is_admin FROM users WHERE id = ?", (user_id,))
+        old = cursor.fetchone()
+        if old is None:
+            conn.rollback()
+            log.debug("User %s was deleted during the profile update", user_id)
+            return jsonify({"error": "User not found"}), 404
+        cursor.execute(
+            "UPDATE users SET name = ?, location = ?, skills_offered = ?, skills_wanted = ?, availability = ?, is_public = ?, profile_photo = ?, theme = ? WHERE id = ?",
+            (name, location, skills_offered, skills_wanted, availability, 1 if is_public else 0, profile_photo_path, theme, user_id)
+        )
+        sync_user_index(conn, user_id, name, location, skills_offered, skills_wanted)
+        if not old['is_admin']:
+            record_stats(conn, {'public_users': (1 if is_public else 0) - (1 if old['is_public'] else 0)})
+        conn.commit()
+        match_index.update_user(user_id, skills_offered, skills_wanted, is_public=is_public)
+        skill_index.update_user(user_id, skills_offered, skills_wanted)
+        cluster.announce('user', user_id)
+        response_cache.invalidate(f'user:{user_id}', 'users')
+        user_fragments.invalidate(user_id)
+        # Fetch updated profile to return
+        updated_user_profile = profile_json(cursor, user_id)
+        log.debug("Profile updated successfully for user ID: %s", user_id)
+        return json_response(updated_user_profile)
+    except sqlite3.Error as e:
+        conn.rollback()
+        log.error("Database error during profile update for user %s: %s", user_id, e)
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/users', methods=['GET'])
+@cached_response(tags=lambda: ['users'])
+def get_users():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    search_term = request.args.get('searchTerm', '').strip()
+    offers = request.args.getlist('offers') # exact skill filters, e.g. ?offers=Photoshop&wants=Excel
+    wants = request.args.getlist('wants')
+
+    fields = parse_fields(request.args, USER_LIST_FIELDS)
+    limit, page_cursor = parse_page_args(request.args)
+
+    # Full-text search ranked by relevance, exact skill filters served from the user_skills index
+    query, params, sort_key, descending = build_user_search(
+        user_select_columns(fields, 'id', 'created_at'), search_term, offers, wants, joins=[RATING_JOIN]
+    )
+    query, params = paginate_query(query, params, sort_key, 'id', limit, page_cursor, descending)
+
+    cursor.execute(query, params)
+    users, next_cursor = split_page(fetch_user_records(cursor), limit, sort_key, 'id')
+    conn.close()
+
+    # Unchanged users are served from their cached JSON fragments
+    log.debug("Fetched %s public users.", len(users))
+    return paginated_response(encode_array(user_fragments.encode(users, list_view(fields))), next_cursor), 200
+
+# Partners of a user's non-rejected swaps, live or archived (accepted swaps are archived after retention)
+SWAPPED_PARTNERS_QUERY = " UNION ".join(
+    f"SELECT receiver_id AS other_id FROM {table} WHERE sender_id = ? AND status != 'rejected' "
+    f"UNION SELECT sender_id FROM {table} WHERE receiver_id = ? AND status != 'rejected'"
+    for table, _ in swap_request_tables(include_archived=True)
+)
+SWAPPED_PARTNERS_PARAMS = 2 * len(swap_request_tables(include_archived=True))
+
+@app.route('/api/matches/<user_id>', methods=['GET'])
+def get_matches(user_id):
+    # Reciprocal matches: users who offer what user_id wants AND want what user_id offers
+    try:
+        limit = min(int(request.args.get('limit', 20)), 100)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if not match_index.has_user(user_id):
+        log.debug("Matches requested for unknown user ID: %s", user_id)
+        return jsonify({"error": "User not found"}), 404
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    # Skip users this user already has a pending or accepted swap with, in either direction
+    cursor.execute(SWAPPED_PARTNERS_QUERY, (user_id,) * SWAPPED_PARTNERS_PARAMS)
+    already_requested = [row['other_id'] for row in cursor.fetchall()]
+    matches = match_index.match(user_id, exclude=already_requested, limit=limit)
+    if not matches:
+        conn.close()
+        return jsonify([]), 200
+
+    ids = [match[0] for match in matches]
+    cursor.execute(
+        f"SELECT {user_select_columns(USER_LIST_FIELDS)} FROM users u {RATING_JOIN} WHERE u.id IN ({', '.join('?' * len(ids))})", ids
+    )
+    users = fetch_user_records(cursor)
+    conn.close()
+
+    users_by_id = {user['id']: user for user in users}
+    build = list_view(USER_LIST_FIELDS).builder(users[0].positions) if users else None
+    results = []
+    for other_id, score, offers_you_want, wants_you_offer in matches:
+        user = users_by_id.get(other_id)
+        if user is None:
+            continue
+        user_dict = build(user.values)
+        user_dict['score'] = score
+        user_dict['offers_you_want'] = offers_you_want
+        user_dict['wants_you_offer'] = wants_you_offer
+        results.append(user_dict)
+    log.debug("Found %s matches for user ID: %s", len(results), user_id)
+    return jsonify(results), 200
+
+# Real-time updates (Server-Sent Events)
+def publish_swap_request_event(action, swap_request):
+    # Called after commit; both participants receive the delta
+    if swap_request is None:
+        return
+    swap_request = dict(swap_request)
+    broker.publish(
+        'swap_request', {"action": action, "request": swap_request},
+        [user_topic(swap_request['sender_id']), user_topic(swap_request['receiver_id'])]
+    )
+
+@app.route('/api/skills/suggest', methods=['GET'])
+def suggest_skills():
+    # Autocomplete from the in-memory skill index; ?kind=offered|wanted ranks by that side only
+    prefix = request.args.get('prefix', '')
+    kind = request.args.get('kind')
+    if kind not in (None, 'offered', 'wanted'):
+        return jsonify({"error": "kind must be 'offered' or 'wanted'"}), 400
+    try:
+        limit = min(int(request.args.get('limit', DEFAULT_SUGGESTIONS)), MAX_SUGGESTIONS)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    suggestions = skill_index.suggest(prefix, limit, kind)
+    return jsonify([
+        {"skill": skill, "offered": offered, "wanted": wanted} for skill, offered, wanted in suggestions
+    ]), 200
+
+@app.route('/api/events/<user_id>', methods=['GET'])
+def stream_events(user_id):
+    # Pushes swap_request deltas for this user and platform_message broadcasts.
+    # EventSource resends the last id it saw as Last-Event-ID when it reconnects.
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    subscription = broker.subscribe([user_topic(user_id), BROADCAST], last_event_id)
+    log.debug("Event stream opened for user ID: %s", user_id)
+    # The generator needs no request context, so the request (and its pooled connection) ends right away
+    response = Response(broker.stream(subscription), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # keep reverse proxies from buffering the stream
+    return response
+
+# Swap Request Endpoints
+@app.route('/api/swap_requests', methods=['POST'])
+def create_swap_request():
+    data = request.get_json()
+    sender_id = data.get('senderId')
+    sender_name = data.get('senderName')
+    receiver_id = data.get('receiverId')
+    receiver_name = data.get('receiverName')
+    skill_offered = data.get('skillOffered')
+    skill_wanted = data.get('skillWanted')
+
+    if not all([sender_id, sender_name, receiver_id, receiver_name, skill_offered, skill_wanted]):
+        log.debug("Error: Missing required fields for swap request.")
+        return jsonify({"error": "Missing required fields"}), 400
+
+    request_id = str(uuid.uuid4())
+
+    def write(conn):
+        conn.execute(
+            "INSERT INTO swap_requests (id, sender_id, sender_name, receiver_id, receiver_name, skill_offered, skill_wanted) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (request_id, sender_id, sender_name, receiver_id, receiver_name, skill_offered, skill_wanted)
+        )
+        record_stats(conn, {'swap_requests_pending': 1}, {'swap_requests_created': 1})
+        return conn.execute("SELECT * FROM swap_requests WHERE id = ?", (request_id,)).fetchone()
+
+    try:
+        swap_request = run_write(write)
+        publish_swap_request_event('created', swap_request)
+        log.debug("Swap request created: ID=%s, Sender=%s, Receiver=%s", request_id, sender_name, receiver_name)
+        return jsonify({"message": "Swap request sent successfully", "requestId": request_id}), 201
+    except sqlite3.Error as e:
+        log.error("Database error creating swap request: %s", e)
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+
+def user_swap_requests_query(user_id, fields, limit=None, page_cursor=None, include_archived=False):
+    # Requests where the user is sender OR receiver, as a UNION ALL so each side is a range scan
+    # on its (sender_id|receiver_id, created_at, id) index instead of a full table scan for the OR.
+    # include_archived adds the same two scans over the archive, with an `archived` flag column
+    columns = select_columns(fields, 'id', 'created_at')
+    parts, params = [], []
+    for table, archived in swap_request_tables(include_archived):
+        flag = f", {archived} AS archived" if include_archived else ''
+        parts.append(f"SELECT {columns}{flag} FROM {table} WHERE sender_id = ?")
+        parts.append(f"SELECT {columns}{flag} FROM {table} WHERE receiver_id = ? AND sender_id != ?")
+        params.extend((user_id, user_id, user_id))
+    return paginate_query(" UNION ALL ".join(parts), params, 'created_at', 'id', limit, page_cursor)
+
+def swap_request_dicts(rows, fields, include_archived):
+    output_fields = list(fields) + (['archived'] if include_archived else [])
+    return [{field: row[field] for field in output_fields} for row in rows]
+
+@app.route('/api/swap_requests/<user_id>', methods=['GET'])
+def get_user_swap_requests(user_id):
+    fields = parse_fields(request.args, SWAP_REQUEST_FIELDS)
+    limit, page_cursor = parse_page_args(request.args)
+    include_archived = parse_include_archived(request.args)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    query, params = user_swap_requests_query(user_id, fields, limit, page_cursor, include_archived)
+    cursor.execute(query, params)
+    requests, next_cursor = split_page(cursor.fetchall(), limit, 'created_at', 'id')
+    conn.close()
+    log.debug("Fetched %s swap requests for user ID: %s", len(requests), user_id)
+    return paginated_response(swap_request_dicts(requests, fields, include_archived), next_cursor), 200
+
+@app.route('/api/swap_requests/<request_id>', methods=['PUT'])
+def update_swap_request_status(request_id):
+    data = request.get_json()
+    new_status = data.get('status') # 'accepted' or 'rejected'
+
+    if new_status not in ['accepted', 'rejected']:
+        log.debug("Invalid status update attempt for request %s: %s", request_id, new_status)
+        return jsonify({"error": "Invalid status"}), 400
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        conn.execute("BEGIN IMMEDIATE") # the old status must not change between the read and the update
+        cursor.execute("SELECT status FROM swap_requests WHERE id = ?", (request_id,))
+        old = cursor.fetchone()
+        if old is None:
+            conn.rollback()
+            log.debug("Swap request %s not found for status update.", request_id)
+            return jsonify({"error": "Swap request not found"}), 404
+        cursor.execute("UPDATE swap_requests SET status = ? WHERE id = ?", (new_status, request_id))
+        record_stats(conn, *swap_status_change(old['status'], new_status))
+        conn.commit()
+        cursor.execute("SELECT * FROM swap_requests WHERE id = ?", (request_id,))
+        publish_swap_request_event('updated', cursor.fetchone())
+        status_message = "accepted" if new_status == 'accepted' else "rejected"
+        log.debug("Swap request %s status updated to: %s", request_id, status_message)
+        return jsonify({"message": f"Swap request {new_status} successfully"}), 200
+    except sqlite3.Error as e:
+        conn.rollback()
+        log.error("Database error updating swap request %s status: %s", request_id, e)
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/swap_requests/<request_id>', methods=['DELETE'])
+def delete_swap_request(request_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        # Read the row first so the deletion event can reach both participants; under the write lock, so the
+        # status whose counter is decremented is the one being deleted
+        conn.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT * FROM swap_requests WHERE id = ?", (request_id,))
+        deleted_request = cursor.fetchone()
+        if deleted_request is None:
+            conn.rollback()
+            log.debug("Swap request %s not found for deletion.", request_id)
+            return jsonify({"error": "Swap request not found"}), 404
+        cursor.execute("DELETE FROM swap_requests WHERE id = ?", (request_id,))
+        record_stats(conn, {swap_status_counter(deleted_request['status']): -1})
+        conn.commit()
+        publish_swap_request_event('deleted', deleted_request)
+        log.debug("Swap request %s deleted successfully.", request_id)
+        return jsonify({"message": "Swap request deleted successfully"}), 200
+    except sqlite3.Error as e:
+        conn.rollback()
+        log.error("Database error deleting swap request %s: %s", request_id, e)
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    finally:
+        conn.close()
+
+# Batch endpoints: many operations in one transaction, one result per item (semantics in batch.py)
+SWAP_REQUEST_CREATE_KEYS = ('senderId', 'senderName', 'receiverId', 'receiverName', 'skillOffered', 'skillWanted')
+
+@app.route('/api/swap_requests/batch', methods=['POST'])
+def batch_create_swap_requests():
+    items, atomic = parse_batch(request.get_json(silent=True), 'requests')
+    results = BatchResults(len(items))
+    rows = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not all(item.get(key) for key in SWAP_REQUEST_CREATE_KEYS):
+            results.fail(index, None, 400, "Missing required fields")
+            continue
+        request_id = str(uuid.uuid4())
+        rows.append((request_id, *(item[key] for key in SWAP_REQUEST_CREATE_KEYS)))
+        results.succeed(index, request_id, 201)
+
+    def work(conn):
+        conn.executemany(
+            "INSERT INTO swap_requests (id, sender_id, sender_name, receiver_id, receiver_name, skill_offered, skill_wanted) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        record_stats(conn, {'swap_requests_pending': len(rows)}, {'swap_requests_created': len(rows)})
+
+    conn = get_db_connection()
+    try:
+        applied = run_in_transaction(conn, results, atomic, work)
+        if applied:
+            for swap_request in fetch_rows_by_id(conn, 'swap_requests', [row[0] for row in rows]).values():
+                publish_swap_request_event('created', swap_request)
+    except sqlite3.Error as e:
+        log.error("Database error creating swap request batch: %s", e)
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    finally:
+        conn.close()
+    log.debug("Swap request batch: %s items, %s failed, applied=%s", len(items), results.failed, applied)
+    return results.response(applied, success_status=201)
+
+@app.route('/api/swap_requests/batch/status', methods=['PUT'])
+def batch_update_swap_request_status():
+    items, atomic = parse_batch(request.get_json(silent=True), 'updates')
+    results = BatchResults(len(items))
+    updates = {} # request id -> (index, new status)
+    for index, item in enumerate(items):
+        request_id = item.get('id') if isinstance(item, dict) else None
+        if not request_id:
+            results.fail(index, None, 400, "Missing id")
+        elif item.get('status') not in ['accepted', 'rejected']:
+            results.fail(index, request_id, 400, "Invalid status")
+        elif results.claim(index, request_id):
+            updates[request_id] = (index, item['status'])
+    updated = []
+
+    def work(conn):
+        existing = fetch_rows_by_id(conn, 'swap_requests', updates)
+        counters, daily = {}, {}
+        for request_id, (index, new_status) in updates.items():
+            if request_id in existing:
+                updated.append(dict(existing[request_id], status=new_status))
+                results.succeed(index, request_id)
+                for totals, deltas in zip((counters, daily), swap_status_change(existing[request_id]['status'], new_status)):
+                    for name, delta in deltas.items():
+                        totals[name] = totals.get(name, 0) + delta
+            else:
+                results.fail(index, request_id, 404, "Swap request not found")
+        conn.executemany(
+            "UPDATE swap_requests SET status = ? WHERE id = ?",
+            [(swap_request['status'], swap_request['id']) for swap_request in updated]
+        )
+        record_stats(conn, counters, daily)
+
+    conn = get_db_connection()
+    try:
+        applied = run_in_transaction(conn, results, atomic, work)
+    except sqlite3.Error as e:
+        log.error("Database error updating swap request status batch: %s", e)
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    finally:
+        conn.close()
+    if applied:
+        for swap_request in updated:
+            publish_swap_request_event('updated', swap_request)
+    log.debug("Swap request status batch: %s items, %s failed, applied=%s", len(items), results.failed, applied)
+    return results.response(applied)
+
+@app.route('/api/swap_requests/batch/delete', methods=['POST'])
+def batch_delete_swap_requests():
+    # POST rather than DELETE: request bodies on DELETE are dropped by some clients and proxies
+    items, atomic = parse_batch(request.get_json(silent=True), 'ids')
+    results = BatchResults(len(items))
+    ids = {} # request id -> index
+    for index, request_id in enumerate(items):
+        if not isinstance(request_id, str) or not request_id:
+            results.fail(index, None, 400, "Missing id")
+        elif results.claim(index, request_id):
+            ids[request_id] = index
+    deleted = []
+
+    def work(conn):
+        existing = fetch_rows_by_id(conn, 'swap_requests', ids)
+        for request_id, index in ids.items():
+            if request_id in existing:
+                deleted.append(existing[request_id])
+                results.succeed(index, request_id)
+            else:
+                results.fail(index, request_id, 404, "Swap request not found")
+        conn.executemany("DELETE FROM swap_requests WHERE id = ?", [(swap_request['id'],) for swap_request in deleted])
+        counters = {}
+        for swap_request in deleted:
+            name = swap_status_counter(swap_request['status'])
+            counters[name] = counters.get(name, 0) - 1
+        record_stats(conn, counters)
+
+    conn = get_db_connection()
+    try:
+        applied = run_in_transaction(conn, results, atomic, work)
+    except sqlite3.Error as e:
+        log.error("Database error deleting swap request batch: %s", e)
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    finally:
+        conn.close()
+    if applied:
+        for swap_request in deleted:
+            publish_swap_request_event('deleted', swap_request)
+    log.debug("Swap request delete batch: %s items, %s failed, applied=%s", len(items), results.failed, applied)
+    return results.response(applied)
+
+# Feedback Endpoints
+@app.route('/api/feedback', methods=['POST'])
+def submit_feedback():
+    data = request.get_json()
+    swap_request_id = data.get('swapRequestId')
+    giver_id = data.get('giverId')
+    receiver_id = data.get('receiverId')
+    rating = data.get('rating')
+    comment = data.get('comment')
+
+    if not all([swap_request_id, giver_id, receiver_id, rating is not None]):
+        log.debug("Error: Missing required feedback fields.")
+        return jsonify({"error": "Missing required feedback fields"}), 400
+    rating = parse_rating(rating)
+    if rating is None:
+        log.debug("Error: Invalid feedback rating.")
+        return jsonify({"error": "Rating must be a whole number from 1 to 5"}), 400
+
+    feedback_id = str(uuid.uuid4())
+
+    def write(conn):
+        conn.execute(
+            "INSERT INTO feedback (id, swap_request_id, giver_id, receiver_id, rating, comment) VALUES (?, ?, ?, ?, ?, ?)",
+            (feedback_id, swap_request_id, giver_id, receiver_id, rating, comment)
+        )
+        # Keep the receiver's rating aggregates in the same transaction as the feedback row
+        record_rating(conn, receiver_id, rating)
+        record_stats(conn, {'feedback': 1}, {'feedback': 1})
+
+    try:
+        run_write(write)
+        response_cache.invalidate(f'user:{receiver_id}', 'users') # embedded rating summaries changed
+        user_fragments.invalidate(receiver_id)
+        log.debug("Feedback submitted for swap %s by %s.", swap_request_id, giver_id)
+        return jsonify({"message": "Feedback submitted successfully", "feedbackId": feedback_id}), 201
+    except sqlite3.Error as e:
+        log.error("Database error submitting feedback: %s", e)
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+
+@app.route('/api/feedback', methods=['GET'])
+def get_all_feedback():
+    fields = parse_fields(request.args, FEEDBACK_FIELDS)
+    limit, page_cursor = parse_page_args(request.args)
+    receiver_id = request.args.get('receiverId') # optional: only feedback received by this user
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    query = f"SELECT {select_columns(fields, 'id', 'created_at')} FROM feedback"
+    params = ()
+    if receiver_id:
+        query += " WHERE receiver_id = ?"
+        params = (receiver_id,)
+    query, params = paginate_query(query, params, 'created_at', 'id', limit, page_cursor)
+    cursor.execute(query, params)
+    feedback_logs, next_cursor = split_page(cursor.fetchall(), limit, 'created_at', 'id')
+    conn.close()
+    log.debug("Fetched %s feedback logs.", len(feedback_logs))
+    return paginated_response([{field: log[field] for field in fields} for log in feedback_logs], next_cursor), 200
+
+# Admin Endpoints
+@app.route('/api/admin/users', methods=['GET'])
+def admin_get_users():
+    # In a real app, you'd add authentication/authorization for admin access here
+    fields = parse_fields(request.args, ADMIN_USER_FIELDS)
+    limit, page_cursor = parse_page_args(request.args)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    query, params = paginate_query(
+        f"SELECT {select_columns(fields, 'id', 'created_at')} FROM users", (),
+        'created_at', 'id', limit, page_cursor
+    )
+    cursor.execute(query, params)
+    users, next_cursor = split_page(fetch_user_records(cursor), limit, 'created_at', 'id')
+    conn.close()
+    log.debug("Admin fetched %s users.", len(users))
+    return paginated_response(encode_array(user_fragments.encode(users, list_view(fields))), next_cursor), 200
+
+@app.route('/api/admin/users/<user_id>/ban', methods=['PUT'])
+def admin_ban_user(user_id):
+    # In a real app, you'd add authentication/authorization for admin access here
+    data = request.get_json()
+    is_banned = data.get('isBanned') # 0 for unban, 1 for ban
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT is_banned, is_admin FROM users WHERE id = ?", (user_id,))
+        old = cursor.fetchone()
+        if old is None:
+            conn.rollback()
+            log.debug("Admin: User %s not found for ban/unban.", user_id)
+            return jsonify({"error": "User not found"}), 404
+        cursor.execute("UPDATE users SET is_banned = ? WHERE id = ?", (is_banned, user_id))
+        if not old['is_admin']:
+            record_stats(conn, {'banned_users': (1 if is_banned else 0) - (1 if old['is_banned'] else 0)})
+        conn.commit()
+        match_index.set_banned(user_id, is_banned)
+        cluster.announce('user', user_id)
+        response_cache.invalidate(f'user:{user_id}', 'users')
+        user_fragments.invalidate(user_id)
+        status_message = "banned" if is_banned else "unbanned"
+        log.debug("Admin: User %s %s successfully.", user_id, status_message)
+        return jsonify({"message": f"User {user_id} {status_message} successfully"}), 200
+    except sqlite3.Error as e:
+        conn.rollback()
+        log.error("Admin: Database error during ban/unban for user %s: %s", user_id, e)
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/admin/users/batch/ban', methods=['PUT'])
+def admin_batch_ban_users():
+    # In a real app, you'd add authentication/authorization for admin access here
+    items, atomic = parse_batch(request.get_json(silent=True), 'users')
+    results = BatchResults(len(items))
+    changes = {} # user id -> (index, is_banned)
+    for index, item in enumerate(items):
+        user_id = item.get('id') if isinstance(item, dict) else None
+        if not user_id:
+            results.fail(index, None, 400, "Missing id")
+        elif item.get('isBanned') not in (0, 1): # also matches true/false
+            results.fail(index, user_id, 400, "isBanned must be 0 or 1")
+        elif results.claim(index, user_id):
+            changes[user_id] = (index, int(item['isBanned']))
+    changed = []
+
+    def work(conn):
+        existing = fetch_rows_by_id(conn, 'users', changes, columns='id, is_banned, is_admin')
+        banned_delta = 0
+        for user_id, (index, is_banned) in changes.items():
+            if user_id in existing:
+                changed.append((is_banned, user_id))
+                results.succeed(index, user_id)
+                if not existing[user_id]['is_admin']:
+                    banned_delta += is_banned - (1 if existing[user_id]['is_banned'] else 0)
+            else:
+                results.fail(index, user_id, 404, "User not found")
+        conn.executemany("UPDATE users SET is_banned = ? WHERE id = ?", changed)
+        record_stats(conn, {'banned_users': banned_delta})
+
+    conn = get_db_connection()
+    try:
+        applied = run_in_transaction(conn, results, atomic, work)
+    except sqlite3.Error as e:
+        log.error("Admin: Database error during batch ban/unban: %s", e)
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    finally:
+        conn.close()
+    if applied and changed:
+        for is_banned, user_id in changed:
+            match_index.set_banned(user_id, is_banned)
+            cluster.announce('user', user_id)
+        response_cache.invalidate('users', *(f'user:{user_id}' for _, user_id in changed))
+        user_fragments.invalidate(*(user_id for _, user_id in changed))
+    log.debug("Admin: Ban batch: %s items, %s failed, applied=%s", len(items), results.failed, applied)
+    return results.response(applied)
+
+LATEST_PLATFORM_MESSAGE_QUERY = "SELECT message FROM platform_messages WHERE id = (SELECT MAX(id) FROM platform_messages)"
+
+@app.route('/api/admin/platform_message', methods=['GET'])
+@cached_response(tags=lambda: ['platform_message'])
+def get_platform_message():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    # platform_messages is insert-only, so the newest row is simply the highest rowid (a single b-tree seek)
+    cursor.execute(LATEST_PLATFORM_MESSAGE_QUERY)
+    message = cursor.fetchone()
+    conn.close()
+    if message:
+        log.debug("Admin: Fetched platform message: %s", message['message'])
+        return jsonify({"message": message['message']}), 200
+    log.debug("Admin: No platform message found.")
+    return jsonify({"message": ""}), 200 # No message set yet
+
+@app.route('/api/admin/platform_message', methods=['POST'])
+def set_platform_message():
+    # In a real app, you'd add authentication/authorization for admin access here
+    data = request.get_json()
+    message = data.get('message')
+
+    if message is None:
+        log.debug("Admin: Error - message content is required for platform message.")
+        return jsonify({"error": "Message content is required"}), 400
+
+    try:
+        # Clear previous messages or just add new one, for simplicity, we'll just add
+        run_write(lambda conn: conn.execute("INSERT INTO platform_messages (message) VALUES (?)", (message,)))
+        response_cache.invalidate('platform_message')
+        broker.publish('platform_message', {"message": message}, [BROADCAST])
+        log.debug("Admin: Platform message set to: %s", message)
+        return jsonify({"message": "Platform message updated successfully"}), 200
+    except sqlite3.Error as e:
+        log.error("Admin: Database error setting platform message: %s", e)
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+
+def all_swap_requests_query(fields, limit=None, page_cursor=None, include_archived=False):
+    columns = select_columns(fields, 'id', 'created_at')
+    parts = [
+        f"SELECT {columns}" + (f", {archived} AS archived" if include_archived else '') + f" FROM {table}"
+        for table, archived in swap_request_tables(include_archived)
+    ]
+    return paginate_query(" UNION ALL ".join(parts), (), 'created_at', 'id', limit, page_cursor)
+
+@app.route('/api/admin/swap_requests', methods=['GET'])
+def admin_get_all_swap_requests():
+    # In a real app, you'd add authentication/authorization for admin access here
+    fields = parse_fields(request.args, SWAP_REQUEST_FIELDS)
+    limit, page_cursor = parse_page_args(request.args)
+    include_archived = parse_include_archived(request.args)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    query, params = all_swap_requests_query(fields, limit, page_cursor, include_archived)
+    cursor.execute(query, params)
+    requests, next_cursor = split_page(cursor.fetchall(), limit, 'created_at', 'id')
+    conn.close()
+    log.debug("Admin: Fetched %s total swap requests.", len(requests))
+    return paginated_response(swap_request_dicts(requests, fields, include_archived), next_cursor), 200
+
+MAX_IMPORT_BYTES = int(os.environ.get('MAX_IMPORT_BYTES', 1024 * 1024 * 1024))
+
+@app.route('/api/admin/export/<table>', methods=['GET'])
+def admin_export_table(table):
+    # In a real app, you'd add authentication/authorization for admin access here
+    # Streams the whole table (?format=ndjson|csv) without building it in memory; gzipped for clients that accept it
+    fmt = request.args.get('format', 'ndjson')
+    compress = request.accept_encodings.quality('gzip') > 0
+    stream = export_stream(db_pool.open_dedicated, table, fmt, compress=compress)
+    response = Response(stream, mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={table}.{fmt}'
+    response.vary.add('Accept-Encoding')
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    log.debug("Admin: Streaming %s export of %s.", fmt, table)
+    return response
+
+@app.route('/api/admin/import/<table>', methods=['POST'])
+def admin_import_table(table):
+    # In a real app, you'd add authentication/authorization for admin access here
+    # NDJSON body (optionally Content-Encoding: gzip), one row per line; see bulk.py for the row format
+    if table not in TABLE_COLUMNS:
+        raise BulkError(f"Unknown table '{table}'")
+    request.max_content_length = MAX_IMPORT_BYTES
+    lines = request.stream
+    if request.content_encoding == 'gzip':
+        lines = gzip.GzipFile(fileobj=request.stream)
+    conn = db_pool.open_dedicated()
+    summary = ImportSummary(table)
+    try:
+        import_ndjson(conn, table, lines, summary=summary)
+    except (OSError, EOFError) as e: # truncated or corrupt gzip body; the chunks before it are committed
+        return jsonify(dict(summary.as_dict(), error=f"Could not read request body: {e}")), 400
+    finally:
+        try:
+            if summary.imported:
+                refresh_after_import(conn, table)
+        finally:
+            conn.close()
+    log.debug("Admin: Imported %s of %s %s rows.", summary.imported, summary.read, table)
+    return jsonify(summary.as_dict()), 207 if summary.failed else 200
+
+def refresh_after_import(conn, table):
+    # Bulk-written rows bypass the per-row write paths, so rebuild the in-memory indexes and drop cached responses
+    if table == 'users':
+        load_indexes(conn)
+        cluster.announce('reload_indexes')
+    response_cache.clear()
+    user_fragments.clear()
+
+TOP_SKILLS = 10
+
+@app.route('/api/admin/stats', methods=['GET'])
+def admin_get_platform_stats():
+    # In a real app, you'd add authentication/authorization for admin access here
+    # Dashboard numbers from the pre-aggregated counters (platform_stats.py), never from scans of the base tables
+    try:
+        first, last = parse_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    conn = get_db_connection()
+    try:
+        counters = read_counters(conn)
+        series = read_daily_series(conn, first, last)
+    finally:
+        conn.close()
+    swap_requests = {status: counters.get(f'swap_requests_{status}', 0) for status in SWAP_STATUSES}
+    swap_requests['total'] = sum(swap_requests.values())
+    return jsonify({
+        "totals": {
+            "users": counters.get('users', 0),
+            "public_users": counters.get('public_users', 0),
+            "banned_users": counters.get('banned_users', 0),
+            "swap_requests": swap_requests,
+            "feedback": counters.get('feedback', 0),
+        },
+        "daily": {"from": first.isoformat(), "to": last.isoformat(), "series": series},
+        # Most offered/wanted skills come from the in-memory skill index (skills.py)
+        "top_skills": {
+            kind: [{"skill": skill, "users": users} for skill, users in skill_index.top(kind, TOP_SKILLS)]
+            for kind in ('offered', 'wanted')
+        },
+    }), 200
+
+@app.route('/api/admin/db_pool', methods=['GET'])
+def admin_get_db_pool_stats():
+    # In a real app, you'd add authentication/authorization for admin access here
+    return jsonify(db_pool.stats()), 200
+
+@app.route('/api/admin/password_hash_stats', methods=['GET'])
+def admin_get_password_hash_stats():
+    # In a real app, you'd add authentication/authorization for admin access here
+    return jsonify(password_hash_stats()), 200
+
+@app.route('/api/admin/event_stats', methods=['GET'])
+def admin_get_event_stats():
+    # In a real app, you'd add authentication/authorization for admin access here
+    return jsonify(broker.stats()), 200
+
+@app.route('/api/admin/cache_stats', methods=['GET'])
+def admin_get_cache_stats():
+    # In a real app, you'd add authentication/authorization for admin access here
+    return jsonify(dict(response_cache.stats(), user_fragments=user_fragments.stats())), 200
+
+@app.route('/api/admin/writer_stats', methods=['GET'])
+def admin_get_writer_stats():
+    # In a real app, you'd add authentication/authorization for admin access here
+    if write_behind is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify(dict(write_behind.stats(), enabled=True)), 200
+
+@app.route('/api/admin/retention_stats', methods=['GET'])
+def admin_get_retention_stats():
+    # In a real app, you'd add authentication/authorization for admin access here
+    if retention_job is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify(dict(retention_job.stats(), enabled=True)), 200
+
+@app.route('/api/admin/slow_queries', methods=['GET'])
+def admin_get_slow_queries():
+    # In a real app, you'd add authentication/authorization for admin access here
+    return jsonify(metrics.slow_queries()), 200
+
+# Liveness: the process is up and serving requests
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({"status": "ok", "pid": os.getpid()}), 200
+
+# Readiness: warmed up, not draining, and the database answers; load balancers should route on this one
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    status = {"pid": os.getpid(), "ready": runtime['ready'], "draining": runtime['draining'], "cluster": cluster.attached()}
+    if not runtime['ready']:
+        return jsonify(dict(status, status="draining" if runtime['draining'] else "starting")), 503
+    conn = get_db_connection()
+    try:
+        status['schema_version'] = conn.execute("PRAGMA user_version").fetchone()[0]
+    except sqlite3.Error as e:
+        log.warning("Readiness check failed: %s", e)
+        return jsonify(dict(status, status="database unavailable")), 503
+    finally:
+        conn.close()
+    status['uptime'] = time.time() - runtime['started_at']
+    return jsonify(dict(status, status="ready")), 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus scrape endpoint: request/SQL histograms plus a snapshot of every subsystem's counters
+    gauges = {}
+    for prefix, stats in (
+        ('db_pool', db_pool.stats()),
+        ('response_cache', response_cache.stats()),
+        ('password_hash', password_hash_stats()),
+        ('events', broker.stats()),
+        ('match_index', match_index.stats()),
+        ('skill_index', skill_index.stats()),
+        ('user_fragments', user_fragments.stats()),
+        ('writer', write_behind.stats() if write_behind is not None else {}),
+        ('retention', retention_job.stats() if retention_job is not None else {}),
+        ('cluster', cluster.stats()),
+    ):
+        for name, value in stats.items():
+            if isinstance(value, (int, float)):
+                gauges[f"skill_swap_{prefix}_{name}"] = value
+    return Response(metrics.render_prometheus(gauges), mimetype='text/plain; version=0.0.4')
+
+# Whole-index scans that are deliberate: the admin lists walk an index in order and stop at the page LIMIT
+EXPECTED_SCANS = {
+    'all swap requests (page)': {'SCAN swap_requests USING INDEX idx_swap_requests_created'},
+    'all feedback (page)': {'SCAN feedback USING INDEX idx_feedback_created'},
+}
+
+def hot_path_queries():
+    # (name, sql, params) for the queries that must stay index-driven; checked by `flask check-query-plans`
+    # and tests/test_query_plans.py
+    cursor = ('2024-01-01 00:00:00', 'id')
+    return [
+        ('user swap requests', *user_swap_requests_query('u', SWAP_REQUEST_FIELDS)),
+        ('user swap requests (page)', *user_swap_requests_query('u', SWAP_REQUEST_FIELDS, 20, cursor)),
+        ('latest platform message', LATEST_PLATFORM_MESSAGE_QUERY, ()),
+        ('feedback by receiver', "SELECT * FROM feedback WHERE receiver_id = ?", ('u',)),
+        ('user profile with rating', f"SELECT u.*, rs.rating_count FROM users u {RATING_JOIN} WHERE u.id = ?", ('u',)),
+        ('feedback by swap request', "SELECT * FROM feedback WHERE swap_request_id = ?", ('s',)),
+        ('swap requests by status', "SELECT * FROM swap_requests WHERE status = ? ORDER BY created_at DESC", ('pending',)),
+        ('all swap requests (page)', *all_swap_requests_query(SWAP_REQUEST_FIELDS, 20, cursor)),
+        ('user swap requests with archive (page)', *user_swap_requests_query('u', SWAP_REQUEST_FIELDS, 20, cursor, include_archived=True)),
+        ('all feedback (page)', *paginate_query("SELECT * FROM feedback", (), 'created_at', 'id', 20, cursor)),
+        ('skill filter', "SELECT user_id FROM user_skills WHERE kind = ? AND skill = ?", ('offered', 'Excel')),
+        ('swapped partners', SWAPPED_PARTNERS_QUERY, ('u',) * SWAPPED_PARTNERS_PARAMS),
+        ('text search', *build_user_search('u.id, u.created_at', 'python')[:2]),
+        ('search index sync', "DELETE FROM users_fts WHERE rowid = (SELECT rowid FROM users WHERE id = ?)", ('u',)),
+    ]
+
+@cli_command('rebuild-rating-stats')
+def rebuild_rating_stats_command():
+    # Recomputes user_rating_stats from scratch from the feedback table
+    conn = get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        users = rebuild_rating_stats(conn)
+        conn.commit()
+        response_cache.clear()
+        user_fragments.clear()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    print(f"Rebuilt rating stats for {users} users.")
+
+@cli_command('rebuild-platform-stats')
+def rebuild_platform_stats_command():
+    # Reconciles the dashboard counters with the base tables and reports any drift it corrected
+    conn = get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        before = read_counters(conn)
+        after = rebuild_platform_stats(conn)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    for name in sorted(set(before) | set(after)):
+        if before.get(name, 0) != after.get(name, 0):
+            print(f"{name}: {before.get(name, 0)} -> {after.get(name, 0)}")
+    print(f"Rebuilt platform stats ({len(after)} counters).")
+
+@cli_command('export-table')
+@click.argument('table', type=click.Choice(list(TABLE_COLUMNS)))
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='ndjson')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+@click.option('--output', '-o', default='-', help='File to write (default: stdout).')
+@click.option('--include-password-hashes', is_flag=True, help='Include users.password_hash, for backups.')
+def export_table_command(table, fmt, compress, output, include_password_hashes):
+    # Streams a table to a file with flat memory use, e.g. for backups and analytics jobs
+    stream = export_stream(db_pool.open_dedicated, table, fmt, compress, include_password_hashes)
+    with click.open_file(output, 'wb') as f:
+        for chunk in stream:
+            f.write(chunk)
+
+@cli_command('import-ndjson')
+@click.argument('table', type=click.Choice(list(TABLE_COLUMNS)))
+@click.argument('path')
+def import_ndjson_command(table, path):
+    # Loads an NDJSON file (.gz is decompressed on the fly; - reads stdin) in chunked transactions
+    conn = db_pool.open_dedicated()
+    summary = ImportSummary(table)
+    try:
+        with (gzip.open(path, 'rb') if path.endswith('.gz') else click.open_file(path, 'rb')) as f:
+            import_ndjson(conn, table, f, summary=summary)
+    finally:
+        try:
+            if summary.imported:
+                refresh_after_import(conn, table)
+        finally:
+            conn.close()
+    for error in summary.errors:
+        print(f"line {error['line']}: {error['error']}")
+    print(f"Imported {summary.imported} of {summary.read} {table} rows ({summary.skipped} already present, {summary.failed} failed).")
+
+@cli_command('run-retention')
+def run_retention_command():
+    # One retention pass (archive, prune, incremental vacuum), for cron instead of the in-process schedule
+    conn = db_pool.open_dedicated()
+    try:
+        summary = run_retention(conn)
+    finally:
+        conn.close()
+    print(f"Archived {summary['archived_swap_requests']} swap requests, pruned {summary['pruned_platform_messages']} "
+          f"platform messages, vacuumed {summary['vacuumed_pages']} pages in {summary['seconds']:.1f}s.")
+
+@cli_command('enable-incremental-vacuum')
+def enable_incremental_vacuum_command():
+    # Databases created before auto_vacuum=INCREMENTAL need one full VACUUM to switch; it locks the
+    # whole database while it rewrites the file, so run it in a maintenance window
+    conn = db_pool.open_dedicated()
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            print("Incremental vacuum is already enabled.")
+            return
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        # VACUUM may renumber the users rowids that users_fts rows are keyed by
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rebuild_search_index(conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        conn.close()
+    print("Incremental vacuum enabled.")
+
+@cli_command('check-query-plans')
+def check_query_plans():
+    # Fails (exit code 1) if any hot-path query plans a full table or index scan
+    conn = get_db_connection()
+    failures = 0
+    for name, sql, params in hot_path_queries():
+        scans = find_full_scans(conn, sql, params, EXPECTED_SCANS.get(name, ()))
+        if scans:
+            failures += 1
+            print(f"FULL SCAN in {name}: {', '.join(scans)}")
+        else:
+            print(f"ok: {name}")
+    conn.close()
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    # Development server; production runs the pre-fork server (server.py)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,100 @@
+import os
+from flask import jsonify
+
+# Shared plumbing for the batch endpoints.
+# Semantics, the same for every batch endpoint:
+#   - The body carries a list of at most MAX_BATCH_SIZE items; anything else is a 400 for the whole batch.
+#   - Each item is validated (and looked up) on its own and gets a result {index, id, status[, error]},
+#     where status is the HTTP status the equivalent single-item call would have returned.
+#   - By default the valid items are applied together in ONE transaction and invalid ones are skipped
+#     (partial success, 207 if any item failed). With "atomic": true any failed item aborts the whole batch
+#     and nothing is written (400). A database error always rolls the whole batch back (500).
+
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 500))
+
+class BatchError(ValueError):
+    pass
+
+def parse_batch(data, key):
+    # -> (items, atomic) from {key: [...], "atomic": bool}
+    if not isinstance(data, dict):
+        raise BatchError("Request body must be a JSON object")
+    items = data.get(key)
+    if not isinstance(items, list) or not items:
+        raise BatchError(f"'{key}' must be a non-empty list")
+    if len(items) > MAX_BATCH_SIZE:
+        raise BatchError(f"At most {MAX_BATCH_SIZE} items per batch, got {len(items)}")
+    return items, bool(data.get('atomic', False))
+
+class BatchResults:
+    def __init__(self, size):
+        self.results = [None] * size
+        self._seen_ids = set()
+
+    def fail(self, index, item_id, status, error):
+        self.results[index] = {"index": index, "id": item_id, "status": status, "error": error}
+
+    def succeed(self, index, item_id, status=200):
+        self.results[index] = {"index": index, "id": item_id, "status": status}
+
+    def claim(self, index, item_id):
+        # Each id may appear once per batch; later duplicates fail instead of racing the first
+        if item_id in self._seen_ids:
+            self.fail(index, item_id, 400, "Duplicate id in batch")
+            return False
+        self._seen_ids.add(item_id)
+        return True
+
+    def abort(self):
+        # Atomic batch with failures: nothing was written, including the items that were fine
+        for index, result in enumerate(self.results):
+            if result is not None and 'error' not in result:
+                self.fail(index, result['id'], 424, "Not applied: another item in the batch failed")
+
+    @property
+    def failed(self):
+        return sum(1 for result in self.results if result is not None and 'error' in result)
+
+    def response(self, applied, success_status=200):
+        failed = self.failed
+        if not applied:
+            status = 400
+        elif failed:
+            status = 207
+        else:
+            status = success_status
+        return jsonify({
+            "applied": applied,
+            "succeeded": len(self.results) - failed if applied else 0,
+            "failed": failed,
+            "results": self.results,
+        }), status
+
+def run_in_transaction(conn, results, atomic, work):
+    # work(conn) records per-item failures in results and writes the valid items, all inside one write
+    # transaction (one commit, one WAL sync for the whole batch). Returns False when an atomic batch was
+    # rolled back because of item failures; database errors roll back and propagate.
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        work(conn)
+        if atomic and results.failed:
+            conn.rollback()
+            results.abort()
+            return False
+        conn.commit()
+        return True
+    except BaseException:
+        conn.rollback()
+        raise
+
+def fetch_rows_by_id(conn, table, ids, columns='*', key='id'):
+    # {id: row} for the ids that exist, in IN-list chunks that stay under SQLite's variable limit.
+    # key= looks rows up by another unique column instead (which must then be among columns)
+    rows = {}
+    ids = list(ids)
+    for start in range(0, len(ids), MAX_BATCH_SIZE):
+        chunk = ids[start:start + MAX_BATCH_SIZE]
+        placeholders = ','.join('?' * len(chunk))
+        for row in conn.execute(f"SELECT {columns} FROM {table} WHERE {key} IN ({placeholders})", chunk):
+            rows[row[key]] = row
+    return rows
@@ -0,0 +1,5 @@
+# Load-testing and benchmark suite.
+#   python -m bench generate --db bench.db --users 10000   seeded synthetic users, swap requests and feedback
+#   python -m bench run --db bench.db --scenario search_heavy   drive the app and save JSON results
+#   python -m bench compare old.json new.json   per-endpoint regressions between two result files
+#   python -m bench serialize --db bench.db --rows 5000   user-list decoding and JSON encoding only
@@ -0,0 +1,158 @@
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from bench.datagen import generate
+from bench.runner import (
+    TestClientDriver, HttpDriver, LocalServer, load_app, run_requests, summarize, environment, save_results, compare,
+)
+from bench.scenarios import SCENARIOS, Context, build_requests
+from bench.serialize import run_serialization_bench
+
+def cmd_generate(args):
+    started = time.perf_counter()
+
+    last_table = []
+
+    def progress(table, count):
+        if last_table and last_table[-1] != table:
+            print(file=sys.stderr)
+        last_table.append(table)
+        print(f"\r{table}: {count}", end='', file=sys.stderr, flush=True)
+
+    counts = generate(args.db, users=args.users, seed=args.seed, swaps_per_user=args.swaps_per_user,
+                      feedback_ratio=args.feedback_ratio, progress=progress)
+    print(file=sys.stderr)
+    print(f"Generated {args.db} in {time.perf_counter() - started:.1f}s: "
+          + ', '.join(f"{count} {table}" for table, count in counts.items()))
+
+def _print_summary(result):
+    print(f"{result['scenario']} via {result['driver']}: {result['requests']} requests, "
+          f"concurrency {result['concurrency']}, {result['wall_seconds']:.2f}s")
+    print(f"{'endpoint':<36} {'count':>6} {'err':>5} {'rps':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for label, stats in result['endpoints'].items():
+        print(f"{label:<36} {stats['count']:>6} {stats['errors']:>5} {stats['throughput_rps']:>9.1f} "
+              f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['max_ms']:>8.2f}")
+
+def cmd_run(args):
+    database = args.db
+    workdir = None
+    if not args.url and not args.in_place:
+        # Write scenarios mutate the data; run on a throwaway copy so every run starts from the same state
+        workdir = tempfile.mkdtemp(prefix='skill-swap-bench-')
+        database = os.path.join(workdir, os.path.basename(args.db))
+        shutil.copyfile(args.db, database)
+    try:
+        context = Context(database, seed=args.seed)
+        requests = build_requests(args.scenario, context, args.warmup + args.requests, seed=args.seed)
+        warmup, measured = requests[:args.warmup], requests[args.warmup:]
+
+        server = contextlib.nullcontext()
+        if args.url:
+            driver = HttpDriver(args.url)
+        else:
+            flask_app = load_app(database)
+            if args.driver == 'http':
+                server = LocalServer(flask_app)
+                driver = HttpDriver(server.url)
+            else:
+                driver = TestClientDriver(flask_app)
+        with server:
+            run_requests(driver, warmup, args.concurrency)
+            results, wall_seconds = run_requests(driver, measured, args.concurrency)
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        'scenario': args.scenario,
+        'driver': driver.name,
+        'requests': len(measured),
+        'warmup': len(warmup),
+        'concurrency': args.concurrency,
+        'seed': args.seed,
+        'database': os.path.abspath(args.db),
+        'users_sampled': len(context.users),
+        'wall_seconds': wall_seconds,
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': environment(),
+        'endpoints': summarize(results, wall_seconds),
+    }
+    _print_summary(result)
+    out = args.out or os.path.join(
+        'bench', 'results', f"{args.scenario}-{driver.name}-{result['environment']['commit']}.json"
+    )
+    save_results(out, result)
+    print(f"Saved {out}")
+    if result['endpoints']['total']['errors'] and args.fail_on_errors:
+        return 1
+    return 0
+
+def cmd_compare(args):
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    rows, regressed = compare(old, new, args.threshold)
+    print(f"{old['environment']['commit']} -> {new['environment']['commit']} ({new['scenario']} via {new['driver']})")
+    for label, metric, before, after, change, is_regression in rows:
+        marker = '  REGRESSION' if is_regression else ''
+        print(f"{label:<36} {metric:<15} {before:>10.2f} {after:>10.2f} {change:>+8.1%}{marker}")
+    return 1 if regressed else 0
+
+def cmd_serialize(args):
+    results = run_serialization_bench(args.db, rows=args.rows, repeat=args.repeat)
+    baseline = results[0][1]
+    print(f"Serializing {args.rows} users, best of {args.repeat}")
+    print(f"{'path':<36} {'ms':>9} {'rows/s':>11} {'speedup':>8} {'bytes':>10}")
+    for label, seconds, size in results:
+        print(f"{label:<36} {seconds * 1000:>9.2f} {args.rows / seconds:>11.0f} {baseline / seconds:>7.1f}x {size:>10}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='Skill Swap load tests and benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    gen = commands.add_parser('generate', help='build a seeded synthetic database')
+    gen.add_argument('--db', default='bench.db')
+    gen.add_argument('--users', type=int, default=10000)
+    gen.add_argument('--seed', type=int, default=1)
+    gen.add_argument('--swaps-per-user', type=float, default=2.0)
+    gen.add_argument('--feedback-ratio', type=float, default=0.6, help='share of accepted swaps that get feedback')
+    gen.set_defaults(func=cmd_generate)
+
+    run = commands.add_parser('run', help='run a scenario and save JSON results')
+    run.add_argument('--db', default='bench.db')
+    run.add_argument('--scenario', choices=sorted(SCENARIOS), default='search_heavy')
+    run.add_argument('--driver', choices=('test_client', 'http'), default='test_client',
+                     help='http starts a local threaded server on an ephemeral port')
+    run.add_argument('--url', help='benchmark an already running server instead (its database must be --db)')
+    run.add_argument('--requests', type=int, default=2000)
+    run.add_argument('--warmup', type=int, default=100)
+    run.add_argument('--concurrency', type=int, default=8)
+    run.add_argument('--seed', type=int, default=1)
+    run.add_argument('--in-place', action='store_true', help='run against --db itself instead of a copy')
+    run.add_argument('--out', help='results file (default bench/results/<scenario>-<driver>-<commit>.json)')
+    run.add_argument('--fail-on-errors', action='store_true', help='exit non-zero on transport errors or 5xx')
+    run.set_defaults(func=cmd_run)
+
+    ser = commands.add_parser('serialize', help='microbenchmark of the user-list serialization path')
+    ser.add_argument('--db', default='bench.db')
+    ser.add_argument('--rows', type=int, default=5000)
+    ser.add_argument('--repeat', type=int, default=5)
+    ser.set_defaults(func=cmd_serialize)
+
+    cmp = commands.add_parser('compare', help='compare two result files')
+    cmp.add_argument('old')
+    cmp.add_argument('new')
+    cmp.add_argument('--threshold', type=float, default=0.10, help='relative change that counts as a regression')
+    cmp.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args) or 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import hashlib
+import itertools
+import os
+import random
+import sqlite3
+import time
+import uuid
+from werkzeug.security import generate_password_hash
+from migrations import migrate
+from passwords import PASSWORD_HASH_METHOD
+from platform_stats import rebuild_platform_stats
+from ratings import rebuild_rating_stats
+from search import index_new_users, split_skills
+
+# Seeded synthetic data for the benchmark suite.
+# The same seed and sizes always produce the same database, so results from different commits are comparable.
+# Skill popularity follows a Zipf distribution (a few skills are very common, most are rare), which is what
+# makes the skill index and search hot paths interesting.
+
+BENCH_PASSWORD = 'benchpass' # every generated user shares it, so one hash is computed instead of a million
+BATCH_SIZE = 10000
+
+SKILLS = [
+    'Python', 'JavaScript', 'Web Design', 'Photography', 'Guitar', 'Cooking', 'Spanish', 'Excel', 'Yoga',
+    'Graphic Design', 'SQL', 'Public Speaking', 'Piano', 'French', 'Video Editing', 'Drawing', 'React',
+    'Writing', 'Marketing', 'Data Analysis', 'Machine Learning', 'Photoshop', 'Baking', 'Running', 'German',
+    'Java', 'C++', 'Knitting', 'Gardening', 'Chess', 'Singing', 'Mandarin', 'Accounting', 'Illustrator',
+    'UX Research', 'Swimming', 'Painting', 'Woodworking', 'Sewing', 'Calligraphy', 'Rust', 'Go', 'Kotlin',
+    'Swift', 'Docker', 'Kubernetes', 'Linux', 'Networking', 'Cybersecurity', 'Blender', '3D Modeling',
+    'Animation', 'Podcasting', 'Copywriting', 'SEO', 'Negotiation', 'Sales', 'Interior Design', 'Pottery',
+    'Meditation', 'Italian', 'Japanese', 'Korean', 'Arabic', 'Portuguese', 'Hindi', 'Salsa', 'Ballet',
+    'Drums', 'Violin', 'Ukulele', 'Music Production', 'DJing', 'Film Making', 'Screenwriting', 'Poetry',
+    'Journaling', 'Bookkeeping', 'Investing', 'Tax Preparation', 'Resume Writing', 'Interviewing', 'Tutoring',
+    'Statistics', 'Calculus', 'Physics', 'Chemistry', 'Biology', 'Astronomy', 'Bird Watching', 'Hiking',
+    'Rock Climbing', 'Cycling', 'Bike Repair', 'Car Maintenance', 'Plumbing', 'Electrical Wiring', 'Carpentry',
+    'Welding', 'First Aid', 'Nutrition', 'Personal Training', 'Pilates', 'Tennis', 'Soccer', 'Basketball',
+    'Skateboarding', 'Surfing', 'Sailing', 'Fishing', 'Beekeeping', 'Composting', 'Origami', 'Magic Tricks',
+    'Juggling', 'Stand-up Comedy', 'Improv', 'Acting', 'Makeup', 'Hair Styling', 'Fashion Design', 'Jewelry Making',
+    'Leatherwork', 'Glassblowing', 'Brewing', 'Wine Tasting', 'Coffee Roasting', 'Mixology', 'Sushi Making',
+    'Vegan Cooking', 'Fermentation', 'Sign Language', 'Braille', 'Genealogy', 'Lockpicking', 'Ham Radio',
+    'Arduino', 'Raspberry Pi', 'Electronics', 'Soldering', '3D Printing', 'Drone Flying', 'Game Design',
+    'Unity', 'Unreal Engine', 'Figma', 'Notion', 'Project Management', 'Agile', 'Product Management',
+    'Leadership', 'Mentoring', 'Time Management', 'Mindfulness', 'Tarot', 'Astrology', 'Dog Training',
+]
+
+LOCATIONS = [
+    'New York', 'London', 'Berlin', 'Paris', 'Bangalore', 'Mumbai', 'Delhi', 'Tokyo', 'Toronto', 'Sydney',
+    'San Francisco', 'Chicago', 'Madrid', 'Lisbon', 'Amsterdam', 'Singapore', 'Seoul', 'Sao Paulo',
+    'Mexico City', 'Lagos', 'Nairobi', 'Cairo', 'Dubai', 'Istanbul', 'Warsaw', 'Stockholm', 'Dublin', '',
+]
+
+AVAILABILITY = ['Weekends', 'Evenings', 'Weekdays', 'Mornings', 'Flexible', '']
+STATUSES = (('pending', 5), ('accepted', 3), ('rejected', 2))
+RATINGS = ((1, 5), (2, 5), (3, 15), (4, 35), (5, 40))
+COMMENTS = ['Great teacher!', 'Very patient and clear.', 'Helpful session.', 'Could be better organised.',
+            'Did not show up on time.', 'Learned a lot, thanks!', '', 'Would swap again.']
+
+def _zipf_weights(n, exponent):
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, n + 1)))
+
+def user_id(seed, index):
+    # Stable ids derived from (seed, index), so the runner and repeated generations agree on them
+    digest = hashlib.blake2b(f"{seed}:{index}".encode(), digest_size=16).digest()
+    return str(uuid.UUID(bytes=digest, version=4))
+
+def user_name(index):
+    return f"bench{index:07d}"
+
+def _timestamp(epoch):
+    # Same text format as CURRENT_TIMESTAMP, which the app's inserts use
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(epoch))
+
+class Generator:
+    def __init__(self, seed=1, users=10000, swaps_per_user=2.0, feedback_ratio=0.6, skill_exponent=1.1, now=1735689600):
+        self.seed = seed
+        self.users = users
+        self.swaps_per_user = swaps_per_user
+        self.feedback_ratio = feedback_ratio
+        self.rng = random.Random(seed)
+        self.now = now # fixed clock: generation must not depend on when it runs
+        self._skill_weights = _zipf_weights(len(SKILLS), skill_exponent)
+        self._skills = self.rng.sample(SKILLS, len(SKILLS)) # which skill is most popular depends on the seed
+        self._location_weights = _zipf_weights(len(LOCATIONS), 0.8)
+
+    def skills(self, low, high):
+        count = self.rng.randint(low, high)
+        return split_skills(self.rng.choices(self._skills, cum_weights=self._skill_weights, k=count))
+
+    def user_rows(self, password_hash):
+        span = 3 * 365 * 86400
+        for index in range(self.users):
+            offered = self.skills(0, 5)
+            wanted = self.skills(0, 4)
+            yield (
+                user_id(self.seed, index), user_name(index), password_hash,
+                self.rng.choices(LOCATIONS, cum_weights=self._location_weights)[0],
+                ','.join(offered), ','.join(wanted), self.rng.choice(AVAILABILITY),
+                0 if self.rng.random() < 0.1 else 1, # 10% private profiles
+                1 if self.rng.random() < 0.01 else 0, # 1% banned
+                _timestamp(self.now - span + span * index // max(self.users, 1)),
+            )
+
+    def swap_rows(self):
+        # Yields (swap row, feedback row or None)
+        count = int(self.users * self.swaps_per_user)
+        span = 365 * 86400
+        statuses, status_weights = zip(*STATUSES)
+        ratings, rating_weights = zip(*RATINGS)
+        for index in range(count):
+            sender = self.rng.randrange(self.users)
+            receiver = self.rng.randrange(self.users - 1)
+            receiver += receiver >= sender # never yourself
+            status = self.rng.choices(statuses, status_weights)[0]
+            created_at = _timestamp(self.now - span + self.rng.randrange(span))
+            swap_id = str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+            swap = (
+                swap_id, user_id(self.seed, sender), user_name(sender), user_id(self.seed, receiver), user_name(receiver),
+                self.skills(1, 1)[0], self.skills(1, 1)[0], status, created_at,
+            )
+            feedback = None
+            if status == 'accepted' and self.rng.random() < self.feedback_ratio:
+                feedback = (
+                    str(uuid.UUID(int=self.rng.getrandbits(128), version=4)), swap_id, swap[1], swap[3],
+                    self.rng.choices(ratings, rating_weights)[0], self.rng.choice(COMMENTS), created_at,
+                )
+            yield swap, feedback
+
+def _batches(rows, size=BATCH_SIZE):
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def generate(path, users=10000, seed=1, swaps_per_user=2.0, feedback_ratio=0.6, progress=None):
+    # Builds a fresh database at path through the app's own migrations, then bulk-loads it; returns row counts
+    for stale in (path, path + '-wal', path + '-shm'):
+        if os.path.exists(stale):
+            os.remove(stale)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    migrate(conn)
+    # Bulk load: nothing to protect until the file is complete
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute(f"PRAGMA cache_size = -{256 * 1024}")
+
+    generator = Generator(seed=seed, users=users, swaps_per_user=swaps_per_user, feedback_ratio=feedback_ratio)
+    password_hash = generate_password_hash(BENCH_PASSWORD, PASSWORD_HASH_METHOD)
+    counts = {'users': 0, 'swap_requests': 0, 'feedback': 0}
+
+    for batch in _batches(generator.user_rows(password_hash)):
+        conn.executemany(
+            "INSERT INTO users (id, name, password_hash, location, skills_offered, skills_wanted, availability, is_public, is_banned, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            batch
+        )
+        # Search indexes for the whole batch at once instead of per-user sync_user_index()
+        index_new_users(conn, [row[0] for row in batch])
+        conn.commit()
+        counts['users'] += len(batch)
+        if progress:
+            progress('users', counts['users'])
+
+    for batch in _batches(generator.swap_rows()):
+        conn.executemany(
+            "INSERT INTO swap_requests (id, sender_id, sender_name, receiver_id, receiver_name, skill_offered, skill_wanted, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [swap for swap, _ in batch]
+        )
+        feedback = [feedback for _, feedback in batch if feedback is not None]
+        conn.executemany(
+            "INSERT INTO feedback (id, swap_request_id, giver_id, receiver_id, rating, comment, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            feedback
+        )
+        conn.commit()
+        counts['swap_requests'] += len(batch)
+        counts['feedback'] += len(feedback)
+        if progress:
+            progress('swap_requests', counts['swap_requests'])
+
+    # Rows were inserted directly, bypassing the write paths that maintain the aggregates
+    rebuild_rating_stats(conn)
+    rebuild_platform_stats(conn)
+    conn.execute("INSERT INTO platform_messages (message) VALUES (?)", ("Welcome to the benchmark!",))
+    conn.commit()
+    conn.close()
+    return counts
@@ -0,0 +1,183 @@
+import http.client
+import json
+import math
+import os
+import platform
+import subprocess
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Drives a request list through the app and summarises throughput and latency per endpoint.
+# Two drivers: the Flask test client (in-process, no network, isolates app + SQLite cost) and real HTTP
+# (against a server started here on an ephemeral port, or any --url), which adds the WSGI server and sockets.
+
+PERCENTILES = (50, 90, 95, 99)
+
+def load_app(database):
+    # app.py reads its database path at import time, so point it at the benchmark copy first
+    os.environ['SKILL_SWAP_DATABASE'] = database
+    import app
+    return app.create_app()
+
+class TestClientDriver:
+    name = 'test_client'
+
+    def __init__(self, flask_app):
+        self.app = flask_app
+        self._local = threading.local()
+
+    def request(self, method, url, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(url, method=method, json=body)
+        response.get_data() # include body generation (streamed responses) in the timing
+        return response.status_code
+
+class HttpDriver:
+    name = 'http'
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self._local = threading.local()
+
+    def request(self, method, url, body):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        try:
+            conn.request(method, url, body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close() # reconnects on the next request
+            raise
+        return response.status
+
+class LocalServer:
+    # Threaded werkzeug server on 127.0.0.1 for the http driver; stands in for `python app.py`
+    def __init__(self, flask_app):
+        from werkzeug.serving import make_server, WSGIRequestHandler
+
+        class KeepAliveHandler(WSGIRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self.server = make_server('127.0.0.1', 0, flask_app, threaded=True, request_handler=KeepAliveHandler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self._thread.join()
+
+def run_requests(driver, requests, concurrency=8):
+    # -> ([(label, status, seconds)], wall seconds); status 0 means a transport error
+    results = [None] * len(requests)
+    next_index = iter(range(len(requests)))
+    index_lock = threading.Lock()
+
+    def worker():
+        while True:
+            with index_lock:
+                index = next(next_index, None)
+            if index is None:
+                return
+            label, method, url, body = requests[index]
+            started = time.perf_counter()
+            try:
+                status = driver.request(method, url, body)
+            except Exception:
+                status = 0
+            results[index] = (label, status, time.perf_counter() - started)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100.0 * len(sorted_values)) - 1)]
+
+def summarize(results, wall_seconds):
+    by_label = {}
+    for label, status, seconds in results:
+        by_label.setdefault(label, []).append((status, seconds))
+    by_label['total'] = [(status, seconds) for _, status, seconds in results]
+
+    summary = {}
+    for label, samples in sorted(by_label.items()):
+        latencies = sorted(seconds * 1000.0 for _, seconds in samples)
+        statuses = {}
+        for status, _ in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        summary[label] = {
+            'count': len(samples),
+            'errors': sum(1 for status, _ in samples if status == 0 or status >= 500),
+            'status': statuses,
+            'throughput_rps': round(len(samples) / wall_seconds, 2) if wall_seconds else 0.0,
+            'mean_ms': round(sum(latencies) / len(latencies), 3),
+            'max_ms': round(latencies[-1], 3),
+            **{f'p{p}_ms': round(percentile(latencies, p), 3) for p in PERCENTILES},
+        }
+    return summary
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def environment():
+    import sqlite3
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def save_results(path, result):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+
+def compare(old, new, threshold=0.10):
+    # -> ([(label, metric, old, new, change, regressed)], any regressed) for endpoints present in both runs
+    rows = []
+    regressed = False
+    for label in sorted(set(old['endpoints']) & set(new['endpoints'])):
+        for metric, higher_is_better in (('throughput_rps', True), ('p50_ms', False), ('p95_ms', False), ('p99_ms', False)):
+            before = old['endpoints'][label][metric]
+            after = new['endpoints'][label][metric]
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressed = True
+            rows.append((label, metric, before, after, change, worse > threshold))
+    return rows, regressed
@@ -0,0 +1,151 @@
+import random
+import sqlite3
+from urllib.parse import urlencode
+from bench.datagen import BENCH_PASSWORD
+from search import split_skills
+
+# Request mixes for the runner.
+# A scenario is a list of (weight, label, builder); builder(context, rng) returns (method, url, json body or None).
+# Labels name the endpoint, not the concrete URL, so results aggregate per endpoint.
+# Requests are built up front from a seeded rng: the same seed replays the same request sequence.
+
+CONTEXT_SAMPLE_SIZE = 2000
+
+class Context:
+    # A seeded sample of the generated data, read straight from the database before the app starts
+    def __init__(self, database, seed=1, sample_size=CONTEXT_SAMPLE_SIZE):
+        conn = sqlite3.connect(database)
+        conn.row_factory = sqlite3.Row
+        rng = random.Random(seed)
+        max_rowid = conn.execute("SELECT MAX(rowid) FROM users").fetchone()[0] or 0
+        rowids = rng.sample(range(1, max_rowid + 1), min(sample_size, max_rowid))
+        placeholders = ','.join('?' * len(rowids))
+        self.users = [
+            dict(row) for row in conn.execute(
+                f"SELECT id, name, skills_offered, skills_wanted FROM users WHERE rowid IN ({placeholders}) AND is_banned = 0 AND is_admin = 0 ORDER BY rowid",
+                rowids
+            )
+        ]
+        for user in self.users:
+            user['skills_offered'] = split_skills(user['skills_offered'])
+            user['skills_wanted'] = split_skills(user['skills_wanted'])
+        self.skills = [row[0] for row in conn.execute("SELECT DISTINCT skill FROM user_skills ORDER BY skill")]
+        self.pending_swaps = [
+            dict(row) for row in conn.execute(
+                "SELECT id, sender_id, receiver_id FROM swap_requests WHERE status = 'pending' ORDER BY created_at DESC LIMIT ?",
+                (sample_size,)
+            )
+        ]
+        conn.close()
+        if not self.users or not self.skills:
+            raise ValueError(f"{database} has no benchmark data; run `python -m bench generate` first")
+
+def _user(context, rng):
+    return rng.choice(context.users)
+
+def _skill(context, rng):
+    return rng.choice(context.skills)
+
+def search_users(context, rng):
+    # What a user types: a prefix of one or two skill words
+    words = _skill(context, rng).split()
+    term = ' '.join(words[:rng.randint(1, len(words))])
+    term = term[:max(3, rng.randint(len(term) // 2, len(term)))]
+    return 'GET', '/api/users?' + urlencode({'searchTerm': term, 'limit': 20}), None
+
+def filter_by_skill(context, rng):
+    kind = rng.choice(('offers', 'wants'))
+    return 'GET', '/api/users?' + urlencode({kind: _skill(context, rng), 'limit': 20}), None
+
+def browse_users(context, rng):
+    return 'GET', '/api/users?' + urlencode({'limit': 50}), None
+
+def view_profile(context, rng):
+    return 'GET', f"/api/profile/{_user(context, rng)['id']}", None
+
+def find_matches(context, rng):
+    return 'GET', f"/api/matches/{_user(context, rng)['id']}", None
+
+def list_swap_requests(context, rng):
+    return 'GET', f"/api/swap_requests/{_user(context, rng)['id']}?limit=50", None
+
+def platform_message(context, rng):
+    return 'GET', '/api/admin/platform_message', None
+
+def login(context, rng):
+    user = _user(context, rng)
+    password = BENCH_PASSWORD if rng.random() < 0.9 else 'wrong-password' # some typos
+    return 'POST', '/api/auth/login', {'name': user['name'], 'password': password}
+
+def admin_users(context, rng):
+    return 'GET', '/api/admin/users?limit=100', None
+
+def admin_swap_requests(context, rng):
+    return 'GET', '/api/admin/swap_requests?limit=100', None
+
+def admin_feedback(context, rng):
+    return 'GET', '/api/feedback?limit=100', None
+
+def user_feedback(context, rng):
+    return 'GET', '/api/feedback?' + urlencode({'receiverId': _user(context, rng)['id'], 'limit': 50}), None
+
+def create_swap_request(context, rng):
+    sender, receiver = rng.sample(context.users, 2)
+    return 'POST', '/api/swap_requests', {
+        'senderId': sender['id'], 'senderName': sender['name'],
+        'receiverId': receiver['id'], 'receiverName': receiver['name'],
+        'skillOffered': rng.choice(sender['skills_offered'] or context.skills),
+        'skillWanted': rng.choice(receiver['skills_offered'] or context.skills),
+    }
+
+def answer_swap_request(context, rng):
+    swap = rng.choice(context.pending_swaps) if context.pending_swaps else {'id': 'missing'}
+    return 'PUT', f"/api/swap_requests/{swap['id']}", {'status': rng.choice(('accepted', 'rejected'))}
+
+def submit_feedback(context, rng):
+    swap = rng.choice(context.pending_swaps) if context.pending_swaps else {'id': 'missing', 'sender_id': 'x', 'receiver_id': 'y'}
+    return 'POST', '/api/feedback', {
+        'swapRequestId': swap['id'], 'giverId': swap['sender_id'], 'receiverId': swap['receiver_id'],
+        'rating': rng.randint(1, 5), 'comment': 'Benchmark feedback',
+    }
+
+SCENARIOS = {
+    'search_heavy': [
+        (40, 'GET /api/users?searchTerm', search_users),
+        (20, 'GET /api/users?offers|wants', filter_by_skill),
+        (10, 'GET /api/users', browse_users),
+        (15, 'GET /api/profile/<id>', view_profile),
+        (15, 'GET /api/matches/<id>', find_matches),
+    ],
+    'login_storm': [
+        (100, 'POST /api/auth/login', login),
+    ],
+    'admin_listing': [
+        (35, 'GET /api/admin/users', admin_users),
+        (35, 'GET /api/admin/swap_requests', admin_swap_requests),
+        (20, 'GET /api/feedback', admin_feedback),
+        (10, 'GET /api/feedback?receiverId', user_feedback),
+    ],
+    'mixed': [ # a day in the life; writes to the database
+        (20, 'GET /api/users?searchTerm', search_users),
+        (10, 'GET /api/users', browse_users),
+        (15, 'GET /api/profile/<id>', view_profile),
+        (10, 'GET /api/matches/<id>', find_matches),
+        (15, 'GET /api/swap_requests/<id>', list_swap_requests),
+        (10, 'GET /api/admin/platform_message', platform_message),
+        (5, 'POST /api/auth/login', login),
+        (8, 'POST /api/swap_requests', create_swap_request),
+        (4, 'PUT /api/swap_requests/<id>', answer_swap_request),
+        (3, 'POST /api/feedback', submit_feedback),
+    ],
+}
+
+def build_requests(scenario, context, count, seed=1):
+    # -> [(label, method, url, body)], deterministic for a given seed and context
+    mix = SCENARIOS[scenario]
+    rng = random.Random(seed)
+    weights = [weight for weight, _, _ in mix]
+    requests = []
+    for _, label, builder in rng.choices(mix, weights, k=count):
+        requests.append((label, *builder(context, rng)))
+    return requests
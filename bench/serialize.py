@@ -0,0 +1,62 @@
+import json
+import sqlite3
+import time
+from flask.json.provider import _default as flask_default
+import serialization
+from images import thumbnail_url
+from ratings import RATING_JOIN, rating_summary
+from serialization import FragmentCache, fetch_user_records, encode_array
+
+# Microbenchmark of the user-list serialization path, without HTTP or Flask routing: one query of `rows` users
+# with every list field, decoded and encoded to the response body by
+#   - legacy: sqlite3.Row -> dict, skills re-split per row, Flask's default jsonify encoding (the pre-serialization.py path)
+#   - records: UserRecord + UserView with the json module, then with orjson, nothing cached
+#   - fragments: the same with a warm fragment cache, i.e. a repeated listing of unchanged users
+
+def legacy_user_dict(row, fields):
+    user_dict = {field: rating_summary(row) if field == 'rating' else row[field] for field in fields}
+    for column in ('skills_offered', 'skills_wanted'):
+        if column in user_dict:
+            user_dict[column] = user_dict[column].split(',') if user_dict[column] else []
+    if 'profile_photo' in user_dict:
+        user_dict['profile_thumbnail'] = thumbnail_url(user_dict['profile_photo'])
+    return user_dict
+
+def _legacy(conn, query, fields):
+    rows = conn.execute(query).fetchall()
+    return json.dumps([legacy_user_dict(row, fields) for row in rows], default=flask_default,
+                      sort_keys=True, separators=(',', ':')).encode()
+
+def _records(conn, query, view, cache):
+    return encode_array(cache.encode(fetch_user_records(conn.execute(query)), view))
+
+def _best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        times.append(time.perf_counter() - started)
+    return min(times), len(body)
+
+def run_serialization_bench(database, rows=5000, repeat=5):
+    # -> [(label, best seconds, body bytes)]
+    from app import USER_LIST_FIELDS, user_select_columns, list_view
+    conn = sqlite3.connect(database)
+    conn.row_factory = sqlite3.Row
+    query = f"SELECT {user_select_columns(USER_LIST_FIELDS)} FROM users u {RATING_JOIN} ORDER BY u.created_at DESC LIMIT {int(rows)}"
+    view = list_view(USER_LIST_FIELDS)
+    use_orjson = serialization.USE_ORJSON
+    results = [('legacy (Row -> dict, jsonify)', *_best(lambda: _legacy(conn, query, USER_LIST_FIELDS), repeat))]
+    try:
+        serialization.USE_ORJSON = False
+        results.append(('records, json module', *_best(lambda: _records(conn, query, view, FragmentCache()), repeat)))
+        serialization.USE_ORJSON = use_orjson
+        if use_orjson:
+            results.append(('records, orjson', *_best(lambda: _records(conn, query, view, FragmentCache()), repeat)))
+        warm = FragmentCache()
+        _records(conn, query, view, warm)
+        results.append(('records, warm fragment cache', *_best(lambda: _records(conn, query, view, warm), repeat)))
+    finally:
+        serialization.USE_ORJSON = use_orjson
+        conn.close()
+    return results
@@ -0,0 +1,349 @@
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import uuid
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash
+from batch import fetch_rows_by_id
+from compression import JSON_GZIP_LEVEL
+from passwords import PASSWORD_HASH_METHOD
+from platform_stats import SWAP_STATUSES, rebuild_platform_stats
+from ratings import parse_rating, record_rating
+from search import index_new_users
+from skills import skill_index
+
+# Streaming export and chunked import of the users, swap_requests and feedback tables.
+# Export: one SELECT on a dedicated connection is stepped EXPORT_FETCH_ROWS at a time and encoded as NDJSON
+# or CSV in ~EXPORT_CHUNK_BYTES pieces, optionally through a streaming gzip compressor, so memory stays flat
+# whatever the table size. A single statement reads a single WAL snapshot, so the export is consistent.
+# Import: NDJSON is read line by line and written IMPORT_CHUNK_ROWS rows per transaction with executemany.
+# Plain-text passwords are hashed on a process pool; rows may instead carry an exported password_hash.
+# Rows whose id (or user name) already exists are skipped, so an interrupted import can simply be re-run.
+
+EXPORT_FETCH_ROWS = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+IMPORT_CHUNK_ROWS = int(os.environ.get('IMPORT_CHUNK_ROWS', 1000))
+IMPORT_HASH_PROCESSES = int(os.environ.get('IMPORT_HASH_PROCESSES', os.cpu_count() or 1))
+MAX_REPORTED_ERRORS = 100
+
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+TABLE_COLUMNS = {
+    'users': ('id', 'name', 'location', 'skills_offered', 'skills_wanted', 'availability', 'is_public', 'is_admin', 'is_banned', 'profile_photo', 'theme', 'created_at'),
+    'swap_requests': ('id', 'sender_id', 'sender_name', 'receiver_id', 'receiver_name', 'skill_offered', 'skill_wanted', 'status', 'created_at'),
+    'feedback': ('id', 'swap_request_id', 'giver_id', 'receiver_id', 'rating', 'comment', 'created_at'),
+}
+# Imported users are never admins: admin accounts only come from init_db
+IMPORT_COLUMNS = {
+    'users': ('id', 'name', 'password_hash', 'location', 'skills_offered', 'skills_wanted', 'availability', 'is_public', 'is_banned', 'profile_photo', 'theme', 'created_at'),
+    'swap_requests': TABLE_COLUMNS['swap_requests'],
+    'feedback': TABLE_COLUMNS['feedback'],
+}
+
+class BulkError(ValueError):
+    pass
+
+def _check_table(table):
+    if table not in TABLE_COLUMNS:
+        raise BulkError(f"Unknown table '{table}', expected one of: {', '.join(TABLE_COLUMNS)}")
+
+# --- export ---
+
+def export_columns(table, include_password_hashes=False):
+    # Password hashes only leave the database for backups (CLI), never through the HTTP export
+    _check_table(table)
+    columns = TABLE_COLUMNS[table]
+    if table == 'users' and include_password_hashes:
+        columns = columns[:2] + ('password_hash',) + columns[2:]
+    return columns
+
+def iter_rows(conn, table, columns):
+    cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {table}")
+    while True:
+        rows = cursor.fetchmany(EXPORT_FETCH_ROWS)
+        if not rows:
+            return
+        yield from rows
+
+def _buffered(pieces):
+    # Joins many small strings into ~EXPORT_CHUNK_BYTES byte chunks (one write/send per chunk, not per row)
+    buffer, size = [], 0
+    for piece in pieces:
+        data = piece.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+def encode_ndjson(rows, columns):
+    return _buffered(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in rows)
+
+def encode_csv(rows, columns):
+    def lines():
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        yield out.getvalue()
+        for row in rows:
+            out.seek(0)
+            out.truncate()
+            writer.writerow(tuple(row))
+            yield out.getvalue()
+    return _buffered(lines())
+
+def gzip_chunks(chunks, level=JSON_GZIP_LEVEL):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_stream(connect, table, fmt='ndjson', compress=False, include_password_hashes=False):
+    # Validates up front, then returns a generator of byte chunks; the connection from connect() is held
+    # only while the generator runs and closed when it finishes or is closed early (client went away)
+    columns = export_columns(table, include_password_hashes)
+    if fmt not in EXPORT_FORMATS:
+        raise BulkError(f"Unknown format '{fmt}', expected one of: {', '.join(EXPORT_FORMATS)}")
+    encode = encode_ndjson if fmt == 'ndjson' else encode_csv
+
+    def generate():
+        conn = connect()
+        try:
+            chunks = encode(iter_rows(conn, table, columns), columns)
+            yield from gzip_chunks(chunks) if compress else chunks
+        finally:
+            conn.close()
+    return generate()
+
+# --- import ---
+
+def _text(item, key, required=False, default=None):
+    value = item.get(key)
+    if value is None or value == '':
+        if required:
+            raise ValueError(f"Missing {key}")
+        return default
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError(f"{key} must be a string")
+    return str(value)
+
+def _flag(item, key, default):
+    value = item.get(key, default)
+    if value not in (0, 1): # also matches true/false
+        raise ValueError(f"{key} must be 0 or 1")
+    return int(value)
+
+def _skills(item, key):
+    skills = item.get(key)
+    if skills is not None and not isinstance(skills, (str, list)):
+        raise ValueError(f"{key} must be a list or a comma-separated string")
+    return ','.join(skill_index.canonicalize(skills or []))
+
+def _created_at(item):
+    value = item.get('created_at')
+    if value is not None and (isinstance(value, bool) or not isinstance(value, (str, int))):
+        raise ValueError("created_at must be a timestamp string or unix epoch")
+    return value
+
+def _user_row(item):
+    password_hash = _text(item, 'password_hash')
+    password = _text(item, 'password')
+    if not password_hash and not password:
+        raise ValueError("Missing password or password_hash")
+    return {
+        'id': _text(item, 'id') or str(uuid.uuid4()),
+        'name': _text(item, 'name', required=True),
+        'password_hash': password_hash,
+        'password': None if password_hash else password, # hashed later, a chunk at a time
+        'location': _text(item, 'location', default=''),
+        'skills_offered': _skills(item, 'skills_offered'),
+        'skills_wanted': _skills(item, 'skills_wanted'),
+        'availability': _text(item, 'availability', default=''),
+        'is_public': _flag(item, 'is_public', 1),
+        'is_banned': _flag(item, 'is_banned', 0),
+        'profile_photo': _text(item, 'profile_photo'),
+        'theme': _text(item, 'theme', default='indigo'),
+        'created_at': _created_at(item),
+    }
+
+def _swap_request_row(item):
+    row = {key: _text(item, key, required=True) for key in ('sender_id', 'sender_name', 'receiver_id', 'receiver_name', 'skill_offered', 'skill_wanted')}
+    row['id'] = _text(item, 'id') or str(uuid.uuid4())
+    row['status'] = _text(item, 'status', default='pending')
+    if row['status'] not in SWAP_STATUSES:
+        raise ValueError(f"status must be one of: {', '.join(SWAP_STATUSES)}")
+    row['created_at'] = _created_at(item)
+    return row
+
+def _feedback_row(item):
+    row = {key: _text(item, key, required=True) for key in ('swap_request_id', 'giver_id', 'receiver_id')}
+    row['id'] = _text(item, 'id') or str(uuid.uuid4())
+    row['rating'] = parse_rating(item.get('rating'))
+    if row['rating'] is None:
+        raise ValueError("rating must be a whole number from 1 to 5")
+    row['comment'] = _text(item, 'comment')
+    row['created_at'] = _created_at(item)
+    return row
+
+ROW_BUILDERS = {'users': _user_row, 'swap_requests': _swap_request_row, 'feedback': _feedback_row}
+
+def _insert_sql(table):
+    columns = IMPORT_COLUMNS[table]
+    # An omitted created_at gets the column default instead of NULL
+    values = ', '.join('COALESCE(?, CURRENT_TIMESTAMP)' if column == 'created_at' else '?' for column in columns)
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({values})"
+
+def _hash_password(password):
+    return generate_password_hash(password, PASSWORD_HASH_METHOD)
+
+class _Hasher:
+    # Process pool started on the first plain-text password, so exports re-imported with hashes never pay for it.
+    # spawn, not fork: the importing process runs threads (db pool, image workers, writer) fork would copy mid-state
+    def __init__(self, processes=IMPORT_HASH_PROCESSES):
+        self.processes = processes
+        self._pool = None
+
+    def hash_all(self, passwords):
+        if not passwords:
+            return []
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'))
+        chunksize = max(1, len(passwords) // (self.processes * 4))
+        return list(self._pool.map(_hash_password, passwords, chunksize=chunksize))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+
+def read_ndjson(lines):
+    # -> (line number, object, None) or (line number, None, error) per non-blank line
+    for number, line in enumerate(lines, 1):
+        try:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            item = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(item, dict):
+            yield number, None, "Each line must be a JSON object"
+            continue
+        yield number, item, None
+
+class ImportSummary:
+    def __init__(self, table):
+        self.table = table
+        self.read = 0
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []
+        self.failed = 0
+
+    def fail(self, line, error, rows=1):
+        self.failed += rows
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self):
+        return {
+            "table": self.table,
+            "read": self.read,
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+def _unseen(conn, table, rows):
+    # The rows whose id (and, for users, name) is not in the table yet; only the first of in-file duplicates
+    existing = set(fetch_rows_by_id(conn, table, [row['id'] for row in rows], columns='id'))
+    taken_names = set()
+    if table == 'users':
+        taken_names = set(fetch_rows_by_id(conn, 'users', [row['name'] for row in rows], columns='name', key='name'))
+    unseen = []
+    for row in rows:
+        if row['id'] in existing or (table == 'users' and row['name'] in taken_names):
+            continue
+        existing.add(row['id'])
+        if table == 'users':
+            taken_names.add(row['name'])
+        unseen.append(row)
+    return unseen
+
+def _write_chunk(conn, table, numbered_rows, summary, hasher):
+    # numbered_rows: [(line number, row dict)], all written in one transaction
+    rows = [row for _, row in numbered_rows]
+    if table == 'users':
+        # Hash before taking the write lock, and only for users that will actually be inserted
+        needs_hash = [row for row in _unseen(conn, table, rows) if row['password_hash'] is None]
+        for row, password_hash in zip(needs_hash, hasher.hash_all([row['password'] for row in needs_hash])):
+            row['password_hash'] = password_hash
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        fresh = _unseen(conn, table, rows) # again under the lock: another writer may have added some meanwhile
+        columns = IMPORT_COLUMNS[table]
+        conn.executemany(_insert_sql(table), [tuple(row[column] for column in columns) for row in fresh])
+        if table == 'users':
+            # Search indexes for the whole chunk at once instead of per-user sync_user_index()
+            index_new_users(conn, [row['id'] for row in fresh])
+        elif table == 'feedback':
+            for row in fresh:
+                record_rating(conn, row['receiver_id'], row['rating'])
+        conn.commit()
+        summary.imported += len(fresh)
+        summary.skipped += len(rows) - len(fresh)
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        first, last = numbered_rows[0][0], numbered_rows[-1][0]
+        summary.fail(first, f"Lines {first}-{last} not imported: {e}", rows=len(rows))
+    except BaseException:
+        conn.rollback()
+        raise
+
+def import_ndjson(conn, table, lines, chunk_rows=IMPORT_CHUNK_ROWS, summary=None):
+    # Imports NDJSON lines (str or bytes) into table; invalid lines are reported and skipped.
+    # Each chunk commits on its own: a failure later in the file leaves the earlier chunks in place.
+    # Pass an ImportSummary to still know what was imported when reading `lines` fails part way through.
+    _check_table(table)
+    build = ROW_BUILDERS[table]
+    if summary is None:
+        summary = ImportSummary(table)
+    hasher = _Hasher()
+    chunk = []
+    try:
+        for number, item, error in read_ndjson(lines):
+            summary.read += 1
+            if error is None:
+                try:
+                    chunk.append((number, build(item)))
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                summary.fail(number, error)
+            if len(chunk) >= chunk_rows:
+                _write_chunk(conn, table, chunk, summary, hasher)
+                chunk = []
+        if chunk:
+            _write_chunk(conn, table, chunk, summary, hasher)
+    finally:
+        hasher.close()
+        if summary.imported:
+            # Also when the import stops early: the chunks committed so far stay in the database.
+            # Imported rows carry their own created_at, so the dashboard counters are reconciled rather than bumped
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rebuild_platform_stats(conn)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+    return summary
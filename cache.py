@@ -0,0 +1,139 @@
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from urllib.parse import urlencode
+from flask import request, make_response
+import cluster
+from compression import precompress, representation_response
+
+# In-process read-through cache for hot GET endpoints.
+# Entries are keyed on path + sorted query string, expire after a TTL, are evicted LRU beyond
+# max_entries, and carry tags so write paths can drop exactly what they made stale.
+# Every cached response gets a strong ETag (hash of the body) so clients can revalidate with
+# If-None-Match and receive an empty 304 instead of the full JSON. Large bodies are compressed once
+# when cached and the matching variant is picked per request (see compression.py).
+# Under the pre-fork server, invalidations are relayed to the other workers' caches (see cluster.py).
+
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 30.0)) # seconds; also bounds staleness if a relay is lost
+
+CachedResponse = namedtuple('CachedResponse', 'body status headers etag expires_at tags variants')
+
+def body_etag(body):
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+class ResponseCache:
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # key -> CachedResponse, least recently used first
+        self._tags = {} # tag -> set of keys
+        self._generations = {} # tag -> invalidation count, guards against caching a response computed before a write
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._drop(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry
+
+    def generation(self, tags):
+        with self._lock:
+            return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def set(self, key, body, status, headers, tags, generation=None):
+        entry = CachedResponse(
+            body, status, headers, body_etag(body), time.monotonic() + self.ttl, tuple(tags), precompress(body)
+        )
+        with self._lock:
+            if generation is not None and generation != tuple(self._generations.get(tag, 0) for tag in entry.tags):
+                return entry # a write invalidated these tags while the response was being built
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+        return entry
+
+    def invalidate(self, *tags, propagate=True):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+                    self._stats['invalidations'] += 1
+        if propagate:
+            cluster.announce('cache_invalidate', tags)
+
+    def clear(self, propagate=True):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+        if propagate:
+            cluster.announce('cache_clear')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['ttl'] = self.ttl
+        return stats
+
+response_cache = ResponseCache()
+cluster.on('cache_invalidate', lambda tags: response_cache.invalidate(*tags, propagate=False))
+cluster.on('cache_clear', lambda: response_cache.clear(propagate=False))
+
+def request_cache_key():
+    return request.path + '?' + urlencode(sorted(request.args.items(multi=True)))
+
+def _conditional_response(entry):
+    # no-cache: browsers may keep it but must revalidate
+    return representation_response(entry.variants, entry.etag, status=entry.status, headers=entry.headers)
+
+def cached_response(tags):
+    # tags(**view_kwargs) -> tag names used to invalidate this view's entries
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request_cache_key()
+            entry = response_cache.get(key)
+            if entry is None:
+                entry_tags = tags(**kwargs)
+                generation = response_cache.generation(entry_tags)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response # errors and 404s are not cached
+                headers = [(name, value) for name, value in response.headers.items()
+                           if name not in ('Content-Length', 'ETag', 'Cache-Control')]
+                entry = response_cache.set(key, response.get_data(), response.status_code, headers, entry_tags, generation)
+            return _conditional_response(entry)
+        return wrapper
+    return decorator
@@ -0,0 +1,77 @@
+import json
+import logging
+import socket
+import threading
+
+log = logging.getLogger('skill_swap')
+
+# Keeps the in-process state of pre-fork workers (server.py) in step.
+# Every worker has its own response cache, match/skill indexes and SSE broker. A worker that changes one of
+# them announce()s it; the master relays the message to every other worker, whose listener thread applies
+# the same change locally through the handler registered with on(). Messages are small JSON datagrams on a
+# socketpair per worker, sent after the change has committed, so a peer that re-reads the database sees it.
+# In a single process (flask run, the CLI, tests) nothing is attached and announce() does nothing.
+
+MAX_MESSAGE_BYTES = 64 * 1024
+
+_handlers = {}
+_channel = None
+_stats = {'sent': 0, 'received': 0, 'dropped': 0}
+_stats_lock = threading.Lock()
+
+def on(kind, handler):
+    _handlers[kind] = handler
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def announce(kind, *args):
+    if _channel is None:
+        return
+    message = json.dumps([kind, args], default=str).encode()
+    if len(message) > MAX_MESSAGE_BYTES:
+        # Too large to relay: peers miss this one change until their caches expire or they restart
+        log.warning("Cluster message %s too large to relay (%s bytes)", kind, len(message))
+        _count('dropped')
+        return
+    try:
+        _channel.send(message)
+        _count('sent')
+    except OSError as e:
+        log.warning("Could not announce %s to peer workers: %s", kind, e)
+        _count('dropped')
+
+def _listen(channel):
+    while True:
+        try:
+            message = channel.recv(MAX_MESSAGE_BYTES)
+        except OSError:
+            return
+        if not message:
+            return
+        kind, args = json.loads(message)
+        handler = _handlers.get(kind)
+        if handler is None:
+            continue
+        _count('received')
+        try:
+            handler(*args)
+        except Exception:
+            log.exception("Applying %s from a peer worker failed", kind)
+
+def attach(channel):
+    # Called in a worker with its end of the socketpair; starts applying peers' changes
+    global _channel
+    _channel = channel
+    threading.Thread(target=_listen, args=(channel,), name='cluster', daemon=True).start()
+
+def attached():
+    return _channel is not None
+
+def channel_pair():
+    return socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+def stats():
+    with _stats_lock:
+        return dict(_stats, attached=attached())
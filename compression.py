@@ -0,0 +1,110 @@
+import gzip
+import hashlib
+import os
+from datetime import datetime, timezone
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError: # brotli is optional: without it only gzip variants are produced
+    brotli = None
+
+# Content negotiation over precompressed representations.
+# A resource is held as {encoding: bytes}; a request gets the best variant its Accept-Encoding allows.
+# Each variant has its own strong ETag ("<hash>", "<hash>-gz", "<hash>-br"), and If-None-Match accepts
+# any of them: the variants are the same content, so a client switching encodings still revalidates.
+#   - static assets (index.html) are compressed once at startup at maximum levels and served from memory
+#   - cached JSON (cache.py) is compressed once per cache entry
+#   - other JSON responses above COMPRESS_MIN_BYTES are gzipped on the way out
+
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+JSON_GZIP_LEVEL = int(os.environ.get('JSON_GZIP_LEVEL', 6)) # per-response work: favour speed over ratio
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 300)) # seconds; index.html is not fingerprinted
+
+ETAG_SUFFIXES = {'identity': '', 'gzip': '-gz', 'br': '-br'}
+PREFERENCE = ('br', 'gzip', 'identity')
+
+def content_etag(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def precompress(data, best=False):
+    # -> {encoding: bytes}; compressed variants are only kept when they are actually smaller
+    variants = {'identity': data}
+    if len(data) < COMPRESS_MIN_BYTES:
+        return variants
+    # mtime=0 keeps the gzip bytes (and so their ETag) stable across restarts
+    variants['gzip'] = gzip.compress(data, compresslevel=9 if best else JSON_GZIP_LEVEL, mtime=0)
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11 if best else 5)
+    return {encoding: body for encoding, body in variants.items() if encoding == 'identity' or len(body) < len(data)}
+
+def negotiate(variants):
+    accepted = request.accept_encodings
+    for encoding in PREFERENCE:
+        if encoding in variants and (encoding == 'identity' or accepted.quality(encoding) > 0):
+            return encoding
+    return 'identity'
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return any(request.if_none_match.contains_weak(etag + suffix) for suffix in ETAG_SUFFIXES.values())
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+def representation_response(variants, etag, status=200, headers=None, mimetype=None, cache_control='no-cache', last_modified=None):
+    # Picks the variant for this request and answers 304 when the client's copy is current
+    encoding = negotiate(variants)
+    if status == 200 and _not_modified(etag, last_modified):
+        response = current_app.response_class(status=304, headers=headers)
+        response.headers.pop('Content-Type', None)
+    else:
+        response = current_app.response_class(variants[encoding], status=status, headers=headers, mimetype=mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    if len(variants) > 1:
+        response.vary.add('Accept-Encoding')
+    response.set_etag(etag + ETAG_SUFFIXES[encoding])
+    response.headers['Cache-Control'] = cache_control
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+class StaticAsset:
+    # A file read and compressed once; requests are served from memory without touching the filesystem
+    def __init__(self, path, mimetype):
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.mimetype = mimetype
+        self.etag = content_etag(data)
+        self.last_modified = datetime.fromtimestamp(int(os.path.getmtime(path)), tz=timezone.utc)
+        self.variants = precompress(data, best=True)
+
+    @classmethod
+    def load(cls, path, mimetype):
+        # None when the file does not exist, so callers can fall back to their old behaviour
+        return cls(path, mimetype) if os.path.isfile(path) else None
+
+    def response(self):
+        return representation_response(
+            self.variants, self.etag, mimetype=self.mimetype, last_modified=self.last_modified,
+            cache_control=f'public, max-age={STATIC_MAX_AGE}',
+        )
+
+def compress_response(response):
+    # after_request hook: gzip large JSON bodies that were not served from a precompressed representation
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings.quality('gzip') <= 0:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=JSON_GZIP_LEVEL, mtime=0))
+    response.headers['Content-Encoding'] = 'gzip'
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + ETAG_SUFFIXES['gzip'], weak)
+    return response
@@ -0,0 +1,197 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from flask import g, has_app_context
+from metrics import observe_query
+
+# Pool sizing and SQLite tuning, overridable from the environment
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10.0)) # seconds to wait for a free connection
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', 16384))
+DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 128 * 1024 * 1024))
+DB_STATEMENT_CACHE = int(os.environ.get('DB_STATEMENT_CACHE', 256))
+
+class PoolTimeout(Exception):
+    pass
+
+class TimedCursor(sqlite3.Cursor):
+    # Times every statement for the sqlite metrics and the slow query log.
+    # Only execute() is timed: for lazily stepped SELECTs the first row is produced here, later fetches are not.
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            observe_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            observe_query(sql, time.perf_counter() - started)
+
+class PooledConnection(sqlite3.Connection):
+    # close() hands the connection back to its pool instead of closing the file handle.
+    # Connections bound to a Flask request are released in teardown, so close() is a no-op for them.
+    _pool = None
+    _request_scoped = False
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # The C implementations of these bypass cursor(), so route them through a timed cursor
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self._request_scoped:
+            return
+        if self._pool is not None:
+            self._pool.release(self)
+        else:
+            sqlite3.Connection.close(self)
+
+class ConnectionPool:
+    def __init__(self, database, max_size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue() # LIFO keeps the hottest page caches in use
+        self._lock = threading.Lock()
+        self._all = set()
+        self._in_use = 0
+        self._stats = {
+            'created': 0,
+            'acquired': 0,
+            'released': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'timeouts': 0,
+            'max_in_use': 0,
+        }
+
+    def _connect(self):
+        # cached_statements keeps compiled statements alive for the life of the pooled connection
+        conn = sqlite3.connect(
+            self.database,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000.0,
+            check_same_thread=False,
+            factory=PooledConnection,
+            cached_statements=DB_STATEMENT_CACHE,
+        )
+        conn.row_factory = sqlite3.Row
+        # Takes effect only on a brand-new file, and only before WAL mode writes its header (see retention.py)
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA synchronous = NORMAL") # safe with WAL, avoids an fsync per commit
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn._pool = self
+        return conn
+
+    def open_dedicated(self):
+        # Same settings as the pooled connections, but owned by the caller (e.g. the group-commit writer)
+        conn = self._connect()
+        conn._pool = None
+        return conn
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if len(self._all) < self.max_size:
+                    conn = self._connect()
+                    self._all.add(conn)
+                    self._stats['created'] += 1
+            if conn is None:
+                started = time.monotonic()
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats['timeouts'] += 1
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                finally:
+                    with self._lock:
+                        self._stats['waits'] += 1
+                        self._stats['wait_time_total'] += time.monotonic() - started
+        with self._lock:
+            self._in_use += 1
+            self._stats['acquired'] += 1
+            self._stats['max_in_use'] = max(self._stats['max_in_use'], self._in_use)
+        return conn
+
+    def release(self, conn):
+        conn._request_scoped = False
+        if conn.in_transaction:
+            conn.rollback() # never hand out a connection with someone else's open transaction
+        with self._lock:
+            self._in_use -= 1
+            self._stats['released'] += 1
+        self._idle.put(conn)
+
+    def warm(self, count):
+        # Opens up to count connections ahead of traffic, so the first requests of a new worker skip the connect
+        conns = [self.acquire() for _ in range(min(count, self.max_size))]
+        for conn in conns:
+            conn.execute("SELECT 1 FROM sqlite_master LIMIT 1") # reads the schema into the connection
+            self.release(conn)
+
+    def close_all(self):
+        with self._lock:
+            conns = list(self._all)
+            self._all.clear()
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for conn in conns:
+            sqlite3.Connection.close(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._all)
+            stats['in_use'] = self._in_use
+        stats['max_size'] = self.max_size
+        stats['idle'] = self._idle.qsize()
+        stats['avg_wait_ms'] = (stats['wait_time_total'] / stats['waits'] * 1000.0) if stats['waits'] else 0.0
+        return stats
+
+pool = None
+
+def init_pool(app, database, max_size=DB_POOL_SIZE):
+    global pool
+    if pool is not None:
+        pool.close_all()
+    pool = ConnectionPool(database, max_size=max_size)
+    app.teardown_appcontext(release_request_connection)
+    return pool
+
+def get_db_connection():
+    # Inside a request the same pooled connection is reused until teardown
+    if has_app_context():
+        conn = g.get('_db_conn')
+        if conn is None:
+            conn = pool.acquire()
+            conn._request_scoped = True
+            g._db_conn = conn
+        return conn
+    return pool.acquire()
+
+def release_request_connection(exception=None):
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        pool.release(conn)
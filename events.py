@@ -0,0 +1,173 @@
+import json
+import os
+import queue
+import threading
+import uuid
+from collections import deque, namedtuple
+import cluster
+
+# In-process publish/subscribe for the Server-Sent Events stream.
+# Write paths publish after commit; each subscriber owns a bounded queue, so a slow client can never
+# hold memory or block a publisher. A subscriber whose queue overflows is disconnected and resumes
+# through Last-Event-ID from the recent-event history (or is told to resync if it fell too far behind).
+# Event ids are "<process epoch>-<sequence>", so ids from a restarted process are recognised as stale.
+# Under the pre-fork server every worker has its own broker and events are relayed between them (cluster.py);
+# ids are per worker, so a client reconnecting to a different worker is told to resync.
+# An open stream holds a server thread for as long as the client stays connected, so each process serves at
+# most EVENT_MAX_STREAMS of them (server.py gives them threads of their own); beyond that subscribe() refuses.
+
+EVENT_QUEUE_SIZE = int(os.environ.get('EVENT_QUEUE_SIZE', 100))
+EVENT_HISTORY_SIZE = int(os.environ.get('EVENT_HISTORY_SIZE', 1000))
+HEARTBEAT_INTERVAL = float(os.environ.get('EVENT_HEARTBEAT_INTERVAL', 15.0)) # seconds
+MAX_STREAMS = int(os.environ.get('EVENT_MAX_STREAMS', 64)) # open streams per process
+CLIENT_RETRY_MS = 3000
+
+BROADCAST = 'all'
+
+Event = namedtuple('Event', 'seq name data topics')
+
+class StreamsExhausted(Exception):
+    pass
+
+class Subscription:
+    def __init__(self, topics):
+        self.topics = topics
+        self.queue = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.overflowed = False
+        self.needs_resync = False
+        self.closed = False
+
+    def offer(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def close(self):
+        self.closed = True
+        try:
+            self.queue.put_nowait(None) # wakes the stream if it is waiting
+        except queue.Full:
+            pass
+
+class EventBroker:
+    def __init__(self, history_size=EVENT_HISTORY_SIZE, max_streams=MAX_STREAMS):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.max_streams = max_streams
+        self.open_streams = 0
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._history = deque(maxlen=history_size)
+        self._subscribers = {} # topic -> set of Subscription
+        self._stats = {'published': 0, 'delivered': 0, 'overflows': 0, 'resyncs': 0, 'refused': 0}
+        self.closed = False
+
+    def event_id(self, event):
+        return f"{self.epoch}-{event.seq}"
+
+    def publish(self, name, payload, topics, propagate=True):
+        data = json.dumps(payload, default=str)
+        if propagate:
+            cluster.announce('event', name, payload, sorted(topics))
+        with self._lock:
+            self._seq += 1
+            event = Event(self._seq, name, data, frozenset(topics))
+            self._history.append(event)
+            targets = set()
+            for topic in event.topics:
+                targets.update(self._subscribers.get(topic, ()))
+            self._stats['published'] += 1
+            self._stats['delivered'] += len(targets)
+        for subscription in targets:
+            subscription.offer(event)
+        return event
+
+    def _parse_last_event_id(self, last_event_id):
+        # Returns the sequence number to resume after, or None when resuming is impossible
+        epoch, _, seq = (last_event_id or '').partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def subscribe(self, topics, last_event_id=None):
+        subscription = Subscription(frozenset(topics))
+        with self._lock:
+            if self.open_streams >= self.max_streams:
+                self._stats['refused'] += 1
+                raise StreamsExhausted("Too many open event streams, please retry")
+            self.open_streams += 1
+            # Register and replay under the same lock so nothing published in between is lost
+            subscription.closed = self.closed
+            for topic in subscription.topics:
+                self._subscribers.setdefault(topic, set()).add(subscription)
+            if last_event_id:
+                after = self._parse_last_event_id(last_event_id)
+                oldest = self._history[0].seq if self._history else self._seq + 1
+                if after is None or after < oldest - 1:
+                    subscription.needs_resync = True
+                    self._stats['resyncs'] += 1
+                else:
+                    for event in self._history:
+                        if event.seq > after and event.topics & subscription.topics:
+                            subscription.offer(event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self.open_streams -= 1
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[topic]
+            if subscription.overflowed:
+                self._stats['overflows'] += 1
+
+    def close(self):
+        # Ends every open stream, e.g. in a worker that is shutting down; clients reconnect to another one
+        with self._lock:
+            self.closed = True
+            subscriptions = {s for subscribers in self._subscribers.values() for s in subscribers}
+        for subscription in subscriptions:
+            subscription.close()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['subscribers'] = len({s for subscribers in self._subscribers.values() for s in subscribers})
+            stats['history'] = len(self._history)
+            stats['open_streams'] = self.open_streams
+        return stats
+
+    def stream(self, subscription):
+        # Generator of SSE frames; ends when the client disconnects or after draining an overflowed queue
+        try:
+            yield f"retry: {CLIENT_RETRY_MS}\n\n"
+            if subscription.needs_resync:
+                # Missed events are gone: the client should refetch its state
+                yield f"id: {self.epoch}-{self._seq}\nevent: resync\ndata: {{}}\n\n"
+            while not subscription.closed:
+                try:
+                    if subscription.overflowed:
+                        event = subscription.queue.get_nowait() # drain, then let the client reconnect and replay
+                    else:
+                        event = subscription.queue.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    if subscription.overflowed:
+                        return
+                    yield ": heartbeat\n\n"
+                    continue
+                if event is None:
+                    return
+                yield f"id: {self.event_id(event)}\nevent: {event.name}\ndata: {event.data}\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+broker = EventBroker()
+cluster.on('event', lambda name, payload, topics: broker.publish(name, payload, topics, propagate=False))
+
+def user_topic(user_id):
+    return f"user:{user_id}"
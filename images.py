@@ -0,0 +1,145 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+except ImportError: # Pillow is optional: without it uploads are stored as-is, without thumbnails
+    Image = None
+
+# Profile photo pipeline.
+# Uploads are stored content-addressed (<sha256 prefix>.<ext>) so identical files are shared, and are
+# re-encoded to bounded dimensions plus small/medium thumbnails on a background worker pool.
+# The upload request hashes the file and sniffs its header; decoding, resizing and encoding happen once, on the
+# pool. The request waits only for the decode, so a corrupt or truncated upload is still rejected with it, and
+# the first GET of a photo that is still being processed waits for the rest of its job.
+
+MAX_UPLOAD_BYTES = int(os.environ.get('PROFILE_PHOTO_MAX_BYTES', 5 * 1024 * 1024))
+MAX_DIMENSION = 1024
+THUMBNAIL_SIZES = {'md': 384, 'sm': 128} # suffix -> longest side in pixels
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', min(4, os.cpu_count() or 1)))
+PROCESSING_WAIT_TIMEOUT = 30.0 # seconds a GET waits for a photo that is still being processed
+DECODE_WAIT_TIMEOUT = float(os.environ.get('IMAGE_DECODE_TIMEOUT', 10.0)) # seconds an upload waits for its decode
+ACCEPTED_FORMATS = {'PNG', 'JPEG', 'GIF'}
+
+log = logging.getLogger('skill_swap')
+
+if Image is not None:
+    Image.MAX_IMAGE_PIXELS = 40_000_000 # refuse decompression bombs well before they exhaust memory
+
+_STORED_NAME_RE = re.compile(r'^([0-9a-f]{32})(?:_(\w+))?\.(jpg|png|gif|jpeg)$')
+
+_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix='image')
+_pending = {} # digest -> Job
+_pending_lock = threading.Lock()
+
+# future: the whole processing job; decoded: resolved once the upload has been fully decoded (or failed to)
+Job = namedtuple('Job', 'future decoded')
+
+class ImageRejected(ValueError):
+    pass
+
+class ImageProcessingBusy(Exception):
+    pass
+
+def _save_atomic(image, path, ext):
+    tmp_path = f"{path}.tmp-{threading.get_ident()}"
+    if ext == 'png':
+        image.save(tmp_path, 'PNG', optimize=True)
+    else:
+        image.save(tmp_path, 'JPEG', quality=85, optimize=True, progressive=True)
+    os.replace(tmp_path, path)
+
+def _process(upload_folder, digest, ext, data, decoded):
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            source.load() # full decode: a valid header can still hide truncated or corrupt pixel data
+            image = ImageOps.exif_transpose(source) # first frame only for GIFs
+            image = image.convert('RGBA' if ext == 'png' else 'RGB')
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        decoded.set_exception(ImageRejected("Profile photo is not a valid image"))
+        raise
+    except BaseException as e:
+        decoded.set_exception(e)
+        raise
+    decoded.set_result(True)
+    # Thumbnails first, full size last: the full-size file existing means the set is complete
+    for suffix, size in list(THUMBNAIL_SIZES.items()) + [(None, MAX_DIMENSION)]:
+        variant = image.copy()
+        variant.thumbnail((size, size), Image.LANCZOS)
+        name = f"{digest}_{suffix}.{ext}" if suffix else f"{digest}.{ext}"
+        _save_atomic(variant, os.path.join(upload_folder, name), ext)
+
+def _finish(digest, future):
+    with _pending_lock:
+        _pending.pop(digest, None)
+    if future.exception() is not None:
+        log.warning("Profile photo processing failed for %s: %s", digest, future.exception())
+
+def store_profile_photo(upload_folder, data, original_filename):
+    # Validates an upload and schedules processing; returns the stored file name once the upload has decoded
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise ImageRejected(f"Profile photo must be at most {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+    digest = hashlib.sha256(data).hexdigest()[:32]
+
+    if Image is None:
+        filename = f"{digest}.{original_filename.rsplit('.', 1)[1].lower()}"
+        path = os.path.join(upload_folder, filename)
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(data)
+        return filename
+
+    try:
+        with Image.open(io.BytesIO(data)) as image: # reads the header only
+            image_format = image.format
+            has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise ImageRejected("Profile photo is not a valid image")
+    if image_format not in ACCEPTED_FORMATS:
+        raise ImageRejected("Invalid file type for profile photo")
+
+    ext = 'png' if has_alpha else 'jpg'
+    filename = f"{digest}.{ext}"
+    with _pending_lock:
+        # Same bytes already stored or in flight: share them
+        if os.path.exists(os.path.join(upload_folder, filename)):
+            return filename
+        job = _pending.get(digest)
+        submitted = job is None
+        if submitted:
+            decoded = Future()
+            job = _pending[digest] = Job(_executor.submit(_process, upload_folder, digest, ext, data, decoded), decoded)
+    if submitted:
+        job.future.add_done_callback(lambda f: _finish(digest, f))
+    try:
+        job.decoded.result(DECODE_WAIT_TIMEOUT) # raises ImageRejected for an undecodable upload
+    except FutureTimeout:
+        raise ImageProcessingBusy("Profile photo processing is busy, please retry")
+    return filename
+
+def wait_for_photo(filename, timeout=PROCESSING_WAIT_TIMEOUT):
+    match = _STORED_NAME_RE.match(filename)
+    if not match:
+        return
+    with _pending_lock:
+        job = _pending.get(match.group(1))
+    if job is not None:
+        try:
+            job.future.result(timeout)
+        except Exception:
+            pass # logged by _finish; the file simply won't exist
+
+def thumbnail_url(photo_url, size='sm'):
+    # /uploads/<digest>.jpg -> /uploads/<digest>_sm.jpg; anything else (legacy uploads, external URLs) unchanged
+    if not photo_url or not photo_url.startswith('/uploads/'):
+        return photo_url
+    match = _STORED_NAME_RE.match(photo_url[len('/uploads/'):])
+    if not match or match.group(2) or Image is None:
+        return photo_url
+    return f"/uploads/{match.group(1)}_{size}.{match.group(3)}"
@@ -0,0 +1,183 @@
+import threading
+from search import split_skills
+
+# In-memory reciprocal matching index.
+# Every user gets a bit slot; for each skill we keep one integer bitset of the users offering it and
+# one of the users wanting it. Candidates for user U are then
+#   OR(offered_bits[s] for s in U.wanted) & OR(wanted_bits[s] for s in U.offered) & public & ~banned
+# which costs a handful of big-int operations per skill instead of a loop over all users.
+# Scores are counted the same way: the bitsets of U's skills are summed into bit-sliced counters (one bitset per
+# binary digit of "how many of my wanted skills does each user offer", and one for the other direction), so
+# every candidate's score is known without visiting it. Matches are then read out one score level at a
+# time, best first, stopping as soon as `limit` of them are found.
+
+class MatchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._slots = {} # user_id -> slot
+        self._user_ids = [] # slot -> user_id
+        self._offered = [] # slot -> {skill key: display name}
+        self._wanted = []
+        self._offered_bits = {} # skill key -> bitset of slots
+        self._wanted_bits = {}
+        self._public = 0
+        self._banned = 0
+        self.loaded = False
+
+    def load(self, conn):
+        users = conn.execute("SELECT id, skills_offered, skills_wanted, is_public, is_banned FROM users").fetchall()
+        with self._lock:
+            self._reset()
+            for user in users:
+                self.update_user(user['id'], user['skills_offered'], user['skills_wanted'],
+                                 is_public=user['is_public'], is_banned=user['is_banned'])
+            self.loaded = True
+        return len(users)
+
+    def _slot(self, user_id):
+        slot = self._slots.get(user_id)
+        if slot is None:
+            slot = len(self._user_ids)
+            self._slots[user_id] = slot
+            self._user_ids.append(user_id)
+            self._offered.append({})
+            self._wanted.append({})
+        return slot
+
+    @staticmethod
+    def _skill_map(skills):
+        return {skill.lower(): skill for skill in split_skills(skills)}
+
+    @staticmethod
+    def _move_bits(bits_by_skill, old_keys, new_keys, bit):
+        for key in old_keys - new_keys:
+            remaining = bits_by_skill[key] & ~bit
+            if remaining:
+                bits_by_skill[key] = remaining
+            else:
+                del bits_by_skill[key]
+        for key in new_keys - old_keys:
+            bits_by_skill[key] = bits_by_skill.get(key, 0) | bit
+
+    def update_user(self, user_id, skills_offered, skills_wanted, is_public=None, is_banned=None):
+        # Incremental update: only the postings of skills that were added or removed are touched
+        with self._lock:
+            slot = self._slot(user_id)
+            bit = 1 << slot
+            offered = self._skill_map(skills_offered)
+            wanted = self._skill_map(skills_wanted)
+            self._move_bits(self._offered_bits, self._offered[slot].keys(), offered.keys(), bit)
+            self._move_bits(self._wanted_bits, self._wanted[slot].keys(), wanted.keys(), bit)
+            self._offered[slot] = offered
+            self._wanted[slot] = wanted
+            if is_public is not None:
+                self._public = self._public | bit if is_public else self._public & ~bit
+            if is_banned is not None:
+                self.set_banned(user_id, is_banned)
+
+    def set_banned(self, user_id, is_banned):
+        with self._lock:
+            bit = 1 << self._slot(user_id)
+            self._banned = self._banned | bit if is_banned else self._banned & ~bit
+
+    def has_user(self, user_id):
+        return user_id in self._slots
+
+    @staticmethod
+    def _count(bitsets):
+        # Bit-sliced sum: planes[i] holds bit i of each slot's count of the bitsets it appears in
+        planes = []
+        for bits in bitsets:
+            carry = bits
+            for i, plane in enumerate(planes):
+                if not carry:
+                    break
+                planes[i], carry = plane ^ carry, plane & carry
+            if carry:
+                planes.append(carry)
+        return planes
+
+    @staticmethod
+    def _equal(planes, count, within):
+        # Slots of `within` whose bit-sliced count is exactly `count`
+        if count >> len(planes):
+            return 0 # more than any slot reached
+        for i, plane in enumerate(planes):
+            within &= plane if count >> i & 1 else ~plane
+            if not within:
+                break
+        return within
+
+    def match(self, user_id, exclude=(), limit=20):
+        # Returns [(user_id, score, offers_you_want, wants_you_offer)] best first
+        with self._lock:
+            slot = self._slots.get(user_id)
+            if slot is None:
+                return []
+            my_offered = self._offered[slot]
+            my_wanted = self._wanted[slot]
+
+            they_offer_bits = [self._offered_bits[key] for key in my_wanted if key in self._offered_bits]
+            they_want_bits = [self._wanted_bits[key] for key in my_offered if key in self._wanted_bits]
+            offers_what_i_want = 0
+            for bits in they_offer_bits:
+                offers_what_i_want |= bits
+            wants_what_i_offer = 0
+            for bits in they_want_bits:
+                wants_what_i_offer |= bits
+            candidates = offers_what_i_want & wants_what_i_offer & self._public & ~self._banned
+            if not candidates:
+                return []
+            offer_planes = self._count(they_offer_bits)
+            want_planes = self._count(they_want_bits)
+            # Excluded partners are skipped while reading slots out, not masked off the N-bit candidate set
+            skip = {self._slots[other_id] for other_id in exclude if other_id in self._slots}
+            skip.add(slot)
+
+            # Score = skills they offer that I want + skills they want that I offer; ties go to the more
+            # balanced exchange, then to the earlier slot
+            levels = {}
+            for offer_count in range(1, len(they_offer_bits) + 1):
+                offer_level = self._equal(offer_planes, offer_count, candidates)
+                if not offer_level:
+                    continue
+                for want_count in range(1, len(they_want_bits) + 1):
+                    level = self._equal(want_planes, want_count, offer_level)
+                    if level:
+                        key = (offer_count + want_count, min(offer_count, want_count))
+                        levels[key] = levels.get(key, 0) | level
+
+            best = []
+            for key in sorted(levels, reverse=True):
+                level = levels[key]
+                while level and len(best) < limit:
+                    low = level & -level
+                    level ^= low
+                    other = low.bit_length() - 1
+                    if other not in skip:
+                        best.append((key[0], other))
+                if len(best) >= limit:
+                    break
+
+            matches = []
+            for score, other in best:
+                they_offer = my_wanted.keys() & self._offered[other].keys()
+                they_want = my_offered.keys() & self._wanted[other].keys()
+                matches.append((self._user_ids[other], score,
+                                sorted(my_wanted[key] for key in they_offer),
+                                sorted(my_offered[key] for key in they_want)))
+            return matches
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._user_ids),
+                'eligible': bin(self._public & ~self._banned).count('1'),
+                'offered_skills': len(self._offered_bits),
+                'wanted_skills': len(self._wanted_bits),
+            }
+
+match_index = MatchIndex()
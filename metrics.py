@@ -0,0 +1,134 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+# Request and SQL instrumentation, exported in the Prometheus text format on /metrics.
+# Everything is kept in plain dicts behind one lock; label sets are bounded (route templates,
+# not raw paths; statement verbs, not SQL text) so memory does not grow with traffic.
+
+log = logging.getLogger('skill_swap')
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+SLOW_QUERY_SECONDS = float(os.environ.get('SLOW_QUERY_MS', 100)) / 1000.0
+SLOW_QUERY_LOG_SIZE = 50
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket holding the q-th observation, as histogram_quantile() does
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+_lock = threading.Lock()
+_request_latency = {} # (method, route) -> Histogram
+_request_status = {} # (method, route, status) -> count
+_in_flight = {} # route -> gauge
+_query_latency = {} # verb -> Histogram
+_slow_query_count = {} # verb -> count
+_slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+def request_started(route):
+    with _lock:
+        _in_flight[route] = _in_flight.get(route, 0) + 1
+
+def request_finished(method, route, status, seconds):
+    with _lock:
+        _in_flight[route] -= 1
+        histogram = _request_latency.get((method, route))
+        if histogram is None:
+            histogram = _request_latency[(method, route)] = Histogram()
+        histogram.observe(seconds)
+        key = (method, route, status)
+        _request_status[key] = _request_status.get(key, 0) + 1
+
+def observe_query(sql, seconds):
+    verb = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else 'EMPTY'
+    slow = seconds >= SLOW_QUERY_SECONDS
+    if slow:
+        sql = ' '.join(sql.split())
+    with _lock:
+        histogram = _query_latency.get(verb)
+        if histogram is None:
+            histogram = _query_latency[verb] = Histogram()
+        histogram.observe(seconds)
+        if slow:
+            _slow_query_count[verb] = _slow_query_count.get(verb, 0) + 1
+            _slow_queries.append({'sql': sql, 'ms': round(seconds * 1000.0, 2), 'at': time.time()})
+    if slow:
+        log.warning("Slow query (%.1f ms): %s", seconds * 1000.0, sql)
+
+def slow_queries():
+    with _lock:
+        return list(_slow_queries)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+def _histogram_lines(name, histograms, label_names):
+    lines = [f"# TYPE {name} histogram"]
+    for key, histogram in sorted(histograms.items()):
+        labels = dict(zip(label_names, key if isinstance(key, tuple) else (key,)))
+        cumulative = 0
+        for bound, bucket_count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f"{name}_bucket{_labels(**labels, le=le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+def _quantile_lines(name, histograms, label_names):
+    lines = [f"# TYPE {name} gauge"]
+    for key, histogram in sorted(histograms.items()):
+        labels = dict(zip(label_names, key if isinstance(key, tuple) else (key,)))
+        for q in QUANTILES:
+            lines.append(f"{name}{_labels(**labels, quantile=q)} {histogram.quantile(q)}")
+    return lines
+
+def render_prometheus(gauges=None):
+    # gauges: {metric name: number} snapshotted from the other subsystems (pool, caches, broker, ...)
+    with _lock:
+        lines = _histogram_lines('http_request_duration_seconds', _request_latency, ('method', 'route'))
+        lines += _quantile_lines('http_request_duration_quantile_seconds', _request_latency, ('method', 'route'))
+        lines.append("# TYPE http_requests_total counter")
+        for (method, route, status), count in sorted(_request_status.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+        lines.append("# TYPE http_requests_in_flight gauge")
+        for route, value in sorted(_in_flight.items()):
+            lines.append(f"http_requests_in_flight{_labels(route=route)} {value}")
+        lines += _histogram_lines('sqlite_query_duration_seconds', _query_latency, ('verb',))
+        lines += _quantile_lines('sqlite_query_duration_quantile_seconds', _query_latency, ('verb',))
+        lines.append("# TYPE sqlite_slow_queries_total counter")
+        for verb, count in sorted(_slow_query_count.items()):
+            lines.append(f"sqlite_slow_queries_total{_labels(verb=verb)} {count}")
+    for name, value in (gauges or {}).items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {float(value)}")
+    return '\n'.join(lines) + '\n'
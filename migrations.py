@@ -0,0 +1,149 @@
+import logging
+import re
+from search import create_search_schema, backfill_search_index, rebuild_search_index
+from ratings import SCHEMA as RATING_STATS_SCHEMA, rebuild_rating_stats
+from platform_stats import create_platform_stats_schema, rebuild_platform_stats
+from retention import create_archive_schema
+
+# Versioned schema migrations driven by PRAGMA user_version.
+# Each migration runs once, in its own write transaction, and bumps user_version on commit.
+# Databases created before migrations existed sit at version 0; migration 1 is written with
+# IF NOT EXISTS so it adopts them without touching their data.
+
+log = logging.getLogger('skill_swap')
+
+def _base_schema(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            password_hash TEXT NOT NULL,
+            location TEXT,
+            skills_offered TEXT,
+            skills_wanted TEXT,
+            availability TEXT,
+            is_public INTEGER DEFAULT 1,
+            is_admin INTEGER DEFAULT 0,
+            is_banned INTEGER DEFAULT 0,
+            profile_photo TEXT, -- New column for profile photo URL/path
+            theme TEXT DEFAULT 'indigo',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS swap_requests (
+            id TEXT PRIMARY KEY,
+            sender_id TEXT NOT NULL,
+            sender_name TEXT NOT NULL,
+            receiver_id TEXT NOT NULL,
+            receiver_name TEXT NOT NULL,
+            skill_offered TEXT NOT NULL,
+            skill_wanted TEXT NOT NULL,
+            status TEXT DEFAULT 'pending', -- pending, accepted, rejected
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (sender_id) REFERENCES users (id),
+            FOREIGN KEY (receiver_id) REFERENCES users (id)
+        );
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS feedback (
+            id TEXT PRIMARY KEY,
+            swap_request_id TEXT NOT NULL,
+            giver_id TEXT NOT NULL,
+            receiver_id TEXT NOT NULL,
+            rating INTEGER NOT NULL,
+            comment TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (swap_request_id) REFERENCES swap_requests (id),
+            FOREIGN KEY (giver_id) REFERENCES users (id),
+            FOREIGN KEY (receiver_id) REFERENCES users (id)
+        );
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS platform_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    ''')
+
+def _search_index(conn):
+    # Normalized skill index and FTS5 table (see search.py), backfilled from the comma-joined columns
+    create_search_schema(conn)
+    backfill_search_index(conn)
+
+def _hot_path_indexes(conn):
+    # get_user_swap_requests: one range scan per side of the UNION ALL, already in created_at order
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_swap_requests_sender_created ON swap_requests (sender_id, created_at, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_swap_requests_receiver_created ON swap_requests (receiver_id, created_at, id)")
+    # Admin monitoring by status, and keyset pagination of the admin/feedback lists
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_swap_requests_status_created ON swap_requests (status, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_swap_requests_created ON swap_requests (created_at, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_receiver ON feedback (receiver_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_swap_request ON feedback (swap_request_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_created ON feedback (created_at, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at, id)")
+
+def _rating_stats(conn):
+    conn.execute(RATING_STATS_SCHEMA)
+    rebuild_rating_stats(conn)
+
+def _platform_stats(conn):
+    create_platform_stats_schema(conn)
+    rebuild_platform_stats(conn)
+
+def _swap_request_archive(conn):
+    create_archive_schema(conn)
+
+def _fts_rowids(conn):
+    # users_fts rows used to get their own rowids; key them by the users rowid (see search.py)
+    rebuild_search_index(conn)
+
+# (version, description, function) -- append only, never renumber
+MIGRATIONS = [
+    (1, 'base schema', _base_schema),
+    (2, 'skill and full-text search indexes', _search_index),
+    (3, 'hot path indexes', _hot_path_indexes),
+    (4, 'user rating aggregates', _rating_stats),
+    (5, 'platform counters and daily stats', _platform_stats),
+    (6, 'swap request archive', _swap_request_archive),
+    (7, 'full-text rows keyed by users rowid', _fts_rowids),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    # Returns the list of migration versions applied by this call
+    applied = []
+    if not conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone():
+        # Only settable before the first table exists (and, for WAL databases, before WAL mode is set:
+        # db.py does it there); lets retention.py free pages without a full VACUUM
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    for version, description, apply in MIGRATIONS:
+        if get_schema_version(conn) >= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE") # take the write lock so concurrent starters don't race
+        try:
+            # Another process may have migrated while we waited for the lock
+            if get_schema_version(conn) < version:
+                apply(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+                applied.append(version)
+                log.info("Applied migration %s: %s", version, description)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
+
+# A whole table ("SCAN users"), a whole index ("SCAN users USING [COVERING] INDEX idx", "... USING INTEGER
+# PRIMARY KEY") or a virtual table without any usable constraint ("SCAN users_fts VIRTUAL TABLE INDEX 0:")
+_FULL_SCAN_RE = re.compile(r'^SCAN (\w+)(?: USING (?:COVERING )?INDEX \w+| USING INTEGER PRIMARY KEY| VIRTUAL TABLE INDEX \d+:)?$')
+
+def find_full_scans(conn, sql, params=(), expected=()):
+    # EXPLAIN QUERY PLAN rows that read a whole table or index instead of a range, except the `expected` ones
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [row['detail'] for row in plan if _FULL_SCAN_RE.match(row['detail']) and row['detail'] not in expected]
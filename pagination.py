@@ -0,0 +1,119 @@
+import base64
+import json
+from flask import current_app, jsonify
+
+# Keyset (cursor) pagination and field projection shared by the list endpoints.
+# A cursor is the (sort key, id) pair of the last row of the previous page, so each page
+# is an index range scan instead of an OFFSET that re-reads every earlier row.
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+class PaginationError(ValueError):
+    pass
+
+def encode_cursor(sort_value, row_id):
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        cursor = json.loads(raw)
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+    # Both members end up as SQL parameters: only scalars get that far
+    if not (isinstance(cursor, list) and len(cursor) == 2 and all(_is_scalar(value) for value in cursor)):
+        raise PaginationError("Invalid cursor")
+    sort_value, row_id = cursor
+    return sort_value, row_id
+
+def _is_scalar(value):
+    return value is None or (isinstance(value, (str, int, float)) and not isinstance(value, bool))
+
+def parse_page_args(args):
+    # Without limit or cursor the endpoint returns the full list, as before
+    limit = args.get('limit')
+    cursor = args.get('cursor')
+    if limit is None and cursor is None:
+        return None, None
+    if limit is None:
+        limit = DEFAULT_PAGE_LIMIT
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise PaginationError("limit must be an integer")
+        if limit < 1:
+            raise PaginationError("limit must be at least 1")
+    return min(limit, MAX_PAGE_LIMIT), decode_cursor(cursor) if cursor else None
+
+def parse_fields(args, allowed):
+    # ?fields=id,name,skills_offered -> ordered subset of `allowed`; all of them when absent
+    raw = args.get('fields')
+    if not raw:
+        return list(allowed)
+    fields = []
+    for field in raw.split(','):
+        field = field.strip()
+        if not field:
+            continue
+        if field not in allowed:
+            raise PaginationError(f"Unknown field: {field}")
+        if field not in fields:
+            fields.append(field)
+    return fields or list(allowed)
+
+def keyset_condition(sort_key, id_key, cursor, descending=True):
+    # NULL sort keys come last in DESC order and first in ASC order, matching SQLite's ORDER BY
+    sort_value, row_id = cursor
+    if descending:
+        if sort_value is None:
+            return f"({sort_key} IS NULL AND {id_key} < ?)", [row_id]
+        return f"({sort_key} < ? OR ({sort_key} = ? AND {id_key} < ?) OR {sort_key} IS NULL)", [sort_value, sort_value, row_id]
+    if sort_value is None:
+        return f"(({sort_key} IS NULL AND {id_key} > ?) OR {sort_key} IS NOT NULL)", [row_id]
+    return f"({sort_key} > ? OR ({sort_key} = ? AND {id_key} > ?))", [sort_value, sort_value, row_id]
+
+def paginate_query(sql, params, sort_key, id_key, limit=None, cursor=None, descending=True):
+    # Wraps `sql` (which must select sort_key and id_key) with the keyset filter, ordering and limit.
+    # SQLite flattens the subquery, so the filter still reaches the underlying indexes.
+    params = list(params)
+    direction = 'DESC' if descending else 'ASC'
+    where = ''
+    if cursor is not None:
+        condition, condition_params = keyset_condition(sort_key, id_key, cursor, descending)
+        where = f" WHERE {condition}"
+        params.extend(condition_params)
+    query = f"SELECT * FROM ({sql}){where} ORDER BY {sort_key} {direction}, {id_key} {direction}"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit + 1) # one extra row tells us whether there is a next page
+    return query, params
+
+def split_page(rows, limit, sort_key, id_key):
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[sort_key], last[id_key])
+
+def select_columns(fields, *required, prefix=''):
+    # Projected columns plus whatever the keyset needs, without duplicates
+    columns = list(fields)
+    for column in required:
+        if column not in columns:
+            columns.append(column)
+    return ', '.join(prefix + column for column in columns)
+
+def paginated_response(items, next_cursor):
+    # The body stays a plain JSON array; the next page's cursor travels in a header.
+    # items may also be the array already encoded (see serialization.py)
+    if isinstance(items, bytes):
+        response = current_app.response_class(items + b"\n", mimetype='application/json')
+    else:
+        response = jsonify(items)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
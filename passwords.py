@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Password hashing off the request thread.
+# Hashing is deliberately expensive, so it runs on a small bounded pool (hashlib's scrypt/pbkdf2
+# release the GIL, so the pool really uses the cores). Requests beyond HASH_QUEUE_LIMIT in flight are
+# refused immediately with HashingOverloaded instead of queueing behind a login storm.
+
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1') # any werkzeug method string
+HASH_WORKERS = int(os.environ.get('HASH_WORKERS', os.cpu_count() or 1))
+HASH_QUEUE_LIMIT = int(os.environ.get('HASH_QUEUE_LIMIT', HASH_WORKERS * 4))
+HASH_TIMEOUT = float(os.environ.get('HASH_TIMEOUT', 15.0)) # seconds
+
+class HashingOverloaded(Exception):
+    pass
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='hash')
+
+def _new_executor_after_fork():
+    # Pool threads do not survive fork(), but the executor would still count them as idle; a pre-fork worker
+    # (server.py) whose master hashed the default admin password would otherwise never run a hash
+    global _executor
+    _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='hash')
+
+os.register_at_fork(after_in_child=_new_executor_after_fork)
+
+_slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+_stats_lock = threading.Lock()
+_stats = {'hashes': 0, 'verifies': 0, 'rehashes': 0, 'rejected': 0, 'in_flight': 0}
+_timings = {'hash': [0, 0.0, 0.0], 'verify': [0, 0.0, 0.0]} # op -> [count, total seconds, max seconds]
+
+# Canonical method prefix of hashes made with the current settings (werkzeug fills in default parameters)
+_current_method = None
+
+def current_method():
+    global _current_method
+    if _current_method is None:
+        _current_method = generate_password_hash('', PASSWORD_HASH_METHOD).split('$', 1)[0]
+    return _current_method
+
+def _record(op, seconds):
+    with _stats_lock:
+        timing = _timings[op]
+        timing[0] += 1
+        timing[1] += seconds
+        timing[2] = max(timing[2], seconds)
+
+def _run(op, fn, *args):
+    if not _slots.acquire(blocking=False):
+        with _stats_lock:
+            _stats['rejected'] += 1
+        raise HashingOverloaded("Too many password operations in progress, please retry")
+    started = time.perf_counter()
+    with _stats_lock:
+        _stats['in_flight'] += 1
+
+    def finished(future):
+        # The slot is held until the job itself ends, not the request waiting for it: a timed-out job keeps
+        # its worker busy, so releasing early would let the queue grow past HASH_QUEUE_LIMIT
+        _slots.release()
+        with _stats_lock:
+            _stats['in_flight'] -= 1
+        _record(op, time.perf_counter() - started)
+
+    try:
+        future = _executor.submit(fn, *args)
+    except BaseException:
+        finished(None)
+        raise
+    future.add_done_callback(finished)
+    try:
+        return future.result(HASH_TIMEOUT)
+    except FutureTimeout:
+        raise HashingOverloaded("Password operation timed out, please retry")
+
+def hash_password(password):
+    with _stats_lock:
+        _stats['hashes'] += 1
+    return _run('hash', generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+def verify_password(password_hash, password):
+    with _stats_lock:
+        _stats['verifies'] += 1
+    return _run('verify', check_password_hash, password_hash, password)
+
+def rehash_if_needed(password_hash, password):
+    # A fresh hash when the stored one was made with a different method or cost than configured now, else None
+    if password_hash.split('$', 1)[0] == current_method():
+        return None
+    with _stats_lock:
+        _stats['rehashes'] += 1
+    return hash_password(password)
+
+def stats():
+    with _stats_lock:
+        result = dict(_stats)
+        for op, (count, total, maximum) in _timings.items():
+            result[f'{op}_count'] = count
+            result[f'{op}_avg_ms'] = total / count * 1000.0 if count else 0.0
+            result[f'{op}_max_ms'] = maximum * 1000.0
+    result['method'] = current_method()
+    result['workers'] = HASH_WORKERS
+    result['queue_limit'] = HASH_QUEUE_LIMIT
+    return result
@@ -0,0 +1,142 @@
+import datetime
+
+# Platform-wide counters and per-day buckets behind GET /api/admin/stats.
+# The write paths (signup, profile visibility, ban, swap create/update/delete, feedback) apply deltas in
+# the same transaction as their row change, so the dashboard reads a few dozen rows however large the
+# tables grow. rebuild_platform_stats() recomputes everything derivable from the base tables and is the
+# reconciliation job for drift (e.g. rows changed by hand).
+
+SWAP_STATUSES = ('pending', 'accepted', 'rejected')
+DAILY_METRICS = ('signups', 'swap_requests_created', 'swap_requests_accepted', 'swap_requests_rejected', 'feedback')
+# Status changes carry no timestamp in swap_requests, so these buckets cannot be recomputed and survive a rebuild
+UNDERIVABLE_DAILY_METRICS = ('swap_requests_accepted', 'swap_requests_rejected')
+DEFAULT_RANGE_DAYS = 30
+MAX_RANGE_DAYS = 366
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS platform_counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS daily_stats (
+        day TEXT NOT NULL, -- YYYY-MM-DD, UTC
+        metric TEXT NOT NULL,
+        value INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, metric)
+    ) WITHOUT ROWID;
+    ''',
+]
+
+# created_at holds CURRENT_TIMESTAMP text in new rows but unix epochs in older databases
+_DAY_OF_CREATED_AT = "CASE typeof(created_at) WHEN 'integer' THEN date(created_at, 'unixepoch') ELSE date(created_at) END"
+
+def create_platform_stats_schema(conn):
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+def record_stats(conn, counters=None, daily=None):
+    # Applies {name: delta} to the counters and {metric: delta} to today's buckets; must run in the
+    # caller's write transaction
+    counters = {name: delta for name, delta in (counters or {}).items() if delta}
+    daily = {metric: delta for metric, delta in (daily or {}).items() if delta}
+    if counters:
+        conn.executemany(
+            "INSERT INTO platform_counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+            counters.items()
+        )
+    if daily:
+        conn.executemany(
+            "INSERT INTO daily_stats (day, metric, value) VALUES (date('now'), ?, ?) "
+            "ON CONFLICT (day, metric) DO UPDATE SET value = value + excluded.value",
+            daily.items()
+        )
+
+def swap_status_counter(status):
+    return f"swap_requests_{status or 'pending'}"
+
+def swap_status_change(old_status, new_status):
+    # (counters, daily) deltas for a swap request moving from old_status to new_status
+    if old_status == new_status:
+        return {}, {}
+    counters = {swap_status_counter(old_status): -1, swap_status_counter(new_status): 1}
+    daily = {f"swap_requests_{new_status}": 1} if new_status in ('accepted', 'rejected') else {}
+    return counters, daily
+
+def _swap_requests_source(conn):
+    # Archived swap requests (retention.py) still count; the archive only exists from migration 6 on
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'swap_requests_archive'").fetchone():
+        return "(SELECT status, created_at FROM swap_requests UNION ALL SELECT status, created_at FROM swap_requests_archive)"
+    return "swap_requests"
+
+def rebuild_platform_stats(conn):
+    # Recomputes the counters and the derivable daily buckets from the base tables; returns the counters
+    swap_requests = _swap_requests_source(conn)
+    conn.execute("DELETE FROM platform_counters")
+    conn.execute(
+        '''
+        INSERT INTO platform_counters (name, value)
+        SELECT 'users', COUNT(*) FROM users WHERE is_admin = 0
+        UNION ALL SELECT 'public_users', COUNT(*) FROM users WHERE is_admin = 0 AND is_public = 1
+        UNION ALL SELECT 'banned_users', COUNT(*) FROM users WHERE is_admin = 0 AND is_banned = 1
+        UNION ALL SELECT 'feedback', COUNT(*) FROM feedback
+        '''
+    )
+    conn.execute(
+        f'''
+        INSERT INTO platform_counters (name, value)
+        SELECT 'swap_requests_' || COALESCE(status, 'pending'), COUNT(*) FROM {swap_requests} GROUP BY 1
+        '''
+    )
+    placeholders = ','.join('?' * len(UNDERIVABLE_DAILY_METRICS))
+    conn.execute(f"DELETE FROM daily_stats WHERE metric NOT IN ({placeholders})", UNDERIVABLE_DAILY_METRICS)
+    for metric, table, where in (
+        ('signups', 'users', 'is_admin = 0'),
+        ('swap_requests_created', swap_requests, '1'),
+        ('feedback', 'feedback', '1'),
+    ):
+        conn.execute(
+            f'''
+            INSERT INTO daily_stats (day, metric, value)
+            SELECT day, ?, COUNT(*) FROM (SELECT {_DAY_OF_CREATED_AT} AS day FROM {table} WHERE {where})
+            WHERE day IS NOT NULL GROUP BY day
+            ''',
+            (metric,)
+        )
+    return read_counters(conn)
+
+def read_counters(conn):
+    return {row['name']: row['value'] for row in conn.execute("SELECT name, value FROM platform_counters")}
+
+def parse_range(args, today=None):
+    # ?from=YYYY-MM-DD&to=YYYY-MM-DD, or ?days=N ending today; -> (first day, last day)
+    today = today or datetime.datetime.now(datetime.timezone.utc).date()
+    try:
+        last = datetime.date.fromisoformat(args['to']) if args.get('to') else today
+        if args.get('from'):
+            first = datetime.date.fromisoformat(args['from'])
+        else:
+            first = last - datetime.timedelta(days=int(args.get('days', DEFAULT_RANGE_DAYS)) - 1)
+    except ValueError:
+        raise ValueError("from/to must be YYYY-MM-DD and days an integer")
+    if first > last:
+        raise ValueError("from must not be after to")
+    if (last - first).days + 1 > MAX_RANGE_DAYS:
+        raise ValueError(f"At most {MAX_RANGE_DAYS} days per request")
+    return first, last
+
+def read_daily_series(conn, first, last):
+    # {metric: [{day, value}]} with every day of the range present (zero when nothing happened)
+    values = {}
+    for row in conn.execute(
+        "SELECT day, metric, value FROM daily_stats WHERE day BETWEEN ? AND ?", (first.isoformat(), last.isoformat())
+    ):
+        values[(row['metric'], row['day'])] = row['value']
+    days = [(first + datetime.timedelta(days=offset)).isoformat() for offset in range((last - first).days + 1)]
+    return {
+        metric: [{"day": day, "value": values.get((metric, day), 0)} for day in days]
+        for metric in DAILY_METRICS
+    }
@@ -0,0 +1,73 @@
+# Per-user rating aggregates, maintained incrementally by submit_feedback so that reading a
+# user's average never has to touch the feedback table.
+
+STARS = (1, 2, 3, 4, 5)
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS user_rating_stats (
+        user_id TEXT PRIMARY KEY,
+        rating_count INTEGER NOT NULL DEFAULT 0,
+        rating_sum INTEGER NOT NULL DEFAULT 0,
+        rating_1 INTEGER NOT NULL DEFAULT 0,
+        rating_2 INTEGER NOT NULL DEFAULT 0,
+        rating_3 INTEGER NOT NULL DEFAULT 0,
+        rating_4 INTEGER NOT NULL DEFAULT 0,
+        rating_5 INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    ) WITHOUT ROWID;
+'''
+
+# Columns to select (alias rs) when embedding the summary in a users query
+RATING_COLUMNS = ('rating_count', 'rating_sum') + tuple(f'rating_{star}' for star in STARS)
+RATING_JOIN = "LEFT JOIN user_rating_stats rs ON rs.user_id = u.id"
+
+def parse_rating(value):
+    # Ratings are whole stars, 1-5; returns None for anything else
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int):
+        return None
+    return value if value in STARS else None
+
+def record_rating(conn, user_id, rating):
+    # Must run in the same transaction as the feedback INSERT
+    conn.execute(
+        f'''
+        INSERT INTO user_rating_stats (user_id, rating_count, rating_sum, rating_{rating})
+        VALUES (?, 1, ?, 1)
+        ON CONFLICT (user_id) DO UPDATE SET
+            rating_count = rating_count + 1,
+            rating_sum = rating_sum + excluded.rating_sum,
+            rating_{rating} = rating_{rating} + 1
+        ''',
+        (user_id, rating)
+    )
+
+def rebuild_rating_stats(conn):
+    # Recomputes every aggregate from the feedback table; returns the number of users with ratings
+    conn.execute("DELETE FROM user_rating_stats")
+    conn.execute(
+        f'''
+        INSERT INTO user_rating_stats (user_id, rating_count, rating_sum, {', '.join(f'rating_{star}' for star in STARS)})
+        SELECT receiver_id, COUNT(*), SUM(rating), {', '.join(f'SUM(rating = {star})' for star in STARS)}
+        FROM feedback
+        WHERE rating BETWEEN 1 AND 5
+        GROUP BY receiver_id
+        '''
+    )
+    return conn.execute("SELECT COUNT(*) FROM user_rating_stats").fetchone()[0]
+
+_HISTOGRAM_KEYS = tuple(str(star) for star in STARS)
+
+def rating_summary(row):
+    # Builds {"count", "average", "histogram"} from a row carrying RATING_COLUMNS (NULL when unrated)
+    return summarize_ratings(*(row[column] for column in RATING_COLUMNS))
+
+def summarize_ratings(count, total, *histogram):
+    # The same from the RATING_COLUMNS values, in order
+    count = count or 0
+    return {
+        'count': count,
+        'average': round(total / count, 2) if count else None,
+        'histogram': {star: value or 0 for star, value in zip(_HISTOGRAM_KEYS, histogram)},
+    }
@@ -0,0 +1,210 @@
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger('skill_swap')
+
+# Retention for the tables that only ever grow.
+#   - Accepted and rejected swap requests older than SWAP_RETENTION_DAYS move to swap_requests_archive, which
+#     the list endpoints only read with ?includeArchived=1. Pending requests are never archived.
+#   - platform_messages is insert-only and only the newest row is read: all but PLATFORM_MESSAGES_KEEP are deleted.
+#   - Pages freed by both are returned to the filesystem with PRAGMA incremental_vacuum.
+# Every step works in slices of RETENTION_BATCH_ROWS rows (or VACUUM_STEP_PAGES pages), each its own short
+# write transaction followed by a RETENTION_PAUSE_MS pause, so request writes are never held up for long.
+# The job runs every RETENTION_INTERVAL seconds in a background thread (0 disables it; `flask run-retention`
+# runs it once, e.g. from cron).
+
+RETENTION_INTERVAL = int(os.environ.get('RETENTION_INTERVAL', 24 * 3600))
+SWAP_RETENTION_DAYS = int(os.environ.get('SWAP_RETENTION_DAYS', 180))
+PLATFORM_MESSAGES_KEEP = max(1, int(os.environ.get('PLATFORM_MESSAGES_KEEP', 1)))
+RETENTION_BATCH_ROWS = int(os.environ.get('RETENTION_BATCH_ROWS', 500))
+VACUUM_STEP_PAGES = int(os.environ.get('VACUUM_STEP_PAGES', 256))
+RETENTION_PAUSE_MS = float(os.environ.get('RETENTION_PAUSE_MS', 50.0))
+
+ARCHIVE_STATUSES = ('accepted', 'rejected')
+ARCHIVE_TABLE = 'swap_requests_archive'
+SWAP_REQUEST_COLUMNS = ('id', 'sender_id', 'sender_name', 'receiver_id', 'receiver_name', 'skill_offered', 'skill_wanted', 'status', 'created_at')
+
+SCHEMA = [
+    f'''
+    CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE} (
+        id TEXT PRIMARY KEY,
+        sender_id TEXT NOT NULL,
+        sender_name TEXT NOT NULL,
+        receiver_id TEXT NOT NULL,
+        receiver_name TEXT NOT NULL,
+        skill_offered TEXT NOT NULL,
+        skill_wanted TEXT NOT NULL,
+        status TEXT,
+        created_at TIMESTAMP,
+        archived_at INTEGER NOT NULL -- unix epoch
+    );
+    ''',
+    # Same shapes as the live table's hot path indexes, for ?includeArchived=1
+    f"CREATE INDEX IF NOT EXISTS idx_swap_requests_archive_sender_created ON {ARCHIVE_TABLE} (sender_id, created_at, id)",
+    f"CREATE INDEX IF NOT EXISTS idx_swap_requests_archive_receiver_created ON {ARCHIVE_TABLE} (receiver_id, created_at, id)",
+    f"CREATE INDEX IF NOT EXISTS idx_swap_requests_archive_created ON {ARCHIVE_TABLE} (created_at, id)",
+]
+
+# created_at holds CURRENT_TIMESTAMP text in new rows but unix epochs in older databases; NULL never ages out
+_EPOCH_OF_CREATED_AT = "CASE typeof(created_at) WHEN 'integer' THEN created_at ELSE CAST(strftime('%s', created_at) AS INTEGER) END"
+
+def create_archive_schema(conn):
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+def parse_include_archived(args):
+    return args.get('includeArchived', '').lower() in ('1', 'true')
+
+def swap_request_tables(include_archived):
+    # (table, archived flag) for every table a swap request listing reads
+    return [('swap_requests', 0)] + ([(ARCHIVE_TABLE, 1)] if include_archived else [])
+
+def _pause(pause_ms):
+    if pause_ms > 0:
+        time.sleep(pause_ms / 1000.0)
+
+def archive_swap_requests(conn, older_than_days=SWAP_RETENTION_DAYS, batch_rows=RETENTION_BATCH_ROWS, pause_ms=RETENTION_PAUSE_MS, now=None):
+    # Moves aged accepted/rejected requests to the archive; returns how many moved
+    cutoff = int(now or time.time()) - older_than_days * 86400
+    statuses = ','.join('?' * len(ARCHIVE_STATUSES))
+    aged = f"status IN ({statuses}) AND {_EPOCH_OF_CREATED_AT} < ?"
+    columns = ', '.join(SWAP_REQUEST_COLUMNS)
+    moved = 0
+    while True:
+        # Candidates are found before taking the write lock; the move re-checks them under it
+        ids = [row['id'] for row in conn.execute(f"SELECT id FROM swap_requests WHERE {aged} LIMIT ?", (*ARCHIVE_STATUSES, cutoff, batch_rows))]
+        if not ids:
+            break
+        placeholders = ','.join('?' * len(ids))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                f"INSERT INTO {ARCHIVE_TABLE} ({columns}, archived_at) "
+                f"SELECT {columns}, ? FROM swap_requests WHERE id IN ({placeholders}) AND {aged}",
+                (int(now or time.time()), *ids, *ARCHIVE_STATUSES, cutoff)
+            )
+            batch = cursor.rowcount
+            conn.execute(
+                f"DELETE FROM swap_requests WHERE id IN (SELECT id FROM {ARCHIVE_TABLE} WHERE id IN ({placeholders}))",
+                ids
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        moved += batch
+        if not batch:
+            break
+        _pause(pause_ms)
+    return moved
+
+def prune_platform_messages(conn, keep=PLATFORM_MESSAGES_KEEP, batch_rows=RETENTION_BATCH_ROWS, pause_ms=RETENTION_PAUSE_MS):
+    # Deletes every message but the newest `keep`; returns how many were deleted
+    oldest_kept = conn.execute("SELECT id FROM platform_messages ORDER BY id DESC LIMIT 1 OFFSET ?", (keep - 1,)).fetchone()
+    if oldest_kept is None:
+        return 0
+    deleted = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                "DELETE FROM platform_messages WHERE id IN (SELECT id FROM platform_messages WHERE id < ? LIMIT ?)",
+                (oldest_kept['id'], batch_rows)
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        deleted += cursor.rowcount
+        if cursor.rowcount < batch_rows:
+            return deleted
+        _pause(pause_ms)
+
+def incremental_vacuum(conn, step_pages=VACUUM_STEP_PAGES, pause_ms=RETENTION_PAUSE_MS):
+    # Returns free pages to the filesystem a slice at a time; a no-op unless auto_vacuum is INCREMENTAL
+    # (new databases are created that way, older ones need `flask enable-incremental-vacuum` once)
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    freed = 0
+    while True:
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free_pages:
+            return freed
+        # executescript steps the pragma to completion; execute() would stop after the first page
+        conn.executescript(f"PRAGMA incremental_vacuum({int(step_pages)})")
+        remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if remaining >= free_pages:
+            return freed
+        freed += free_pages - remaining
+        _pause(pause_ms)
+
+def run_retention(conn, now=None):
+    started = time.perf_counter()
+    summary = {
+        'archived_swap_requests': archive_swap_requests(conn, now=now),
+        'pruned_platform_messages': prune_platform_messages(conn),
+    }
+    summary['vacuumed_pages'] = incremental_vacuum(conn)
+    summary['seconds'] = time.perf_counter() - started
+    return summary
+
+class RetentionJob:
+    # Background thread running run_retention() on its own connection every `interval` seconds
+    def __init__(self, connect, interval=RETENTION_INTERVAL):
+        self._connect = connect
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {'runs': 0, 'failures': 0, 'archived_swap_requests': 0, 'pruned_platform_messages': 0, 'vacuumed_pages': 0}
+        self._last_run = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='retention', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        # A run in progress finishes its current slice first
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self):
+        conn = self._connect()
+        try:
+            summary = run_retention(conn)
+        except Exception:
+            with self._lock:
+                self._stats['failures'] += 1
+            raise
+        finally:
+            conn.close()
+        with self._lock:
+            self._stats['runs'] += 1
+            for name in ('archived_swap_requests', 'pruned_platform_messages', 'vacuumed_pages'):
+                self._stats[name] += summary[name]
+            self._last_run = dict(summary, finished_at=int(time.time()))
+        return summary
+
+    def _run(self):
+        # First run soon after startup, so restarts more often than the interval still get one
+        delay = min(self.interval, 300)
+        while not self._stop.wait(delay):
+            try:
+                summary = self.run_once()
+                log.info("Retention: %s", summary)
+            except Exception:
+                log.exception("Retention run failed")
+            delay = self.interval
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['last_run'] = self._last_run
+        stats['interval'] = self.interval
+        return stats
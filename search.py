@@ -0,0 +1,133 @@
+import re
+from batch import fetch_rows_by_id
+
+# Normalized skill index (user_skills) and FTS5 full-text index (users_fts) over the users table.
+# Both are kept in sync from the signup and profile update paths via sync_user_index(), and written for
+# bulk-loaded users by index_new_users(). A users_fts row shares its rowid with its users row, so it is
+# found by rowid instead of by scanning the table for its (unindexed) user_id.
+
+SKILL_KINDS = ('offered', 'wanted')
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS user_skills (
+        user_id TEXT NOT NULL,
+        skill TEXT NOT NULL COLLATE NOCASE,
+        kind TEXT NOT NULL, -- offered, wanted
+        PRIMARY KEY (user_id, kind, skill),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    ) WITHOUT ROWID;
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_user_skills_kind_skill ON user_skills (kind, skill, user_id);",
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5 (
+        user_id UNINDEXED,
+        name,
+        location,
+        skills_offered,
+        skills_wanted,
+        tokenize = 'unicode61 remove_diacritics 2'
+    );
+    ''',
+]
+
+# bm25 column weights: user_id, name, location, skills_offered, skills_wanted
+FTS_RANK = "bm25(users_fts, 0.0, 10.0, 2.0, 5.0, 4.0)"
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+def split_skills(skills):
+    # Accepts a comma-joined string or a list; trims, drops blanks and case-insensitive duplicates
+    if not skills:
+        return []
+    if isinstance(skills, str):
+        skills = skills.split(',')
+    seen = set()
+    result = []
+    for skill in skills:
+        skill = skill.strip()
+        if skill and skill.lower() not in seen:
+            seen.add(skill.lower())
+            result.append(skill)
+    return result
+
+def create_search_schema(conn):
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+USER_INDEX_COLUMNS = 'rowid AS rowid, id, name, location, skills_offered, skills_wanted'
+
+def index_users(conn, users):
+    # Writes both indexes for users that have no index rows yet.
+    # users: (users rowid, id, name, location, skills_offered, skills_wanted) rows
+    skill_rows = []
+    fts_rows = []
+    for rowid, user_id, name, location, skills_offered, skills_wanted in users:
+        offered = split_skills(skills_offered)
+        wanted = split_skills(skills_wanted)
+        skill_rows += [(user_id, skill, 'offered') for skill in offered] + [(user_id, skill, 'wanted') for skill in wanted]
+        fts_rows.append((rowid, user_id, name or '', location or '', ' , '.join(offered), ' , '.join(wanted)))
+    conn.executemany("INSERT OR IGNORE INTO user_skills (user_id, skill, kind) VALUES (?, ?, ?)", skill_rows)
+    conn.executemany(
+        "INSERT INTO users_fts (rowid, user_id, name, location, skills_offered, skills_wanted) VALUES (?, ?, ?, ?, ?, ?)",
+        fts_rows
+    )
+    return len(fts_rows)
+
+def index_new_users(conn, user_ids):
+    # Bulk loaders: indexes users just inserted into the users table, read back for their rowids
+    return index_users(conn, fetch_rows_by_id(conn, 'users', user_ids, columns=USER_INDEX_COLUMNS).values())
+
+def sync_user_index(conn, user_id, name, location, skills_offered, skills_wanted):
+    # Runs inside the caller's transaction, after the users row is written, so the indexes commit together with it
+    rowid = conn.execute("SELECT rowid FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+    conn.execute("DELETE FROM user_skills WHERE user_id = ?", (user_id,))
+    conn.execute("DELETE FROM users_fts WHERE rowid = ?", (rowid,))
+    index_users(conn, [(rowid, user_id, name, location, skills_offered, skills_wanted)])
+
+def rebuild_search_index(conn):
+    # Both indexes from scratch, e.g. after a VACUUM, which may renumber the users rowids
+    conn.execute("DELETE FROM user_skills")
+    conn.execute("DELETE FROM users_fts")
+    return index_users(conn, conn.execute(f"SELECT {USER_INDEX_COLUMNS} FROM users"))
+
+def backfill_search_index(conn):
+    # One-time population from the comma-joined columns; a no-op once users_fts has rows
+    if conn.execute("SELECT 1 FROM users_fts LIMIT 1").fetchone():
+        return 0
+    return rebuild_search_index(conn)
+
+def fts_match_expression(search_term):
+    # Every word must match as a prefix: "photo edit" -> "photo"* "edit"*
+    tokens = _TOKEN_RE.findall(search_term)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+def build_user_search(columns, search_term='', offers=(), wants=(), joins=()):
+    # Returns (sql, params, sort_key, descending) selecting `columns` (qualified with alias u) for
+    # public, unbanned users. Text searches sort by relevance (search_rank), everything else newest first.
+    joins = list(joins)
+    where = ["u.is_public = 1", "u.is_banned = 0"]
+    params = []
+    sort_key, descending = 'created_at', True
+
+    match = fts_match_expression(search_term) if search_term else ''
+    if match:
+        columns += f", {FTS_RANK} AS search_rank"
+        joins.append("JOIN users_fts ON users_fts.rowid = u.rowid")
+        where.append("users_fts MATCH ?")
+        params.append(match)
+        sort_key, descending = 'search_rank', False
+    elif search_term:
+        # Search term without any word characters cannot match anything
+        where.append("0")
+
+    for kind, skills in (('offered', offers), ('wanted', wants)):
+        for skill in skills:
+            skill = skill.strip()
+            if not skill:
+                continue
+            where.append("u.id IN (SELECT user_id FROM user_skills WHERE kind = ? AND skill = ?)")
+            params.extend([kind, skill])
+
+    sql = f"SELECT {columns} FROM users u {' '.join(joins)} WHERE {' AND '.join(where)}"
+    return sql, params, sort_key, descending
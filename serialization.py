@@ -0,0 +1,225 @@
+import functools
+import json
+import logging
+import os
+import threading
+from operator import itemgetter
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+from images import thumbnail_url
+from ratings import RATING_COLUMNS, summarize_ratings
+
+log = logging.getLogger('skill_swap')
+
+# Row decoding and JSON encoding for the endpoints that return users.
+#   - Rows are read as plain tuples into UserRecord (__slots__, column positions shared by every row of a
+#     query) instead of sqlite3.Row -> dict; the comma-joined skill columns are split once per distinct string.
+#   - A UserView is one endpoint's output shape (fields, in order, and whether avatars get a thumbnail URL),
+#     worked out once per field list instead of per row.
+#   - user_fragments caches each user's encoded JSON object per view. An entry is reused only while the row's
+#     values are unchanged, so it can never go stale; write paths still drop their user's entries to free memory.
+#     Lists are the cached fragments joined into the body, with no per-row dict or encoder call.
+#   - JSON is encoded with orjson when it is installed (JSON_ENCODER=json forces the standard library), for
+#     jsonify() everywhere through FastJSONProvider as well.
+
+JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto').lower() # auto | orjson | json
+USER_FRAGMENT_CACHE_SIZE = int(os.environ.get('USER_FRAGMENT_CACHE_SIZE', 50000)) # users
+SKILL_LIST_CACHE_SIZE = 16384 # distinct skill strings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if JSON_ENCODER == 'orjson' and orjson is None:
+    log.warning("JSON_ENCODER=orjson but orjson is not installed; using the json module")
+USE_ORJSON = orjson is not None and JSON_ENCODER != 'json'
+
+def dumps(obj, default=None, sort_keys=False):
+    # -> compact UTF-8 JSON bytes
+    if USE_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=default, option=option)
+    return json.dumps(obj, default=default, sort_keys=sort_keys, ensure_ascii=False, separators=(',', ':')).encode()
+
+class FastJSONProvider(DefaultJSONProvider):
+    # Flask's JSON provider, encoding with dumps() above; debug mode keeps the indented output
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, self.default, self.sort_keys).decode()
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, self.default, self.sort_keys) + b"\n", mimetype=self.mimetype)
+
+class RawJSON(bytes):
+    # An encoded JSON value, embedded as is by encode_object()
+    pass
+
+NULL = RawJSON(b'null')
+
+def encode_object(items):
+    # {key: value or RawJSON} -> JSON object bytes, without decoding and re-encoding the RawJSON parts
+    return b'{' + b','.join(
+        dumps(key) + b':' + (value if isinstance(value, RawJSON) else dumps(value)) for key, value in items.items()
+    ) + b'}'
+
+def encode_array(fragments):
+    return b'[' + b','.join(fragments) + b']'
+
+def json_response(body, status=200):
+    return current_app.response_class(body + b"\n", status=status, mimetype='application/json')
+
+@functools.lru_cache(maxsize=SKILL_LIST_CACHE_SIZE)
+def skill_list(skills):
+    # 'Python,Excel' -> ('Python', 'Excel'); many users share the same skill string
+    return tuple(skills.split(',')) if skills else ()
+
+class UserRecord:
+    # One users row: the raw tuple plus the query's column positions
+    __slots__ = ('values', 'positions')
+
+    def __init__(self, values, positions):
+        self.values = values
+        self.positions = positions
+
+    def __getitem__(self, column):
+        return self.values[self.positions[column]]
+
+    def keys(self):
+        return self.positions.keys()
+
+    def get(self, column, default=None):
+        index = self.positions.get(column)
+        return default if index is None else self.values[index]
+
+def fetch_user_records(cursor):
+    # All rows of an executed cursor as UserRecords, bypassing the connection's sqlite3.Row factory
+    cursor.row_factory = None
+    positions = {column[0]: index for index, column in enumerate(cursor.description)}
+    return [UserRecord(values, positions) for values in cursor.fetchall()]
+
+def fetch_user_record(cursor):
+    cursor.row_factory = None
+    values = cursor.fetchone()
+    if values is None:
+        return None
+    return UserRecord(values, {column[0]: index for index, column in enumerate(cursor.description)})
+
+SKILL_COLUMNS = ('skills_offered', 'skills_wanted')
+
+class UserView:
+    def __init__(self, fields, thumbnail=False):
+        self.fields = tuple(fields)
+        self.thumbnail = thumbnail and 'profile_photo' in self.fields
+        self.key = (self.fields, self.thumbnail)
+        # The row columns the output depends on; 'rating' is not a column but the embedded rating summary
+        self.columns = tuple(field for field in self.fields if field != 'rating')
+        if 'rating' in self.fields:
+            self.columns += RATING_COLUMNS
+
+    def source(self, positions):
+        # -> function(values tuple) returning the values this view depends on
+        return itemgetter(*(positions[column] for column in self.columns))
+
+    def builder(self, positions):
+        # -> function(values tuple) returning the output dict, with the column positions resolved once per query
+        steps = []
+        for field in self.fields:
+            if field == 'rating':
+                rating_values = itemgetter(*(positions[column] for column in RATING_COLUMNS))
+                steps.append((field, None, lambda values: summarize_ratings(*rating_values(values))))
+            elif field in SKILL_COLUMNS:
+                steps.append((field, positions[field], skill_list))
+            else:
+                steps.append((field, positions[field], None))
+        photo = positions['profile_photo'] if self.thumbnail else None
+
+        def build(values):
+            user = {}
+            for field, index, convert in steps:
+                if index is None:
+                    user[field] = convert(values)
+                elif convert is None:
+                    user[field] = values[index]
+                else:
+                    user[field] = convert(values[index])
+            if photo is not None:
+                # Lists render small avatars; point them at the thumbnail instead of the full-size photo
+                user['profile_thumbnail'] = thumbnail_url(values[photo])
+            return user
+        return build
+
+    def as_dict(self, record):
+        return self.builder(record.positions)(record.values)
+
+@functools.lru_cache(maxsize=256)
+def user_view(fields, thumbnail=False):
+    return UserView(fields, thumbnail)
+
+class FragmentCache:
+    def __init__(self, max_users=USER_FRAGMENT_CACHE_SIZE):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._users = {} # user id -> {view key: (source values, encoded JSON)}, oldest first
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def encode(self, records, view):
+        # -> [encoded JSON object per record]
+        if not records:
+            return []
+        source = view.source(records[0].positions)
+        id_index = records[0].positions['id']
+        fragments = []
+        misses = []
+        with self._lock:
+            for record in records:
+                entry = self._users.get(record.values[id_index], {}).get(view.key)
+                if entry is not None and entry[0] == source(record.values):
+                    fragments.append(entry[1])
+                else:
+                    fragments.append(None)
+                    misses.append(len(fragments) - 1)
+            self._stats['hits'] += len(records) - len(misses)
+            self._stats['misses'] += len(misses)
+        if not misses:
+            return fragments
+        build = view.builder(records[0].positions)
+        encoded = []
+        for index in misses:
+            record = records[index]
+            fragments[index] = dumps(build(record.values))
+            encoded.append((record.values[id_index], source(record.values), fragments[index]))
+        with self._lock:
+            for user_id, values, fragment in encoded:
+                self._users.setdefault(user_id, {})[view.key] = (values, fragment)
+            while len(self._users) > self.max_users:
+                del self._users[next(iter(self._users))]
+                self._stats['evictions'] += 1
+        return fragments
+
+    def encode_one(self, record, view):
+        return RawJSON(self.encode([record], view)[0]) if record is not None else NULL
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, users=len(self._users))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        stats['max_users'] = self.max_users
+        stats['encoder'] = 'orjson' if USE_ORJSON else 'json'
+        return stats
+
+user_fragments = FragmentCache()
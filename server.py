@@ -0,0 +1,288 @@
+import argparse
+import collections
+import json
+import logging
+import os
+import selectors
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+import cluster
+import events
+
+log = logging.getLogger('skill_swap')
+
+# Production entry point: a pre-fork server, `python server.py` (SIGTERM/SIGINT stop it, SIGHUP replaces the workers).
+# The master imports the app, creates or upgrades the schema once (app.setup()), binds the listening socket and
+# forks SERVER_WORKERS workers. Each worker loads its own indexes, static assets and pooled connections
+# (app.init_worker()) before it accepts a connection, then serves requests on SERVER_THREADS threads.
+#   - The master relays cache invalidations, index updates and SSE events between the workers (see cluster.py)
+#     and replaces any worker that dies.
+#   - SIGHUP starts a new generation of workers and stops the old one once every new worker is ready, so the
+#     listening socket never goes unserved. Code changes need a master restart: workers fork from its imports.
+#   - On SIGTERM a worker stops accepting, reports not ready on /readyz, ends its SSE streams, finishes its
+#     in-flight requests, flushes the write-behind queue and exits. Workers still running after GRACEFUL_TIMEOUT
+#     are killed.
+#   - A worker only accepts a connection while one of its SERVER_THREADS request threads is free; otherwise the
+#     connection stays in the listen backlog for another worker instead of queueing behind this one.
+# Only worker 0 runs the retention job. Each open SSE stream and keep-alive connection holds one thread; SSE
+# streams run on EVENT_MAX_STREAMS threads of their own, so they never take request capacity (see events.py).
+
+SERVER_BIND = os.environ.get('SERVER_BIND', '0.0.0.0:5000')
+SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', os.cpu_count() or 1))
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 16))
+SERVER_BACKLOG = int(os.environ.get('SERVER_BACKLOG', 1024))
+KEEPALIVE_TIMEOUT = float(os.environ.get('KEEPALIVE_TIMEOUT', 5.0)) # seconds an idle connection is kept open
+GRACEFUL_TIMEOUT = float(os.environ.get('GRACEFUL_TIMEOUT', 30.0)) # seconds a stopping worker gets to drain
+
+WORKER_READY = 'worker_ready' # worker -> master only, never relayed
+RESPAWN_DELAY = 1.0 # seconds; keeps a worker that fails at startup from fork-looping
+ACCEPT_WAIT = 0.1 # seconds a busy worker waits for a free thread before polling the socket again
+
+class RequestHandler(WSGIRequestHandler):
+    # Socket timeout: closes idle keep-alive connections and clients that stall mid-request
+    timeout = KEEPALIVE_TIMEOUT
+
+class WorkerServer(BaseWSGIServer):
+    # werkzeug's WSGI server on the master's listening socket, with connections handled on a fixed thread pool
+    multithread = True # also makes werkzeug speak HTTP/1.1 with keep-alive
+    multiprocess = True
+
+    def __init__(self, host, port, wsgi_app, fd, threads=SERVER_THREADS, streams=events.MAX_STREAMS):
+        super().__init__(host, port, wsgi_app, handler=RequestHandler, fd=fd)
+        # Every worker wakes for a new connection; the ones that lose the accept() race go back to waiting
+        self.socket.setblocking(False)
+        self.threads = threads
+        # Open SSE streams (at most `streams`, events.py refuses more) run on threads beyond the request threads
+        self._executor = ThreadPoolExecutor(max_workers=threads + streams, thread_name_prefix='request')
+        self._active = 0
+        self._idle = threading.Condition()
+
+    def _has_free_thread(self):
+        return self._active - events.broker.open_streams < self.threads
+
+    def _handle_request_noblock(self):
+        # Accept only when a request thread is free to serve the connection right away; a busy worker leaves it
+        # in the listen backlog, where an idle worker picks it up. The wait is short so shutdown is not delayed.
+        with self._idle:
+            if not self._idle.wait_for(self._has_free_thread, ACCEPT_WAIT):
+                return
+        super()._handle_request_noblock()
+
+    def process_request(self, request, client_address):
+        with self._idle:
+            self._active += 1
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._idle:
+                self._active -= 1
+                self._idle.notify_all()
+
+    def drain(self, timeout):
+        # Waits for the connections already accepted to finish; False if some were still open at the timeout
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._active, timeout)
+
+def parse_bind(bind):
+    host, _, port = bind.rpartition(':')
+    return host.strip('[]') or '0.0.0.0', int(port)
+
+def listen(bind, backlog=SERVER_BACKLOG):
+    host, port = parse_bind(bind)
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    return socket.create_server((host, port), family=family, backlog=backlog)
+
+def serve_worker(application, listener, channel, index, threads):
+    # Runs in a freshly forked worker and never returns
+    server = None
+
+    def terminate(signum, frame):
+        if server is None:
+            os._exit(0) # still starting up: nothing to drain
+        application.begin_shutdown()
+        # shutdown() waits for serve_forever() to return, which runs on this (the main) thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, terminate)
+    # The master handles these for the whole process group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    cluster.attach(channel)
+    application.init_worker(background_jobs=index == 0, connections=threads)
+    host, port = listener.getsockname()[:2]
+    server = WorkerServer(host, port, application.app, listener.fileno(), threads)
+    cluster.announce(WORKER_READY, index)
+    log.info("Worker %s (pid %s) serving with %s threads", index, os.getpid(), threads)
+    server.serve_forever()
+    # Finish before the master's SIGKILL, leaving time to flush the write-behind queue
+    if not server.drain(GRACEFUL_TIMEOUT * 0.8):
+        log.warning("Worker %s stopping with connections still open", index)
+    application.shutdown_app()
+    os._exit(0)
+
+Worker = collections.namedtuple('Worker', 'pid index generation channel started')
+
+class Master:
+    def __init__(self, application, listener, workers=SERVER_WORKERS, threads=SERVER_THREADS):
+        self.application = application
+        self.listener = listener
+        self.size = workers
+        self.threads = threads
+        self.generation = 0
+        self.workers = {} # pid -> Worker
+        self.ready = set() # pids that have finished init_worker()
+        self.retiring = {} # pid -> deadline for its SIGKILL (old generation, or everything when stopping)
+        self.stopping = False
+        self._respawn_at = {} # index -> earliest respawn time after a crash
+        self._signals = []
+        self._selector = selectors.DefaultSelector()
+
+    def spawn(self, index):
+        master_end, worker_end = cluster.channel_pair()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                master_end.close()
+                for worker in self.workers.values():
+                    worker.channel.close()
+                self._selector.close()
+                serve_worker(self.application, self.listener, worker_end, index, self.threads)
+            except BaseException:
+                log.exception("Worker %s failed", index)
+            finally:
+                os._exit(1)
+        worker_end.close()
+        master_end.setblocking(False)
+        self._selector.register(master_end, selectors.EVENT_READ, pid)
+        self.workers[pid] = Worker(pid, index, self.generation, master_end, time.monotonic())
+        return pid
+
+    def relay(self, sender_pid, channel):
+        try:
+            message = channel.recv(cluster.MAX_MESSAGE_BYTES)
+        except OSError:
+            return
+        if not message:
+            return
+        if json.loads(message)[0] == WORKER_READY:
+            self.ready.add(sender_pid)
+            return
+        for pid, worker in self.workers.items():
+            if pid == sender_pid or pid in self.retiring:
+                continue
+            try:
+                worker.channel.send(message)
+            except OSError as e:
+                # A worker too busy to drain its channel misses this change until its caches expire
+                log.warning("Could not relay a message to worker %s: %s", worker.index, e)
+
+    def terminate(self, pids, deadline):
+        for pid in pids:
+            if pid not in self.retiring:
+                self.retiring[pid] = deadline
+                self._kill(pid, signal.SIGTERM)
+
+    def _kill(self, pid, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            self._selector.unregister(worker.channel)
+            worker.channel.close()
+            self.ready.discard(pid)
+            if self.retiring.pop(pid, None) is None:
+                log.warning("Worker %s (pid %s) exited unexpectedly with status %s", worker.index, pid, status)
+                if time.monotonic() - worker.started < RESPAWN_DELAY:
+                    self._respawn_at[worker.index] = time.monotonic() + RESPAWN_DELAY
+
+    def reload(self):
+        # New generation first; the old one is stopped once all of the new workers are ready
+        log.info("Reloading: starting %s new workers", self.size)
+        self.generation += 1
+        for index in range(self.size):
+            self.spawn(index)
+
+    def stop(self):
+        log.info("Stopping %s workers", len(self.workers))
+        self.stopping = True
+        self.terminate(list(self.workers), time.monotonic() + GRACEFUL_TIMEOUT)
+
+    def _handle_signal(self, signum, frame):
+        self._signals.append(signum)
+
+    def _tick(self):
+        while self._signals:
+            signum = self._signals.pop(0)
+            if signum == signal.SIGHUP and not self.stopping:
+                self.reload()
+            elif signum in (signal.SIGTERM, signal.SIGINT) and not self.stopping:
+                self.stop()
+        self.reap()
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now > deadline:
+                log.warning("Worker pid %s did not stop within %ss, killing it", pid, GRACEFUL_TIMEOUT)
+                self._kill(pid, signal.SIGKILL)
+                self.retiring[pid] = float('inf')
+        if self.stopping:
+            return
+        current = {worker.index: pid for pid, worker in self.workers.items() if worker.generation == self.generation}
+        old = [pid for pid, worker in self.workers.items() if worker.generation != self.generation]
+        if old and len(current) == self.size and self.ready.issuperset(current.values()):
+            self.terminate(old, now + GRACEFUL_TIMEOUT)
+        for index in range(self.size):
+            if index not in current and now >= self._respawn_at.get(index, 0):
+                self.spawn(index)
+
+    def run(self):
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, self._handle_signal)
+        log.info("Master (pid %s) listening on %s:%s", os.getpid(), *self.listener.getsockname()[:2])
+        for index in range(self.size):
+            self.spawn(index)
+        while not (self.stopping and not self.workers):
+            for key, _ in self._selector.select(0.5):
+                self.relay(key.data, key.fileobj)
+            self._tick()
+        self.listener.close()
+        log.info("Master stopped")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python server.py', description='Skill Swap pre-fork server')
+    parser.add_argument('--bind', default=SERVER_BIND, help='host:port to listen on')
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS)
+    parser.add_argument('--threads', type=int, default=SERVER_THREADS, help='request threads per worker')
+    args = parser.parse_args(argv)
+
+    # Preload: the app is imported and the schema set up once, before forking
+    import app as application
+    application.setup()
+    listener = listen(args.bind)
+    Master(application, listener, max(1, args.workers), max(1, args.threads)).run()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+import bisect
+import heapq
+import re
+import threading
+from search import split_skills
+
+# In-memory skill vocabulary behind GET /api/skills/suggest and write-time canonicalization.
+# Skills are keyed by a normalized form (case-folded, whitespace collapsed, known aliases folded), each key
+# counts the users offering / wanting it, and the keys live in one sorted list so a prefix lookup is a
+# bisect plus a short scan. The display name of a key is the spelling most users chose, never an alias
+# ('py' is shown as 'Python' until someone spells it 'python').
+# Built from the users table at startup and updated from signup / profile updates; never touches SQLite.
+
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 50
+
+# Spellings that mean the same skill; keys and values are normalized keys
+ALIASES = {
+    'adobe photoshop': 'photoshop',
+    'adobe illustrator': 'illustrator',
+    'adobe premiere': 'premiere pro',
+    'adobe premiere pro': 'premiere pro',
+    'js': 'javascript',
+    'ts': 'typescript',
+    'py': 'python',
+    'python3': 'python',
+    'golang': 'go',
+    'reactjs': 'react',
+    'react.js': 'react',
+    'nodejs': 'node.js',
+    'node': 'node.js',
+    'ms excel': 'excel',
+    'microsoft excel': 'excel',
+    'ml': 'machine learning',
+    'ui/ux': 'ux design',
+    'web designing': 'web design',
+    'guitar playing': 'guitar',
+}
+
+# Display names of the alias targets, used until a user spells the skill itself
+DISPLAY_NAMES = {
+    'photoshop': 'Photoshop',
+    'illustrator': 'Illustrator',
+    'premiere pro': 'Premiere Pro',
+    'javascript': 'JavaScript',
+    'typescript': 'TypeScript',
+    'python': 'Python',
+    'go': 'Go',
+    'react': 'React',
+    'node.js': 'Node.js',
+    'excel': 'Excel',
+    'machine learning': 'Machine Learning',
+    'ux design': 'UX Design',
+    'web design': 'Web Design',
+    'guitar': 'Guitar',
+}
+
+_SPACE_RE = re.compile(r'\s+')
+
+def clean(skill):
+    # Display form of a raw input: trimmed, inner whitespace collapsed
+    return _SPACE_RE.sub(' ', skill).strip()
+
+def skill_key(skill):
+    key = clean(skill).casefold()
+    return ALIASES.get(key, key)
+
+def display_name(key):
+    return DISPLAY_NAMES.get(key, key.title())
+
+def is_alias(spelling):
+    return spelling.casefold() in ALIASES
+
+class SkillIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._keys = [] # sorted normalized keys
+        self._offered = {} # key -> number of users offering it
+        self._wanted = {}
+        self._spellings = {} # key -> {display spelling: number of users using it}
+        self._users = {} # user_id -> ({key: spelling} offered, {key: spelling} wanted)
+        self.loaded = False
+
+    def load(self, conn):
+        users = conn.execute("SELECT id, skills_offered, skills_wanted FROM users").fetchall()
+        with self._lock:
+            self._reset()
+            for user in users:
+                self._update(user['id'], user['skills_offered'], user['skills_wanted'])
+            self.loaded = True
+        return len(users)
+
+    def _display(self, key):
+        spellings = self._spellings[key]
+        candidates = [spelling for spelling in spellings if not is_alias(spelling)]
+        if not candidates:
+            return display_name(key)
+        return max(candidates, key=lambda spelling: (spellings[spelling], spelling))
+
+    def _skill_map(self, skills):
+        skill_map = {}
+        for skill in split_skills(skills):
+            skill_map.setdefault(skill_key(skill), clean(skill))
+        return skill_map
+
+    def _update(self, user_id, skills_offered, skills_wanted):
+        old_offered, old_wanted = self._users.get(user_id, ({}, {}))
+        new_offered = self._skill_map(skills_offered)
+        new_wanted = self._skill_map(skills_wanted)
+        for counts, old, new in ((self._offered, old_offered, new_offered), (self._wanted, old_wanted, new_wanted)):
+            for key, spelling in old.items():
+                if new.get(key) != spelling:
+                    self._remove(counts, key, spelling)
+            for key, spelling in new.items():
+                if old.get(key) != spelling:
+                    self._add(counts, key, spelling)
+        if new_offered or new_wanted:
+            self._users[user_id] = (new_offered, new_wanted)
+        else:
+            self._users.pop(user_id, None)
+
+    def _add(self, counts, key, spelling):
+        if key not in self._spellings:
+            bisect.insort(self._keys, key)
+            self._spellings[key] = {}
+        counts[key] = counts.get(key, 0) + 1
+        spellings = self._spellings[key]
+        spellings[spelling] = spellings.get(spelling, 0) + 1
+
+    def _remove(self, counts, key, spelling):
+        counts[key] -= 1
+        if not counts[key]:
+            del counts[key]
+        spellings = self._spellings[key]
+        spellings[spelling] -= 1
+        if not spellings[spelling]:
+            del spellings[spelling]
+        if not spellings:
+            del self._spellings[key]
+            del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def update_user(self, user_id, skills_offered, skills_wanted):
+        with self._lock:
+            self._update(user_id, skills_offered, skills_wanted)
+
+    def canonicalize(self, skills):
+        # Raw skills (list or comma-joined) -> display names, mapping known skills onto their established spelling
+        result = []
+        seen = set()
+        with self._lock:
+            for skill in split_skills(skills):
+                key = skill_key(skill)
+                if key in seen:
+                    continue
+                seen.add(key)
+                if key in self._spellings:
+                    result.append(self._display(key))
+                else:
+                    result.append(display_name(key) if is_alias(clean(skill)) else clean(skill))
+        return result
+
+    def suggest(self, prefix, limit=DEFAULT_SUGGESTIONS, kind=None):
+        # -> [(display name, offered count, wanted count)] for keys starting with prefix, most popular first
+        prefix = clean(prefix).casefold()
+        with self._lock:
+            start = bisect.bisect_left(self._keys, prefix)
+            end = bisect.bisect_left(self._keys, prefix + '\U0010ffff', start)
+            if kind == 'offered':
+                popularity = lambda key: self._offered.get(key, 0)
+            elif kind == 'wanted':
+                popularity = lambda key: self._wanted.get(key, 0)
+            else:
+                popularity = lambda key: self._offered.get(key, 0) + self._wanted.get(key, 0)
+            best = heapq.nsmallest(limit, self._keys[start:end], key=lambda key: (-popularity(key), key))
+            return [(self._display(key), self._offered.get(key, 0), self._wanted.get(key, 0)) for key in best]
+
+    def top(self, kind, limit=DEFAULT_SUGGESTIONS):
+        # -> [(display name, users)] most offered (kind='offered') or most wanted skills
+        with self._lock:
+            counts = self._offered if kind == 'offered' else self._wanted
+            best = heapq.nsmallest(limit, counts.items(), key=lambda item: (-item[1], item[0]))
+            return [(self._display(key), count) for key, count in best]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'skills': len(self._keys),
+                'users': len(self._users),
+                'offered_skills': len(self._offered),
+                'wanted_skills': len(self._wanted),
+            }
+
+skill_index = SkillIndex()
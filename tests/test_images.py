@@ -0,0 +1,35 @@
+import io
+import threading
+import pytest
+import images
+
+Image = pytest.importorskip('PIL.Image')
+
+def _jpeg():
+    buffer = io.BytesIO()
+    Image.new('RGB', (256, 256), (200, 80, 40)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+def test_valid_photo_is_stored(tmp_path):
+    filename = images.store_profile_photo(str(tmp_path), _jpeg(), 'me.jpg')
+    images.wait_for_photo(filename)
+    assert (tmp_path / filename).exists()
+
+def test_truncated_photo_is_rejected(tmp_path):
+    data = _jpeg()
+    with pytest.raises(images.ImageRejected):
+        images.store_profile_photo(str(tmp_path), data[:len(data) // 2], 'me.jpg')
+    assert not list(tmp_path.iterdir())
+
+def test_photo_is_decoded_on_the_pool(tmp_path, monkeypatch):
+    from PIL import ImageFile
+    threads = []
+    load = ImageFile.ImageFile.load
+
+    def recording_load(self):
+        threads.append(threading.current_thread().name)
+        return load(self)
+    monkeypatch.setattr(ImageFile.ImageFile, 'load', recording_load)
+    filename = images.store_profile_photo(str(tmp_path), _jpeg(), 'me.jpg')
+    images.wait_for_photo(filename)
+    assert threads and all(name.startswith('image') for name in threads)
@@ -0,0 +1,48 @@
+import random
+from matching import MatchIndex
+
+SKILLS = ['Python', 'Excel', 'Guitar', 'Go', 'Photoshop', 'Spanish', 'Cooking', 'SQL']
+
+def _brute_force(users, user_id, exclude, limit):
+    # users: {id: (offered, wanted, public, banned)}, in slot order
+    offered, wanted = ({skill.lower() for skill in skills} for skills in users[user_id][:2])
+    candidates = []
+    for slot, (other_id, (their_offered, their_wanted, public, banned)) in enumerate(users.items()):
+        if other_id == user_id or other_id in exclude or not public or banned:
+            continue
+        they_offer = wanted & {skill.lower() for skill in their_offered}
+        they_want = offered & {skill.lower() for skill in their_wanted}
+        if they_offer and they_want:
+            candidates.append((-(len(they_offer) + len(they_want)), -min(len(they_offer), len(they_want)), slot, other_id))
+    return [(other_id, -score) for score, _, _, other_id in sorted(candidates)[:limit]]
+
+def test_matches_agree_with_brute_force():
+    rng = random.Random(7)
+    index = MatchIndex()
+    users = {}
+    for i in range(300):
+        user = (rng.sample(SKILLS, rng.randint(0, 6)), rng.sample(SKILLS, rng.randint(0, 6)), rng.random() < 0.9, rng.random() < 0.05)
+        users[f'u{i}'] = user
+        index.update_user(f'u{i}', ','.join(user[0]), ','.join(user[1]), is_public=user[2], is_banned=user[3])
+    for user_id in rng.sample(list(users), 150):
+        exclude = set(rng.sample(list(users), 20))
+        limit = rng.choice([1, 5, 20, 100])
+        expected = _brute_force(users, user_id, exclude, limit)
+        assert [(other_id, score) for other_id, score, _, _ in index.match(user_id, exclude, limit)] == expected
+
+def test_match_lists_the_overlapping_skills():
+    index = MatchIndex()
+    index.update_user('a', 'Python, Excel', 'Guitar, Go', is_public=True)
+    index.update_user('b', 'Go, Guitar, SQL', 'python', is_public=True)
+    index.update_user('c', 'Go', 'Excel', is_public=True)
+    assert index.match('a') == [('b', 3, ['Go', 'Guitar'], ['Python']), ('c', 2, ['Go'], ['Excel'])]
+    assert index.match('a', exclude=['b']) == [('c', 2, ['Go'], ['Excel'])]
+
+def test_score_counts_beyond_the_best_overlap_are_empty():
+    index = MatchIndex()
+    index.update_user('a', 'Python, Excel, Guitar, Go, SQL', 'Spanish', is_public=True)
+    index.update_user('b', 'Spanish', 'SQL', is_public=True)
+    # Three of a's skills are wanted, but never more than one by the same user
+    index.update_user('c', 'Cooking', 'Python', is_public=True)
+    index.update_user('d', 'Cooking', 'Excel', is_public=True)
+    assert index.match('a') == [('b', 2, ['Spanish'], ['SQL'])]
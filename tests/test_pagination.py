@@ -0,0 +1,24 @@
+import base64
+import json
+import pytest
+from pagination import PaginationError, decode_cursor, encode_cursor
+
+def _token(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor('2024-01-01 10:00:00', 42)) == ('2024-01-01 10:00:00', 42)
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+
+@pytest.mark.parametrize('token', [
+    'not base64 at all!',
+    _token([[1], {'a': 1}]),
+    _token(['2024-01-01', [1]]),
+    _token({'a': 1, 'b': 2}),
+    _token([1, 2, 3]),
+    _token([True, 1]),
+    _token('ab'),
+])
+def test_invalid_cursor_is_rejected(token):
+    with pytest.raises(PaginationError):
+        decode_cursor(token)
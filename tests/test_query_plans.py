@@ -0,0 +1,26 @@
+import sqlite3
+import pytest
+from migrations import migrate, find_full_scans
+
+app = pytest.importorskip('app')
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'plans.db')
+    conn.row_factory = sqlite3.Row
+    migrate(conn)
+    yield conn
+    conn.close()
+
+@pytest.mark.parametrize('name, sql, params', [pytest.param(*query, id=query[0]) for query in app.hot_path_queries()])
+def test_hot_path_query_uses_an_index(conn, name, sql, params):
+    assert find_full_scans(conn, sql, params, app.EXPECTED_SCANS.get(name, ())) == []
+
+@pytest.mark.parametrize('sql', [
+    "SELECT * FROM users",
+    "SELECT * FROM swap_requests ORDER BY created_at, id",
+    "SELECT id FROM users ORDER BY id",
+    "SELECT * FROM users_fts",
+])
+def test_full_scans_are_found(conn, sql):
+    assert find_full_scans(conn, sql)
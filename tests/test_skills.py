@@ -0,0 +1,19 @@
+from skills import SkillIndex
+
+def test_alias_spelling_never_becomes_display_name():
+    index = SkillIndex()
+    # The alias arrives first
+    index.update_user(1, index.canonicalize('py, JS'), '')
+    assert index.canonicalize(['Python', 'JavaScript']) == ['Python', 'JavaScript']
+    assert [name for name, _, _ in index.suggest('p')] == ['Python']
+    index.update_user(2, 'python, javascript', '')
+    index.update_user(3, 'py', '')
+    index.update_user(4, 'py', '')
+    assert index.canonicalize('py, js') == ['python', 'javascript']
+    assert [name for name, _ in index.top('offered')] == ['python', 'javascript']
+
+def test_alias_only_skill_uses_display_name():
+    index = SkillIndex()
+    index.update_user(1, 'py, golang, ml', '')
+    assert index.canonicalize('py, golang, ml, Rust') == ['Python', 'Go', 'Machine Learning', 'Rust']
+    assert sorted(name for name, _ in index.top('offered')) == ['Go', 'Machine Learning', 'Python']
@@ -0,0 +1,159 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# Optional write-behind mode (WRITE_BEHIND=1): a single writer thread owns one connection and applies
+# queued writes in group commits -- one transaction per WRITER_BATCH_ROWS jobs or WRITER_BATCH_MS,
+# whichever comes first. Request threads no longer fight over SQLite's write lock, and the cost of a commit
+# is shared by the whole batch, so the writer connection can afford synchronous=FULL.
+# submit() blocks until the job's batch has committed: a returned result is durable.
+# Each job runs under its own SAVEPOINT, so a failing job is rolled back alone and the rest of its batch commits.
+
+WRITE_BEHIND = os.environ.get('WRITE_BEHIND', '0') == '1'
+WRITER_BATCH_ROWS = int(os.environ.get('WRITER_BATCH_ROWS', 256))
+WRITER_BATCH_MS = float(os.environ.get('WRITER_BATCH_MS', 5.0))
+WRITER_QUEUE_SIZE = int(os.environ.get('WRITER_QUEUE_SIZE', 10000))
+WRITER_ACK_TIMEOUT = float(os.environ.get('WRITER_ACK_TIMEOUT', 30.0)) # seconds a request waits for its commit
+
+class WriterOverloaded(Exception):
+    pass
+
+class _Job:
+    __slots__ = ('work', 'done', 'result', 'error')
+
+    def __init__(self, work):
+        self.work = work
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+_STOP = object()
+
+class GroupCommitWriter:
+    def __init__(self, connect, batch_rows=WRITER_BATCH_ROWS, batch_ms=WRITER_BATCH_MS, queue_size=WRITER_QUEUE_SIZE):
+        self._connect = connect
+        self.batch_rows = batch_rows
+        self.batch_seconds = batch_ms / 1000.0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'committed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'batches': 0,
+            'max_batch': 0,
+            'max_queue_depth': 0,
+            'commit_time_total': 0.0,
+        }
+        self._started_at = None
+
+    def start(self):
+        if self._thread is None:
+            self._started_at = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        # Drains what is already queued, then stops the thread
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, work, timeout=WRITER_ACK_TIMEOUT):
+        # Runs work(conn) on the writer thread; returns its result once the batch has committed
+        job = _Job(work)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise WriterOverloaded("Write queue is full, please retry")
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._queue.qsize())
+        if not job.done.wait(timeout):
+            # Still queued or committing: the write may yet land, but the caller can't be told it did
+            raise WriterOverloaded("Write not acknowledged in time, please retry")
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _collect(self, first):
+        batch = [first]
+        if first is _STOP:
+            return batch
+        deadline = time.monotonic() + self.batch_seconds
+        while len(batch) < self.batch_rows:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(job)
+            if job is _STOP:
+                break
+        return batch
+
+    def _apply(self, conn, jobs):
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job in jobs:
+                conn.execute("SAVEPOINT job")
+                try:
+                    job.result = job.work(conn)
+                    conn.execute("RELEASE job")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    job.error = e
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for job in jobs:
+                job.result, job.error = None, job.error or e
+        elapsed = time.perf_counter() - started
+        failed = sum(1 for job in jobs if job.error is not None)
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['committed'] += len(jobs) - failed
+            self._stats['failed'] += failed
+            self._stats['max_batch'] = max(self._stats['max_batch'], len(jobs))
+            self._stats['commit_time_total'] += elapsed
+        for job in jobs:
+            job.done.set()
+
+    def _run(self):
+        conn = self._connect()
+        conn.isolation_level = None # transactions are managed explicitly below
+        conn.execute("PRAGMA synchronous = FULL") # acknowledged means on disk; one sync per batch
+        try:
+            while True:
+                batch = self._collect(self._queue.get())
+                jobs = [job for job in batch if job is not _STOP]
+                if jobs:
+                    self._apply(conn, jobs)
+                if len(jobs) != len(batch):
+                    return
+        finally:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_size'] = self._queue.maxsize
+        stats['batch_rows'] = self.batch_rows
+        stats['batch_ms'] = self.batch_seconds * 1000.0
+        stats['avg_batch'] = (stats['committed'] + stats['failed']) / stats['batches'] if stats['batches'] else 0.0
+        stats['avg_commit_ms'] = stats['commit_time_total'] / stats['batches'] * 1000.0 if stats['batches'] else 0.0
+        uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+        stats['writes_per_second'] = stats['committed'] / uptime if uptime else 0.0
+        return stats